@@ -1,46 +1,152 @@
 """PDF-based RAG Chatbot - Flask Application."""
 
 import os
+import json
+import time
 import uuid
-import numpy as np
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import (Flask, Response, g, render_template, request, jsonify, session, redirect, url_for,
+                   stream_with_context)
 from werkzeug.utils import secure_filename
 
 from config import Config
 from rag import (PDFLoader, TextCleaner, TextChunker, EmbeddingGenerator, 
-                 FAISSVectorStore, Retriever, AnswerGenerator)
+                 FAISSVectorStore, Retriever, AnswerGenerator, EmbeddingCache, model_registry,
+                 IngestionJobManager, IngestionQueueFull, SessionManager, LRUCache, ContextAssembler,
+                 content_hash, metrics_registry, collect_timings, LLMClient, preload)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = Config.SECRET_KEY
 app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH
 Config.init_app()
 
-user_sessions = {}
+
+def preload_models():
+    start = time.perf_counter()
+    preload()
+    if Config.EMBEDDING_BACKEND == 'onnx':
+        model_registry.get_onnx_embedding_model(Config.EMBEDDING_MODEL, Config.ONNX_MODEL_FOLDER,
+                                                Config.EMBEDDING_QUANTIZE, Config.EMBEDDING_THREADS)
+    model_registry.warm_up([Config.EMBEDDING_MODEL] if Config.EMBEDDING_BACKEND == 'torch' else [],
+                           [Config.TOKENIZER_MODEL])
+    print(f"Preloaded libraries and models in {time.perf_counter() - start:.2f}s")
+
+
+def start_preload() -> threading.Thread:
+    # Heavy libraries load on first use; this moves that cost off the first request
+    # without holding up the import, so the server binds while models load.
+    thread = threading.Thread(target=preload_models, daemon=True, name='preload')
+    thread.start()
+    return thread
+
+
+# Worker processes (PDF extraction, cleaning) re-import this module as __mp_main__.
+if Config.PRELOAD_MODELS and __name__ != '__mp_main__':
+    start_preload()
+
+embedding_cache = (EmbeddingCache(Config.EMBEDDING_CACHE_FOLDER,
+                                  EmbeddingGenerator.model_id_for(Config.EMBEDDING_MODEL, Config.EMBEDDING_BACKEND,
+                                                                  Config.EMBEDDING_QUANTIZE),
+                                  max_entries=Config.EMBEDDING_CACHE_MAX_ENTRIES)
+                   if Config.EMBEDDING_CACHE_ENABLED else None)
+
+query_cache = LRUCache(Config.QUERY_CACHE_MAX_ENTRIES, ttl=Config.QUERY_CACHE_TTL)
+
+# One pooled client shared by every session; without a key, AnswerGenerator reports it as before.
+llm_client = (LLMClient(Config.GROQ_API_KEY, Config.GROQ_BASE_URL, max_concurrency=Config.LLM_MAX_CONCURRENCY,
+                        max_retries=Config.LLM_MAX_RETRIES, backoff_base=Config.LLM_BACKOFF_BASE,
+                        backoff_max=Config.LLM_BACKOFF_MAX, timeout=Config.LLM_TIMEOUT,
+                        max_connections=Config.LLM_MAX_CONNECTIONS, coalesce=Config.LLM_COALESCE)
+              if Config.GROQ_API_KEY else None)
+
+# Answer generation for /query/batch; the LLM client's semaphore still caps upstream calls.
+batch_executor = ThreadPoolExecutor(max_workers=Config.BATCH_QUERY_WORKERS, thread_name_prefix='batch-query')
+
+ingestion_jobs = IngestionJobManager(max_workers=Config.INGEST_WORKERS, max_pending=Config.INGEST_MAX_PENDING,
+                                     embed_batch_size=Config.INGEST_EMBED_BATCH,
+                                     page_window=Config.INGEST_PAGE_WINDOW, pdf_workers=Config.PDF_WORKERS,
+                                     clean_workers=Config.CLEAN_WORKERS)
+
+
+def create_session():
+    embed_gen = EmbeddingGenerator(Config.EMBEDDING_MODEL, cache=embedding_cache, backend=Config.EMBEDDING_BACKEND,
+                                   quantize=Config.EMBEDDING_QUANTIZE, threads=Config.EMBEDDING_THREADS,
+                                   max_batch_tokens=Config.EMBEDDING_MAX_BATCH_TOKENS,
+                                   onnx_dir=Config.ONNX_MODEL_FOLDER, query_batching=Config.QUERY_BATCH_ENABLED,
+                                   batch_wait_ms=Config.QUERY_BATCH_MAX_WAIT_MS,
+                                   max_query_batch=Config.QUERY_BATCH_MAX_SIZE)
+    vector_store = FAISSVectorStore(dimension=embed_gen.get_embedding_dimension(),
+                                    hnsw_threshold=Config.INDEX_HNSW_THRESHOLD,
+                                    ivf_threshold=Config.INDEX_IVF_THRESHOLD,
+                                    hnsw_m=Config.HNSW_M, ef_search=Config.HNSW_EF_SEARCH,
+                                    nprobe=Config.IVF_NPROBE, compression=Config.INDEX_COMPRESSION,
+                                    compress_threshold=Config.INDEX_COMPRESS_THRESHOLD,
+                                    pq_m=Config.INDEX_PQ_M, rerank_factor=Config.INDEX_RERANK_FACTOR,
+                                    spool_dir=Config.SESSION_FOLDER)
+    
+    chunker = TextChunker(chunk_size=Config.CHUNK_SIZE, chunk_overlap=Config.CHUNK_OVERLAP,
+                          tokenizer_name=Config.TOKENIZER_MODEL)
+    
+    return {
+        'pdf_loader': PDFLoader(max_workers=Config.PDF_WORKERS, pages_per_task=Config.PDF_PAGES_PER_TASK),
+        'text_cleaner': TextCleaner(max_workers=Config.CLEAN_WORKERS),
+        'chunker': chunker,
+        'embedding_gen': embed_gen,
+        'vector_store': vector_store,
+        'retriever': Retriever(embed_gen, vector_store, top_k=Config.TOP_K_CHUNKS, query_cache=query_cache,
+                               assembler=ContextAssembler(chunker, max_tokens=Config.CONTEXT_MAX_TOKENS)),
+        'answer_gen': AnswerGenerator(api_key=Config.GROQ_API_KEY, model=Config.LLM_MODEL,
+                                      base_url=Config.GROQ_BASE_URL, client=llm_client,
+                                      cache=LRUCache(Config.ANSWER_CACHE_MAX_ENTRIES, ttl=Config.ANSWER_CACHE_TTL)),
+        'documents': [],
+        'chat_history': [],
+        'ingest_lock': threading.Lock()
+    }
+
+
+user_sessions = SessionManager(create_session, Config.SESSION_FOLDER,
+                               max_sessions=Config.SESSION_MAX_COUNT,
+                               max_memory_bytes=Config.SESSION_MAX_MEMORY_MB * 1024 * 1024,
+                               idle_ttl=Config.SESSION_IDLE_TTL,
+                               is_busy=lambda user_id: bool(ingestion_jobs.active_jobs(user_id)))
 
 
 def get_user_session():
     if 'user_id' not in session:
         session['user_id'] = str(uuid.uuid4())
     
-    user_id = session['user_id']
-    
-    if user_id not in user_sessions:
-        embed_gen = EmbeddingGenerator(Config.EMBEDDING_MODEL)
-        vector_store = FAISSVectorStore(dimension=embed_gen.get_embedding_dimension())
-        
-        user_sessions[user_id] = {
-            'pdf_loader': PDFLoader(),
-            'text_cleaner': TextCleaner(),
-            'chunker': TextChunker(chunk_size=Config.CHUNK_SIZE, chunk_overlap=Config.CHUNK_OVERLAP),
-            'embedding_gen': embed_gen,
-            'vector_store': vector_store,
-            'retriever': Retriever(embed_gen, vector_store, top_k=Config.TOP_K_CHUNKS),
-            'answer_gen': AnswerGenerator(api_key=Config.GROQ_API_KEY, model=Config.LLM_MODEL),
-            'documents': [],
-            'chat_history': []
-        }
-    
-    return user_sessions[user_id]
+    # Leased until the request ends so the session is never spilled while in use.
+    if 'user_session' not in g:
+        g.user_session = user_sessions.acquire(session['user_id'])
+        g.user_session_id = session['user_id']
+    return g.user_session
+
+
+@app.teardown_request
+def release_user_session(exc):
+    if 'user_session_id' in g:
+        user_sessions.release(g.pop('user_session_id'))
+
+
+http_seconds = metrics_registry.histogram('rag_http_request_seconds', 'Time to produce each HTTP response.',
+                                 ('endpoint', 'method', 'status'))
+session_gauge = metrics_registry.gauge('rag_sessions', 'In-memory user sessions.', ('state',))
+session_memory = metrics_registry.gauge('rag_session_memory_bytes', 'Estimated memory held by in-memory sessions.')
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def observe_request(response):
+    # Streamed responses are timed to their first byte; their stages are recorded separately.
+    if 'request_start' in g:
+        http_seconds.observe(time.perf_counter() - g.request_start, endpoint=request.endpoint or 'unmatched',
+                             method=request.method, status=response.status_code)
+    return response
 
 
 @app.route('/')
@@ -62,35 +168,62 @@ def upload():
     user_upload_dir = os.path.join(Config.UPLOAD_FOLDER, session['user_id'])
     os.makedirs(user_upload_dir, exist_ok=True)
     
-    uploaded_files = []
+    known = {d['filename']: d.get('sha256') for d in user_session['documents']}
+    uploaded_files, skipped = [], []
     for file in files:
         if file and Config.allowed_file(file.filename):
             filename = secure_filename(file.filename)
+            digest = content_hash(file.stream)
+            file.stream.seek(0)
+            if known.get(filename) == digest:
+                skipped.append(filename)
+                continue
             filepath = os.path.join(user_upload_dir, filename)
             file.save(filepath)
             uploaded_files.append(filepath)
     
     if not uploaded_files:
+        if skipped:
+            return jsonify({'success': True, 'skipped': skipped,
+                            'message': f'{len(skipped)} document(s) unchanged, nothing to process'})
         return jsonify({'error': 'No valid PDF files'}), 400
     
     try:
-        documents = user_session['pdf_loader'].load_multiple_pdfs(uploaded_files)
-        cleaned_docs = user_session['text_cleaner'].clean_documents(documents)
-        chunks = user_session['chunker'].chunk_documents(cleaned_docs)
-        chunks_with_emb = user_session['embedding_gen'].generate_embeddings_for_chunks(chunks)
-        embeddings = np.array([c['embedding'] for c in chunks_with_emb])
-        user_session['vector_store'].add_embeddings(embeddings, chunks_with_emb)
-        
-        for doc in documents:
-            user_session['documents'].append({'filename': doc['filename'], 'pages': doc['total_pages']})
-        
-        return jsonify({
-            'success': True,
-            'message': f'Processed {len(documents)} document(s) with {len(chunks)} chunks',
-            'documents': user_session['documents']
-        })
-    except Exception as e:
-        return jsonify({'error': f'Error: {str(e)}'}), 500
+        job = ingestion_jobs.submit(session['user_id'], uploaded_files, user_session)
+    except IngestionQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status_url': url_for('job_status', job_id=job.id),
+        'skipped': skipped,
+        'message': f'Processing {len(uploaded_files)} document(s)'
+    }), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = ingestion_jobs.get(job_id, owner=session.get('user_id'))
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/documents/<name>', methods=['DELETE'])
+def delete_document(name):
+    user_session = get_user_session()
+    with user_session['ingest_lock']:
+        entry = next((d for d in user_session['documents'] if d['filename'] == name), None)
+        if entry is None:
+            return jsonify({'error': 'Document not found'}), 404
+        removed = user_session['vector_store'].remove_document(name)
+        user_session['documents'].remove(entry)
+    
+    filepath = os.path.join(Config.UPLOAD_FOLDER, session['user_id'], secure_filename(name))
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    return jsonify({'success': True, 'filename': name, 'chunks_removed': removed})
 
 
 @app.route('/chat')
@@ -102,43 +235,206 @@ def chat():
                           chat_history=user_session['chat_history'])
 
 
-@app.route('/query', methods=['POST'])
-def query():
-    data = request.get_json()
+def parse_question():
+    data = request.get_json(silent=True)
     if not data or 'question' not in data:
-        return jsonify({'error': 'No question provided'}), 400
+        return None, (jsonify({'error': 'No question provided'}), 400)
     
     question = data['question'].strip()
     if not question:
-        return jsonify({'error': 'Question cannot be empty'}), 400
+        return None, (jsonify({'error': 'Question cannot be empty'}), 400)
     
-    user_session = get_user_session()
-    if user_session['vector_store'].index.ntotal == 0:
+    return question, index_error(get_user_session())
+
+
+def is_page_range(value):
+    return (isinstance(value, list) and len(value) == 2 and all(type(p) is int and p > 0 for p in value)
+            and value[0] <= value[1])
+
+
+def parse_filter(data, user_session):
+    # Optional scope for retrieval: 'documents' (uploaded filenames) and 'pages'
+    # ([first, last] ranges, 1-based and inclusive) applied to those documents.
+    sources, pages = data.get('documents'), data.get('pages')
+    if sources is not None:
+        if not isinstance(sources, list) or not all(isinstance(s, str) for s in sources):
+            return None, (jsonify({'error': 'documents must be a list of filenames'}), 400)
+        known = {d['filename'] for d in user_session['documents']}
+        unknown = [s for s in sources if s not in known]
+        if unknown:
+            return None, (jsonify({'error': f"Unknown documents: {', '.join(unknown)}"}), 400)
+    if pages is not None:
+        if not isinstance(pages, list) or not all(is_page_range(r) for r in pages):
+            return None, (jsonify({'error': 'pages must be a list of [first, last] page ranges'}), 400)
+        pages = [tuple(r) for r in pages]
+    return (sources, pages), None
+
+
+def is_scoped(scope):
+    return any(part is not None for part in scope)
+
+
+def index_error(user_session):
+    if user_session['vector_store'].count == 0:
+        if ingestion_jobs.active_jobs(session['user_id']):
+            return jsonify({'error': 'Documents are still processing'}), 409
         return jsonify({'error': 'No documents uploaded'}), 400
+    return None
+
+
+def context_preview(chunks):
+    return [{'text': c['text'][:200] + '...' if len(c['text']) > 200 else c['text'],
+             'source': c.get('source', 'Unknown'),
+             'score': round(c.get('similarity_score', 0), 3)} for c in chunks]
+
+
+@app.route('/query', methods=['POST'])
+def query():
+    question, error = parse_question()
+    if error:
+        return error
     
+    user_session = get_user_session()
+    data = request.get_json(silent=True)
+    scope, error = parse_filter(data, user_session)
+    if error:
+        return error
+    want_timings = bool(data.get('timings')) or request.args.get('timings') == '1'
     try:
-        clean_q = user_session['text_cleaner'].clean_query(question)
-        context, chunks = user_session['retriever'].retrieve_with_context(clean_q, top_k=Config.TOP_K_CHUNKS)
-        result = user_session['answer_gen'].generate_with_sources(clean_q, chunks)
+        with collect_timings() as timings:
+            start = time.perf_counter()
+            clean_q = user_session['text_cleaner'].clean_query(question)
+            index_version = user_session['vector_store'].version
+            chunks, assembly = user_session['retriever'].retrieve_assembled(clean_q, Config.TOP_K_CHUNKS, *scope)
+            result = user_session['answer_gen'].generate_with_sources(clean_q, chunks, index_version=index_version,
+                                                                      scoped=is_scoped(scope))
+            timings['total'] = time.perf_counter() - start
         
         chat_entry = {
             'question': question,
             'answer': result['answer'],
             'sources': result.get('sources', []),
-            'context': [{'text': c['text'][:200] + '...' if len(c['text']) > 200 else c['text'],
-                        'source': c.get('source', 'Unknown'),
-                        'score': round(c.get('similarity_score', 0), 3)} for c in chunks]
+            'context': context_preview(chunks)
         }
         user_session['chat_history'].append(chat_entry)
         
-        return jsonify({
+        response = {
             'success': True, 'answer': result['answer'], 'sources': result.get('sources', []),
-            'context': chat_entry['context'], 'model': result.get('model', 'unknown')
-        })
+            'context': chat_entry['context'], 'model': result.get('model', 'unknown'),
+            'cached': result.get('cached', False), 'context_tokens': assembly
+        }
+        if want_timings:
+            response['timings_ms'] = {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+            response['usage'] = result.get('usage')
+        return jsonify(response)
     except Exception as e:
         return jsonify({'error': f'Error: {str(e)}'}), 500
 
 
+@app.route('/query/batch', methods=['POST'])
+def query_batch():
+    data = request.get_json(silent=True) or {}
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions:
+        return jsonify({'error': 'No questions provided'}), 400
+    if len(questions) > Config.BATCH_QUERY_MAX_QUESTIONS:
+        return jsonify({'error': f'At most {Config.BATCH_QUERY_MAX_QUESTIONS} questions per batch'}), 400
+    user_session = get_user_session()
+    error = index_error(user_session)
+    if error:
+        return error
+    scope, error = parse_filter(data, user_session)
+    if error:
+        return error
+
+    # Malformed entries fail on their own; the rest share one encode and one index search.
+    results = [None] * len(questions)
+    valid = []
+    for i, question in enumerate(questions):
+        if isinstance(question, str) and question.strip():
+            valid.append(i)
+        else:
+            results[i] = {'question': question, 'error': 'Question cannot be empty'}
+    answer_gen = user_session['answer_gen']
+    try:
+        start = time.perf_counter()
+        clean_qs = [user_session['text_cleaner'].clean_query(questions[i]) for i in valid]
+        index_version = user_session['vector_store'].version
+        retrieved = user_session['retriever'].retrieve_assembled_batch(clean_qs, Config.TOP_K_CHUNKS, *scope)
+        retrieve_s = time.perf_counter() - start
+    except Exception as e:
+        return jsonify({'error': f'Error: {str(e)}'}), 500
+
+    futures = [batch_executor.submit(answer_gen.generate_with_sources, clean_q, chunks, index_version=index_version,
+                                     scoped=is_scoped(scope))
+               for clean_q, (chunks, _) in zip(clean_qs, retrieved)]
+    for i, future, (chunks, assembly) in zip(valid, futures, retrieved):
+        try:
+            result = future.result()
+        except Exception as e:
+            results[i] = {'question': questions[i], 'error': f'Error: {str(e)}'}
+            continue
+        results[i] = {
+            'question': questions[i], 'answer': result['answer'], 'sources': result.get('sources', []),
+            'context': context_preview(chunks), 'model': result.get('model', 'unknown'),
+            'cached': result.get('cached', False), 'context_tokens': assembly
+        }
+        if 'error' in result:
+            results[i]['error'] = result['error']
+
+    response = {'success': True, 'results': results, 'count': len(results),
+                'errors': sum(1 for r in results if 'error' in r)}
+    if data.get('timings') or request.args.get('timings') == '1':
+        total_s = time.perf_counter() - start
+        response['timings_ms'] = {'retrieve': round(retrieve_s * 1000, 3),
+                                  'generate': round((total_s - retrieve_s) * 1000, 3),
+                                  'total': round(total_s * 1000, 3)}
+    return jsonify(response)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/query/stream', methods=['POST'])
+def query_stream():
+    question, error = parse_question()
+    if error:
+        return error
+    
+    user_session = get_user_session()
+    scope, error = parse_filter(request.get_json(silent=True), user_session)
+    if error:
+        return error
+    answer_gen = user_session['answer_gen']
+    
+    def events():
+        try:
+            clean_q = user_session['text_cleaner'].clean_query(question)
+            index_version = user_session['vector_store'].version
+            chunks, assembly = user_session['retriever'].retrieve_assembled(clean_q, Config.TOP_K_CHUNKS, *scope)
+            sources = answer_gen.get_sources(chunks)
+            context = context_preview(chunks)
+            yield sse_event('sources', {'sources': sources, 'context': context, 'context_tokens': assembly})
+            
+            parts = []
+            for token in answer_gen.generate_stream_with_sources(clean_q, chunks, index_version=index_version,
+                                                                scoped=is_scoped(scope)):
+                parts.append(token)
+                yield sse_event('token', {'text': token})
+            
+            answer = ''.join(parts)
+            user_session['chat_history'].append({
+                'question': question, 'answer': answer, 'sources': sources, 'context': context
+            })
+            yield sse_event('done', {'answer': answer, 'model': answer_gen.model})
+        except Exception as e:
+            yield sse_event('error', {'error': f'Error: {str(e)}'})
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/clear', methods=['POST'])
 def clear():
     if 'user_id' in session:
@@ -147,19 +443,32 @@ def clear():
         user_dir = os.path.join(Config.UPLOAD_FOLDER, user_id)
         if os.path.exists(user_dir):
             shutil.rmtree(user_dir)
-        if user_id in user_sessions:
-            del user_sessions[user_id]
+        user_sessions.remove(user_id)
         session.clear()
     return jsonify({'success': True})
 
 
+@app.route('/metrics')
+def prometheus_metrics():
+    stats = user_sessions.get_stats()
+    session_gauge.set(stats['active'], state='active')
+    session_gauge.set(stats['leased'], state='leased')
+    session_memory.set(stats['memory_bytes'])
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/stats')
 def stats():
     user_session = get_user_session()
     return jsonify({
         'documents': len(user_session['documents']),
-        'chunks': user_session['vector_store'].index.ntotal,
-        'chat_history': len(user_session['chat_history'])
+        'chunks': user_session['vector_store'].count,
+        'chat_history': len(user_session['chat_history']),
+        'ingestion_jobs': [j.to_dict() for j in ingestion_jobs.active_jobs(session['user_id'])],
+        'models': model_registry.get_stats(),
+        'retriever': user_session['retriever'].get_stats(),
+        'generator': user_session['answer_gen'].get_stats(),
+        'sessions': user_sessions.get_stats()
     })
 
 
@@ -0,0 +1,142 @@
+"""Benchmark - Single-pass TextChunker against the per-sentence tokenizing implementation.
+
+Run from the repository root:
+    python -m benchmarks.bench_chunker --pages 500
+"""
+
+import re
+import time
+import random
+import argparse
+from typing import List, Dict
+
+from rag.chunker import TextChunker
+
+
+class LegacyTextChunker(TextChunker):
+    """The original chunker, which re-tokenizes sentences, words, overlaps and joined chunks."""
+
+    def chunk_text(self, text: str, source: str = "document") -> List[Dict]:
+        if not text.strip():
+            return []
+
+        sentences = re.split(r'(?<=[.!?])\s+', text)
+        sentences = [s.strip() for s in sentences if s.strip()]
+
+        chunks = []
+        current_chunk = []
+        current_tokens = 0
+        chunk_id = 0
+
+        for sentence in sentences:
+            tokens = self.count_tokens(sentence)
+
+            if tokens > self.chunk_size:
+                if current_chunk:
+                    chunks.append(self._make_chunk(' '.join(current_chunk), chunk_id, source))
+                    chunk_id += 1
+                    current_chunk = []
+                    current_tokens = 0
+
+                words = sentence.split()
+                temp = []
+                temp_tokens = 0
+                for word in words:
+                    wt = self.count_tokens(word)
+                    if temp_tokens + wt > self.chunk_size:
+                        chunks.append(self._make_chunk(' '.join(temp), chunk_id, source))
+                        chunk_id += 1
+                        temp = [word]
+                        temp_tokens = wt
+                    else:
+                        temp.append(word)
+                        temp_tokens += wt
+                if temp:
+                    current_chunk = temp
+                    current_tokens = temp_tokens
+                continue
+
+            if current_tokens + tokens > self.chunk_size:
+                if current_chunk:
+                    chunks.append(self._make_chunk(' '.join(current_chunk), chunk_id, source))
+                    chunk_id += 1
+
+                    overlap = []
+                    overlap_tokens = 0
+                    for s in reversed(current_chunk):
+                        st = self.count_tokens(s)
+                        if overlap_tokens + st <= self.chunk_overlap:
+                            overlap.insert(0, s)
+                            overlap_tokens += st
+                        else:
+                            break
+                    current_chunk = overlap + [sentence]
+                    current_tokens = self.count_tokens(' '.join(current_chunk))
+                else:
+                    current_chunk = [sentence]
+                    current_tokens = tokens
+            else:
+                current_chunk.append(sentence)
+                current_tokens += tokens
+
+        if current_chunk:
+            chunks.append(self._make_chunk(' '.join(current_chunk), chunk_id, source))
+
+        return chunks
+
+
+WORDS = ("the of and to in is for on that with as by this are from at be or an it which data model "
+         "results analysis system report section figure table value performance method approach "
+         "revenue quarterly growth customer annual risk market compliance policy").split()
+
+
+def synthetic_text(pages: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    page_texts = []
+    for _ in range(pages):
+        sentences = []
+        for _ in range(rng.randint(15, 30)):
+            n = rng.choice([rng.randint(5, 30)] * 20 + [rng.randint(900, 1200)])
+            sentences.append(' '.join(rng.choice(WORDS) for _ in range(n)).capitalize() + rng.choice('.!?'))
+        page_texts.append(' '.join(sentences))
+    return '\n\n'.join(page_texts)
+
+
+def timed(chunker: TextChunker, text: str, repeat: int):
+    best = float('inf')
+    chunks = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = chunker.chunk_text(text, "bench.pdf")
+        best = min(best, time.perf_counter() - start)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--chunk-size', type=int, default=800)
+    parser.add_argument('--chunk-overlap', type=int, default=150)
+    parser.add_argument('--tokenizer', default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    text = synthetic_text(args.pages)
+    kwargs = dict(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, tokenizer_name=args.tokenizer)
+    legacy, current = LegacyTextChunker(**kwargs), TextChunker(**kwargs)
+    print(f"Tokenizer: {type(current.tokenizer).__name__ if current.tokenizer else 'whitespace fallback'}")
+
+    legacy_time, legacy_chunks = timed(legacy, text, args.repeat)
+    current_time, current_chunks = timed(current, text, args.repeat)
+
+    identical = legacy_chunks == current_chunks
+    print(f"Pages: {args.pages}  chars: {len(text):,}  chunks: {len(current_chunks)}")
+    print(f"Legacy:      {legacy_time:.3f}s")
+    print(f"Single-pass: {current_time:.3f}s  ({legacy_time / current_time:.1f}x)")
+    print(f"Identical output: {identical}")
+    if not identical:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark - Single-pass TextCleaner against the original double-cleaning implementation.
+
+Run from the repository root:
+    python -m benchmarks.bench_cleaner --pages 2000 --workers 4
+
+The parallel rows only pay off with several cores and documents of a few MB or more.
+"""
+
+import re
+import time
+import random
+import argparse
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict
+
+from rag.text_cleaner import TextCleaner
+
+WORDS = ("the quarterly report shows revenue growth across all regions while operating costs "
+         "remained stable compared with the previous fiscal year").split()
+# Typical pdfplumber output outside plain ASCII: typographic quotes, dashes, ligatures,
+# bullets, currency, accents, non-breaking spaces and stray tabs.
+EXTRAS = ['“quoted”', 'it’s', '2019–2020', 'a—b', 'ﬁnance', 'oﬀice', '•', '€12', 'café', ' ', '\t', '  ', '^', '~']
+
+
+class LegacyTextCleaner(TextCleaner):
+    """The original cleaner: cleans full_text, then every page again."""
+
+    def clean_text(self, text: str) -> str:
+        if not text:
+            return ""
+        text = unicodedata.normalize('NFKD', text)
+        # The original quote-replacement chain; its only effective replace was this literal.
+        text = text.replace(', "\'").replace(', "\'")
+        text = text.replace('–', '-').replace('—', '-')
+        text = re.sub(r'[^\w\s.,!?;:\'"()\-\[\]{}@#$%&*+=/<>]', ' ', text)
+        text = re.sub(r'\n\s*\n', '\n\n', text)
+        text = re.sub(r'[ \t]+', ' ', text)
+        return text.strip()
+
+    def clean_documents(self, documents: List[Dict], executor=None) -> List[Dict]:
+        cleaned = []
+        for doc in documents:
+            cleaned_doc = doc.copy()
+            cleaned_doc['full_text'] = self.clean_text(doc['full_text'])
+            if 'pages' in doc:
+                cleaned_doc['pages'] = [{**p, 'text': self.clean_text(p['text'])} for p in doc['pages']]
+            cleaned.append(cleaned_doc)
+        return cleaned
+
+
+def synthetic_page(rng: random.Random, words: int, unicode_rate: float) -> str:
+    out = []
+    for i in range(words):
+        out.append(rng.choice(WORDS))
+        if rng.random() < unicode_rate:
+            out.append(rng.choice(EXTRAS))
+        if rng.random() < 0.06:
+            out.append(rng.choice(['.\n', '. ', '!\n\n', '?\n \t\n']))
+    return rng.choice(['', '  ', '\n']) + ' '.join(out) + rng.choice(['', ' \n', '\n\n  ', '\t'])
+
+
+def synthetic_document(pages: int, unicode_rate: float, seed: int = 0) -> Dict:
+    rng = random.Random(seed)
+    texts = [synthetic_page(rng, 450, unicode_rate) if rng.random() > 0.02 else '' for _ in range(pages)]
+    return {'filename': 'synthetic.pdf', 'total_pages': pages,
+            'pages': [{'page_number': i + 1, 'text': t} for i, t in enumerate(texts)],
+            'full_text': '\n\n'.join(texts)}
+
+
+def timed(cleaner: TextCleaner, doc: Dict, repeat: int, executor=None):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = cleaner.clean_documents([doc], executor)[0]
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--unicode-rate', type=float, nargs='+', default=[0.0, 0.01, 0.05],
+                        help="Fraction of words followed by a non-ASCII or filtered token")
+    args = parser.parse_args()
+
+    print(f"{args.pages} pages per document, best of {args.repeat}")
+    print(f"{'unicode':>8} {'MB':>6} {'cleaner':<18} {'seconds':>8} {'MB/s':>8} {'speedup':>8} {'identical':>10}")
+    for rate in args.unicode_rate:
+        doc = synthetic_document(args.pages, rate)
+        mb = len(doc['full_text'].encode('utf-8')) / 1e6
+        legacy_s, expected = timed(LegacyTextCleaner(), doc, args.repeat)
+        rows = [('legacy', legacy_s, expected),
+                ('single-pass', *timed(TextCleaner(), doc, args.repeat))]
+        if args.workers > 1:
+            # A long-lived pool passed in by the caller; process startup is not timed.
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                pool.submit(len, '').result()
+                rows.append((f'parallel x{args.workers}',
+                             *timed(TextCleaner(parallel_min_chars=0), doc, args.repeat, pool)))
+        for name, seconds, result in rows:
+            identical = result['full_text'] == expected['full_text'] and result['pages'] == expected['pages']
+            print(f"{rate:>8.2f} {mb:>6.1f} {name:<18} {seconds:>8.3f} {mb / seconds:>8.1f} "
+                  f"{legacy_s / seconds:>7.1f}x {str(identical):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark - Memory, latency and recall of compressed indexes against the exact flat index.
+
+Run from the repository root:
+    python -m benchmarks.bench_compression --vectors 200000 --tier flat ivf
+
+Bytes/vector is the serialized index size, so it includes id maps and graph links.
+Re-ranking reads full-precision vectors from a spool file, which is not counted.
+"""
+
+import argparse
+import numpy as np
+import faiss
+
+from rag.vector_store import FAISSVectorStore
+from benchmarks.bench_index_tiers import clustered_vectors, run_queries, recall
+
+THRESHOLDS = {'flat': (0, 0), 'hnsw': (1, 0), 'ivf': (0, 1)}
+
+
+def build_store(tier: str, compression: str, vectors: np.ndarray, pq_m: int) -> FAISSVectorStore:
+    hnsw_threshold, ivf_threshold = THRESHOLDS[tier]
+    store = FAISSVectorStore(vectors.shape[1], hnsw_threshold=hnsw_threshold, ivf_threshold=ivf_threshold,
+                             background_rebuild=False, compression=compression, compress_threshold=0, pq_m=pq_m)
+    store.add_embeddings(vectors, [{'row': i} for i in range(len(vectors))])
+    assert store.tier == tier and store.storage == compression, (store.tier, store.storage)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vectors', type=int, default=100000)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--clusters', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--tier', nargs='+', default=['flat'], choices=list(THRESHOLDS))
+    parser.add_argument('--compression', nargs='+', default=list(FAISSVectorStore.COMPRESSIONS),
+                        choices=list(FAISSVectorStore.COMPRESSIONS))
+    parser.add_argument('--pq-m', type=int, default=48)
+    parser.add_argument('--rerank-factor', type=int, nargs='+', default=[0, 4, 10])
+    args = parser.parse_args()
+
+    data = clustered_vectors(args.vectors + args.queries, args.dimension, args.clusters)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    k = args.top_k
+
+    _, truth = run_queries(build_store('flat', 'none', vectors, args.pq_m), queries, k)
+    print(f"{args.vectors:,} vectors x {args.dimension} dims, {args.queries} queries, recall@{k} against exact flat")
+    print(f"{'tier':<6} {'compression':<12} {'rerank':>6} {'bytes/vec':>10} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    for tier in args.tier:
+        for compression in args.compression:
+            store = build_store(tier, compression, vectors, args.pq_m)
+            bytes_per_vector = len(faiss.serialize_index(store.index)) / store.count
+            # Re-ranking only applies to compressed codes.
+            for factor in args.rerank_factor if compression != 'none' else [0]:
+                store.set_search_params(rerank_factor=factor)
+                ms, ids = run_queries(store, queries, k)
+                print(f"{tier:<6} {compression:<12} {factor or '-':>6} {bytes_per_vector:>10.1f} "
+                      f"{np.percentile(ms, 50):>8.3f} {np.percentile(ms, 95):>8.3f} {recall(ids, truth, k):>7.3f}")
+            del store
+
+
+if __name__ == '__main__':
+    main()
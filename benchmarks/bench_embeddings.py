@@ -0,0 +1,87 @@
+"""Benchmark - Embedding throughput and cosine agreement of the torch and ONNX backends.
+
+Run from the repository root (the ONNX rows need onnxruntime and onnx):
+    python -m benchmarks.bench_embeddings --chunks 2000 --threads 4
+
+The reference is the original path: SentenceTransformer.encode over chunks in document
+order with batch_size=32. Every other row is compared against it row by row.
+"""
+
+import time
+import random
+import argparse
+import numpy as np
+
+from config import Config
+from rag import EmbeddingGenerator, ModelRegistry
+from benchmarks.synthetic_pdf import synthetic_pages
+
+
+def synthetic_chunks(count: int, seed: int = 0):
+    # Real chunks range from a heading or a table cell to a full CHUNK_SIZE window.
+    rng = random.Random(seed)
+    words = ' '.join(synthetic_pages(max(1, count // 4), 600, seed)).split()
+    chunks = []
+    for _ in range(count):
+        length = int(min(600, rng.lognormvariate(4.5, 0.9))) + 1
+        start = rng.randrange(0, len(words) - length)
+        chunks.append(' '.join(words[start:start + length]))
+    return chunks
+
+
+def timed_encode(encode, texts, repeat: int):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = encode(texts)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=Config.EMBEDDING_MODEL)
+    parser.add_argument('--chunks', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-batch-tokens', type=int, default=Config.EMBEDDING_MAX_BATCH_TOKENS)
+    parser.add_argument('--threads', type=int, default=Config.EMBEDDING_THREADS)
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--onnx-dir', default=Config.ONNX_MODEL_FOLDER)
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'onnx-int8'],
+                        choices=['torch', 'onnx', 'onnx-int8'])
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.chunks)
+    registry = ModelRegistry()
+    reference = EmbeddingGenerator(args.model, registry=registry, threads=args.threads)
+    model = reference.backend.model
+
+    def unbucketed(batch):
+        return model.encode(batch, batch_size=args.batch_size, convert_to_numpy=True,
+                            normalize_embeddings=True, show_progress_bar=False)
+
+    lengths = reference.backend.token_lengths(texts)
+    print(f"{args.chunks} chunks, {np.mean(lengths):.0f} tokens on average (max {max(lengths)}), "
+          f"batch_size={args.batch_size}, max_batch_tokens={args.max_batch_tokens}, threads={args.threads or 'default'}")
+    print(f"{'backend':<22} {'seconds':>8} {'chunks/s':>9} {'speedup':>8} {'min cos':>8} {'mean cos':>9}")
+    base_s, expected = timed_encode(unbucketed, texts, args.repeat)
+    rows = [('torch (document order)', base_s, expected)]
+    for name in args.backends:
+        backend, _, variant = name.partition('-')
+        try:
+            generator = EmbeddingGenerator(args.model, registry=registry, backend=backend, quantize=variant == 'int8',
+                                           threads=args.threads, max_batch_tokens=args.max_batch_tokens,
+                                           onnx_dir=args.onnx_dir)
+        except ImportError as e:
+            print(f"{name:<22} skipped: {e}")
+            continue
+        rows.append((f"{name} (bucketed)",
+                     *timed_encode(lambda t: generator.generate_embeddings(t, args.batch_size), texts, args.repeat)))
+    for name, seconds, result in rows:
+        cosine = np.sum(result * expected, axis=1)
+        print(f"{name:<22} {seconds:>8.2f} {len(texts) / seconds:>9.1f} {base_s / seconds:>7.2f}x "
+              f"{cosine.min():>8.4f} {cosine.mean():>9.4f}")
+
+
+if __name__ == '__main__':
+    main()
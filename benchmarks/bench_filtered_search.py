@@ -0,0 +1,111 @@
+"""Benchmark - Document-filtered search vs unfiltered search and top-k over-fetch with post-filtering.
+
+Run from the repository root:
+    python -m benchmarks.bench_filtered_search --documents 200 --chunks-per-document 500
+    python -m benchmarks.bench_filtered_search --tiers hnsw --select 1 10 50
+
+Each query is scoped to a random set of documents. The filtered store is searched
+through its id bitmap (and, below --exact-filter-max matching chunks, by scoring them
+directly); the post-filter baseline asks the unfiltered index for top_k * --overfetch
+and keeps the hits from the selected documents, which is how scoping had to be done
+before. Recall is against exact search over the selected documents only.
+"""
+
+import time
+import argparse
+import numpy as np
+
+from rag.vector_store import FAISSVectorStore
+from benchmarks.bench_index_tiers import clustered_vectors, recall
+
+
+def build_store(tier: str, vectors: np.ndarray, documents: int, exact_filter_max: int) -> FAISSVectorStore:
+    thresholds = {'flat': (0, 0), 'hnsw': (1, 0), 'ivf': (0, 1)}[tier]
+    store = FAISSVectorStore(vectors.shape[1], hnsw_threshold=thresholds[0], ivf_threshold=thresholds[1],
+                             background_rebuild=False, exact_filter_max=exact_filter_max)
+    per_document = len(vectors) // documents
+    metadata = [{'row': i, 'source': f"document-{i // per_document:05d}.pdf", 'page_start': 1 + i % per_document // 4,
+                 'page_end': 1 + i % per_document // 4} for i in range(len(vectors))]
+    store.add_embeddings(vectors, metadata)
+    assert store.tier == tier, store.tier
+    return store
+
+
+def exact_truth(vectors: np.ndarray, queries: np.ndarray, selections, per_document: int, k: int):
+    truth = []
+    for query, selected in zip(queries, selections):
+        rows = np.concatenate([np.arange(d * per_document, (d + 1) * per_document) for d in selected])
+        scores = vectors[rows] @ query
+        truth.append(rows[np.argsort(-scores)[:k]].tolist())
+    return truth
+
+
+def run(search, queries, selections):
+    latencies, ids = [], []
+    for query, selected in zip(queries, selections):
+        sources = [f"document-{d:05d}.pdf" for d in selected]
+        start = time.perf_counter()
+        results = search(query, sources)
+        latencies.append(time.perf_counter() - start)
+        ids.append([meta['row'] for meta, _ in results])
+    return np.array(latencies) * 1000, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=200)
+    parser.add_argument('--chunks-per-document', type=int, default=500)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--clusters', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--tiers', nargs='+', choices=['flat', 'hnsw', 'ivf'], default=['flat', 'hnsw', 'ivf'])
+    parser.add_argument('--select', type=int, nargs='+', default=[1, 2, 5, 20], help="Documents per query")
+    parser.add_argument('--overfetch', type=int, default=10, help="Post-filter baseline fetches top_k times this")
+    parser.add_argument('--exact-filter-max', type=int, default=1024)
+    args = parser.parse_args()
+
+    n = args.documents * args.chunks_per_document
+    data = clustered_vectors(n + args.queries, args.dimension, args.clusters)
+    vectors, queries = data[:n], data[n:]
+    k = args.top_k
+    rng = np.random.default_rng(1)
+    print(f"{args.documents} documents x {args.chunks_per_document} chunks ({n:,} vectors), "
+          f"{args.queries} queries, recall@{k} within the selected documents")
+    print(f"{'tier':<5} {'docs':>5} {'method':<22} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7} {'full k':>7}")
+
+    for tier in args.tiers:
+        store = build_store(tier, vectors, args.documents, args.exact_filter_max)
+        unfiltered_ms, _ = run(lambda q, s: store.search(q, top_k=k), queries, [[]] * len(queries))
+        print(f"{tier:<5} {'all':>5} {'unfiltered':<22} {np.percentile(unfiltered_ms, 50):>8.3f} "
+              f"{np.percentile(unfiltered_ms, 95):>8.3f} {'-':>7} {'-':>7}")
+        for select in args.select:
+            selections = [rng.choice(args.documents, select, replace=False) for _ in range(len(queries))]
+            truth = exact_truth(vectors, queries, selections, args.chunks_per_document, k)
+            matching = select * args.chunks_per_document
+
+            def post_filter(q, sources):
+                wanted = set(sources)
+                hits = [r for r in store.search(q, top_k=k * args.overfetch) if r[0]['source'] in wanted]
+                return hits[:k]
+
+            methods = [('filtered', lambda q, s: store.search(q, top_k=k, sources=s)),
+                       (f'post-filter x{args.overfetch}', post_filter)]
+            if matching <= args.exact_filter_max:
+                # The same filter through the index's id selector, for comparison with exact scoring.
+                def bitmap_only(q, sources):
+                    store.exact_filter_max = 0
+                    try:
+                        return store.search(q, top_k=k, sources=sources)
+                    finally:
+                        store.exact_filter_max = args.exact_filter_max
+                methods.insert(1, ('filtered (bitmap only)', bitmap_only))
+            for name, search in methods:
+                ms, ids = run(search, queries, selections)
+                full = np.mean([len(r) == k for r in ids])
+                print(f"{tier:<5} {select:>5} {name:<22} {np.percentile(ms, 50):>8.3f} "
+                      f"{np.percentile(ms, 95):>8.3f} {recall(ids, truth, k):>7.3f} {full:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
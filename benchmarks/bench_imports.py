@@ -0,0 +1,82 @@
+"""Benchmark - Cold import time of the app and of each rag module, plus the cost of preload().
+
+Run from the repository root:
+    python -m benchmarks.bench_imports --repeat 5 --output imports.json
+    python -m benchmarks.bench_imports --compare imports.json
+
+Every measurement is a fresh interpreter, so nothing is shared between runs beyond the
+OS file cache. Heavy libraries pulled in by an import are listed next to it.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+from rag.lazy import HEAVY_MODULES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SCRIPT = ("import sys, time, json; start = time.perf_counter(); import {module}; "
+                 "elapsed = time.perf_counter() - start; "
+                 "print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))")
+PRELOAD_SCRIPT = "import json, rag; print(json.dumps(rag.preload()))"
+
+
+def run_python(script: str) -> tuple:
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True,
+                         env={**os.environ, 'HF_HUB_OFFLINE': '1'}).stdout
+    return time.perf_counter() - start, json.loads(out.strip().splitlines()[-1])
+
+
+def rag_modules():
+    names = sorted(f[:-3] for f in os.listdir(os.path.join(ROOT, 'rag')) if f.endswith('.py') and f != '__init__.py')
+    return [f"rag.{name}" for name in names]
+
+
+def measure(module: str, repeat: int) -> dict:
+    runs = [run_python(IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)) for _ in range(repeat)]
+    return {'import_s': min(r[1]['seconds'] for r in runs), 'process_s': min(r[0] for r in runs),
+            'heavy': runs[0][1]['heavy']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per module; the best is kept")
+    parser.add_argument('--modules', nargs='+', help="Defaults to app, rag and every rag submodule")
+    parser.add_argument('--no-preload', action='store_true', help="Skip timing rag.preload()")
+    parser.add_argument('--output', help="Write results as JSON")
+    parser.add_argument('--compare', help="Print ratios against an earlier results file")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['imports']
+    interpreter_s = min(run_python("print('{}')")[0] for _ in range(args.repeat))
+    print(f"Interpreter start-up: {interpreter_s * 1000:.0f} ms")
+    print(f"{'module':<24} {'import ms':>10} {'process ms':>11} {'vs baseline':>12}  heavy libraries loaded")
+    results = {}
+    for module in args.modules or ['app', 'rag'] + rag_modules():
+        result = results[module] = measure(module, args.repeat)
+        before = baseline.get(module)
+        ratio = f"{result['import_s'] / before['import_s']:>11.2f}x" if before and before['import_s'] else ''
+        print(f"{module:<24} {result['import_s'] * 1000:>10.1f} {result['process_s'] * 1000:>11.1f} {ratio:>12}  "
+              f"{', '.join(result['heavy']) or '-'}")
+
+    preload = {}
+    if not args.no_preload:
+        _, preload = run_python(PRELOAD_SCRIPT)
+        print("\nrag.preload(): " + ', '.join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in preload.items())
+              + f"; total {sum(preload.values()):.2f}s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'interpreter_s': interpreter_s, 'imports': results,
+                       'preload': preload}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
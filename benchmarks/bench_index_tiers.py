@@ -0,0 +1,79 @@
+"""Benchmark - Recall and latency of the HNSW/IVF index tiers against the exact flat index.
+
+Run from the repository root:
+    python -m benchmarks.bench_index_tiers --vectors 200000 --queries 500
+"""
+
+import time
+import argparse
+import numpy as np
+
+from rag.vector_store import FAISSVectorStore
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    # Embeddings of real documents are clustered by topic, which is what ANN indexes exploit.
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_store(tier: str, vectors: np.ndarray) -> FAISSVectorStore:
+    thresholds = {'flat': (0, 0), 'hnsw': (1, 0), 'ivf': (0, 1)}[tier]
+    store = FAISSVectorStore(vectors.shape[1], hnsw_threshold=thresholds[0], ivf_threshold=thresholds[1],
+                             background_rebuild=False)
+    start = time.perf_counter()
+    store.add_embeddings(vectors, [{'row': i} for i in range(len(vectors))])
+    build_time = time.perf_counter() - start
+    assert store.tier == tier, store.tier
+    return store, build_time
+
+
+def run_queries(store: FAISSVectorStore, queries: np.ndarray, k: int):
+    latencies, ids = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results = store.search(q, top_k=k)
+        latencies.append(time.perf_counter() - start)
+        ids.append([meta['row'] for meta, _ in results])
+    return np.array(latencies) * 1000, ids
+
+
+def recall(ids, truth, k: int) -> float:
+    return float(np.mean([len(set(a[:k]) & set(b[:k])) / k for a, b in zip(ids, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vectors', type=int, default=100000)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--clusters', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[16, 32, 64, 128, 256])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    data = clustered_vectors(args.vectors + args.queries, args.dimension, args.clusters)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    k = args.top_k
+
+    flat, flat_build = build_store('flat', vectors)
+    flat_ms, truth = run_queries(flat, queries, k)
+    print(f"{args.vectors:,} vectors x {args.dimension} dims, {args.queries} queries, recall@{k}")
+    print(f"{'tier':<6} {'param':<14} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    print(f"{'flat':<6} {'exact':<14} {flat_build:>8.2f} {np.percentile(flat_ms, 50):>8.3f} "
+          f"{np.percentile(flat_ms, 95):>8.3f} {1.0:>7.3f}")
+
+    for tier, name, values in (('hnsw', 'ef_search', args.ef_search), ('ivf', 'nprobe', args.nprobe)):
+        store, build_time = build_store(tier, vectors)
+        for value in values:
+            store.set_search_params(**{name: value})
+            ms, ids = run_queries(store, queries, k)
+            print(f"{tier:<6} {f'{name}={value}':<14} {build_time:>8.2f} {np.percentile(ms, 50):>8.3f} "
+                  f"{np.percentile(ms, 95):>8.3f} {recall(ids, truth, k):>7.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Benchmark - Peak ingestion memory of whole-document vs streaming ingestion as PDFs grow.
+
+Run from the repository root:
+    python -m benchmarks.bench_ingest_memory --pages 50 200 800 --ceiling-mb 64
+    python -m benchmarks.bench_ingest_memory --random-embeddings --page-window 16 --output mem.json
+
+Each run ingests one synthetic PDF in a fresh process while a thread samples RSS. The
+working set is the peak RSS growth minus what the finished index and metadata account
+for, i.e. what the pipeline itself needed on the way (freed memory is rarely returned
+to the OS, so RSS after the run says little). Streaming must keep it under --ceiling-mb
+at every size (exit status 1 otherwise); whole-document ingestion is shown for comparison.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import numpy as np
+
+from config import Config
+from rag import PDFLoader, TextCleaner, TextChunker, EmbeddingGenerator, FAISSVectorStore, IngestionJobManager
+from benchmarks.bench_persistence import rss_mb
+from benchmarks.synthetic_pdf import synthetic_pages, write_pdf
+
+
+class RSSSampler(threading.Thread):
+    def __init__(self, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_mb()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def stop(self) -> float:
+        self._done.set()
+        self.join()
+        return max(self.peak, rss_mb())
+
+
+class RandomEmbeddings:
+    # Stands in for the model when only pipeline memory is of interest.
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self.rng = np.random.default_rng(0)
+
+    def get_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def generate_cached_embeddings(self, texts, batch_size: int = 32) -> np.ndarray:
+        return self.rng.standard_normal((len(texts), self.dimension), dtype=np.float32)
+
+
+def ingest_whole(path, loader, cleaner, chunker, embed_gen, vector_store, args) -> None:
+    # The pipeline before streaming: every page, the cleaned document and all chunks at once.
+    pages = list(loader.iter_pages(path))
+    document = {'filename': os.path.basename(path), 'file_path': path, 'total_pages': len(pages), 'pages': pages}
+    cleaned = cleaner.clean_documents([document])
+    chunks = chunker.chunk_documents(cleaned, start_id=vector_store.next_id)
+    for i in range(0, len(chunks), args.embed_batch):
+        batch = chunks[i:i + args.embed_batch]
+        vector_store.add_embeddings(embed_gen.generate_cached_embeddings([c['text'] for c in batch]), batch)
+
+
+def ingest_streaming(path, loader, cleaner, chunker, embed_gen, vector_store, args) -> None:
+    # Through the upload job path, as the app runs it.
+    manager = IngestionJobManager(max_workers=1, embed_batch_size=args.embed_batch, page_window=args.page_window)
+    session = {'pdf_loader': loader, 'text_cleaner': cleaner, 'chunker': chunker, 'embedding_gen': embed_gen,
+               'vector_store': vector_store, 'documents': [], 'ingest_lock': threading.Lock()}
+    job = manager.submit('bench', [path], session)
+    while not job.finished:
+        time.sleep(0.01)
+    manager.shutdown()
+    if job.errors:
+        raise RuntimeError(job.errors[0]['error'])
+
+
+def child(mode: str, path: str, args) -> None:
+    embed_gen = RandomEmbeddings() if args.random_embeddings else EmbeddingGenerator(args.embedding_model)
+    chunker = TextChunker(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                          tokenizer_name=args.tokenizer_model)
+    # Warm every component on a small document so lazy imports and model loads are in the baseline.
+    warm = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
+    warm.close()
+    write_pdf(warm.name, synthetic_pages(2, 100, seed=99))
+    components = (PDFLoader(max_workers=args.pdf_workers), TextCleaner(), chunker, embed_gen)
+    ingest = ingest_streaming if mode == 'streaming' else ingest_whole
+    ingest(warm.name, *components, FAISSVectorStore(embed_gen.get_embedding_dimension(), background_rebuild=False), args)
+    os.unlink(warm.name)
+
+    vector_store = FAISSVectorStore(embed_gen.get_embedding_dimension(), background_rebuild=False)
+    baseline = rss_mb()
+    sampler = RSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    ingest(path, *components, vector_store, args)
+    seconds = time.perf_counter() - start
+    peak = sampler.stop() - baseline
+    index = vector_store.memory_usage() / 2 ** 20
+    print(json.dumps({'seconds': seconds, 'chunks': vector_store.count, 'peak_mb': peak,
+                      'index_mb': index, 'working_mb': max(0.0, peak - index)}))
+
+
+def measure(mode: str, path: str, argv) -> dict:
+    out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_ingest_memory', '--child', mode, path] + argv,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[50, 200, 800], help="Document sizes to ingest")
+    parser.add_argument('--words-per-page', type=int, default=400)
+    parser.add_argument('--modes', nargs='+', choices=['whole', 'streaming'], default=['whole', 'streaming'])
+    parser.add_argument('--ceiling-mb', type=float, default=64.0, help="Allowed streaming working set")
+    parser.add_argument('--page-window', type=int, default=Config.INGEST_PAGE_WINDOW)
+    parser.add_argument('--embed-batch', type=int, default=Config.INGEST_EMBED_BATCH)
+    parser.add_argument('--pdf-workers', type=int, default=Config.PDF_WORKERS)
+    parser.add_argument('--chunk-size', type=int, default=Config.CHUNK_SIZE)
+    parser.add_argument('--chunk-overlap', type=int, default=Config.CHUNK_OVERLAP)
+    parser.add_argument('--embedding-model', default=Config.EMBEDDING_MODEL)
+    parser.add_argument('--tokenizer-model', default=Config.TOKENIZER_MODEL)
+    parser.add_argument('--random-embeddings', action='store_true', help="Skip the model; random vectors")
+    parser.add_argument('--pdf-dir', help="Reuse or keep the generated PDFs here instead of a temp directory")
+    parser.add_argument('--output', help="Write results as JSON")
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], args.child[1], args)
+        return
+
+    argv = sys.argv[1:]
+    pdf_dir = args.pdf_dir or tempfile.mkdtemp(prefix='bench-ingest-')
+    os.makedirs(pdf_dir, exist_ok=True)
+    results = []
+    try:
+        print(f"{'pages':>6} {'MB pdf':>7} {'mode':<10} {'chunks':>7} {'seconds':>8} {'peak MB':>8} "
+              f"{'index MB':>9} {'working MB':>11}")
+        for pages in args.pages:
+            path = os.path.join(pdf_dir, f"synthetic-{pages}p-{args.words_per_page}w.pdf")
+            if not os.path.exists(path):
+                write_pdf(path, synthetic_pages(pages, args.words_per_page))
+            size_mb = os.path.getsize(path) / 2 ** 20
+            for mode in args.modes:
+                m = measure(mode, path, argv)
+                results.append({'pages': pages, 'pdf_mb': size_mb, 'mode': mode, **m})
+                print(f"{pages:>6} {size_mb:>7.1f} {mode:<10} {m['chunks']:>7} {m['seconds']:>8.2f} "
+                      f"{m['peak_mb']:>8.1f} {m['index_mb']:>9.1f} {m['working_mb']:>11.1f}")
+    finally:
+        if not args.pdf_dir:
+            shutil.rmtree(pdf_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': {k: v for k, v in vars(args).items() if k not in ('output', 'child')},
+                       'runs': results}, f, indent=2)
+
+    streaming = [r for r in results if r['mode'] == 'streaming']
+    worst = max((r['working_mb'] for r in streaming), default=0.0)
+    print(f"\nStreaming working set: at most {worst:.1f} MB (ceiling {args.ceiling_mb:.0f} MB)")
+    if worst > args.ceiling_mb:
+        print("FAIL: streaming ingestion exceeded the memory ceiling")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
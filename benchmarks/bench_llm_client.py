@@ -0,0 +1,113 @@
+"""Benchmark - Shared LLM client against the stub server: pooling, concurrency cap, coalescing, retries.
+
+Run from the repository root (no network, no API key):
+    python -m benchmarks.bench_llm_client --clients 32 --requests 256 --latency 0.05
+
+Every scenario prints throughput, latency and what the stub server actually received.
+"""
+
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from groq import Groq
+
+from rag import AnswerGenerator, AsyncLLMClient, LLMClient
+from benchmarks.stub_llm import start_stub_server
+from benchmarks.bench_pipeline import percentiles
+
+MESSAGES = [{'role': 'user', 'content': 'Summarize the quarterly revenue findings. #{}'}]
+
+
+def messages(n: int):
+    return [{**MESSAGES[0], 'content': MESSAGES[0]['content'].format(n)}]
+
+
+def run_threads(call, count: int, clients: int) -> dict:
+    latencies = []
+
+    def one(n):
+        start = time.perf_counter()
+        call(n)
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, range(count)))
+    return {'requests_per_s': count / (time.perf_counter() - start), **percentiles(latencies)}
+
+
+def report(name: str, result: dict, server, extra: str = '') -> None:
+    print(f"{name:<28} {result['requests_per_s']:>8.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} "
+          f"{server.requests:>9} {server.max_active:>11}  {extra}")
+
+
+def scenario(args, name: str, call_factory, distinct: bool = True, failures: int = 0):
+    server, url = start_stub_server(latency=args.latency, failures=failures)
+    try:
+        call, stats = call_factory(url)
+        result = run_threads(lambda n: call(messages(n if distinct else 0)), args.requests, args.clients)
+        report(name, result, server, stats())
+    finally:
+        server.shutdown()
+
+
+def per_session_client(url):
+    # The old behaviour: a fresh SDK client (and connection pool) per session and call.
+    def call(msgs):
+        Groq(api_key='benchmark', base_url=url).chat.completions.create(model='stub', messages=msgs)
+    return call, lambda: ''
+
+
+def shared_client(args, **kwargs):
+    def factory(url):
+        client = LLMClient('benchmark', url, max_concurrency=args.max_concurrency, backoff_base=0.05, **kwargs)
+        stats = client.get_stats
+        return (lambda msgs: client.complete('stub', msgs)), \
+            lambda: ', '.join(f"{k}={v}" for k, v in stats().items() if k in ('coalesced', 'retries', 'errors'))
+    return factory
+
+
+async def async_streams(args, url) -> dict:
+    generator = AnswerGenerator(api_key='benchmark', base_url=url,
+                                async_client=AsyncLLMClient('benchmark', url, max_concurrency=args.max_concurrency))
+    latencies = []
+
+    async def one(n):
+        start = time.perf_counter()
+        async for _ in generator.agenerate_stream(f"question {n}", "context"):
+            pass
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    await generator.async_client.close()
+    return {'requests_per_s': args.requests / elapsed, **percentiles(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32, help="Concurrent callers")
+    parser.add_argument('--requests', type=int, default=256)
+    parser.add_argument('--latency', type=float, default=0.05, help="Stub seconds per completion")
+    parser.add_argument('--max-concurrency', type=int, default=8)
+    parser.add_argument('--failures', type=int, default=32, help="429s injected in the retry scenario")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests from {args.clients} callers, stub latency {args.latency * 1000:.0f} ms, "
+          f"max_concurrency={args.max_concurrency}")
+    print(f"{'scenario':<28} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'upstream':>9} {'max active':>11}")
+    scenario(args, 'per-session clients', per_session_client)
+    scenario(args, 'shared client', shared_client(args, coalesce=False))
+    scenario(args, 'identical, no coalescing', shared_client(args, coalesce=False), distinct=False)
+    scenario(args, 'identical, coalesced', shared_client(args), distinct=False)
+    scenario(args, f'{args.failures} injected 429s', shared_client(args), failures=args.failures)
+
+    server, url = start_stub_server(latency=args.latency)
+    try:
+        report('async streams', asyncio.run(async_streams(args, url)), server)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
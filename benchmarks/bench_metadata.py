@@ -0,0 +1,105 @@
+"""Benchmark - Memory and row-access cost of chunk metadata as a list of dicts vs the columnar store.
+
+Run from the repository root:
+    python -m benchmarks.bench_metadata --chunks 1000000
+
+Each layout is built in a fresh process, so the RSS growth reported is what holding the
+metadata costs. The dict layout is what the store kept before: one dict per chunk with
+its own copy of the text, ids and source name.
+"""
+
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+
+from rag.metadata_store import ChunkMetadataStore
+from benchmarks.bench_persistence import rss_mb
+from benchmarks.synthetic_pdf import synthetic_pages
+
+
+def chunk_batches(chunks: int, chunks_per_document: int, text_chars: int, overlap: int, batch: int):
+    # Overlapping character windows over synthetic documents, in ingestion-sized batches.
+    pool = ' '.join(synthetic_pages(40, 400))
+    step = text_chars - overlap
+    rows = []
+    for n in range(chunks):
+        document, chunk_id = divmod(n, chunks_per_document)
+        offset = (document * 7919 + chunk_id * step) % (len(pool) - text_chars)
+        rows.append({'chunk_id': chunk_id, 'text': pool[offset:offset + text_chars],
+                     'source': f"document-{document:06d}.pdf", 'token_count': text_chars // 4,
+                     'global_chunk_id': n})
+        if len(rows) == batch:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def child(layout: str, args) -> None:
+    gc.collect()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    if layout == 'dicts':
+        store = []
+        for rows in chunk_batches(args.chunks, args.chunks_per_document, args.text_chars, args.overlap, args.batch):
+            # Copied per chunk, as add_embeddings used to do.
+            store.extend({k: v for k, v in row.items()} for row in rows)
+    else:
+        store = ChunkMetadataStore()
+        for rows in chunk_batches(args.chunks, args.chunks_per_document, args.text_chars, args.overlap, args.batch):
+            store.extend(rows)
+    build_s = time.perf_counter() - start
+    gc.collect()
+    rss = rss_mb() - rss_before
+
+    # Top-k style access: a handful of random rows per query, copied as search() does.
+    rng = random.Random(0)
+    picks = [rng.randrange(args.chunks) for _ in range(args.lookups)]
+    start = time.perf_counter()
+    for i in picks:
+        row = {**store[i], 'similarity_score': 0.5}
+    lookup_us = (time.perf_counter() - start) / len(picks) * 1e6
+    assert row['text'] and row['source']
+    estimate = store.memory_usage() / 2 ** 20 if layout == 'columnar' else None
+    print(json.dumps({'build_s': build_s, 'rss_mb': rss, 'lookup_us': lookup_us, 'estimate_mb': estimate}))
+
+
+def measure(layout: str, argv) -> dict:
+    out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_metadata', '--child', layout] + argv,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunks', type=int, default=1000000)
+    parser.add_argument('--chunks-per-document', type=int, default=400)
+    parser.add_argument('--text-chars', type=int, default=600)
+    parser.add_argument('--overlap', type=int, default=100)
+    parser.add_argument('--batch', type=int, default=64, help="Rows per add, as in ingestion")
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--child', choices=['dicts', 'columnar'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args)
+        return
+
+    argv = sys.argv[1:]
+    text_mb = args.chunks * args.text_chars / 2 ** 20
+    print(f"{args.chunks:,} chunks of {args.text_chars} chars ({text_mb:.0f} MB of text), "
+          f"{args.chunks // args.chunks_per_document:,} documents")
+    print(f"{'layout':<10} {'+RSS MB':>9} {'bytes/chunk':>12} {'overhead MB':>12} {'build s':>8} "
+          f"{'row us':>7} {'estimate MB':>12}")
+    for layout in ('dicts', 'columnar'):
+        m = measure(layout, argv)
+        estimate = f"{m['estimate_mb']:>12.0f}" if m['estimate_mb'] is not None else f"{'-':>12}"
+        print(f"{layout:<10} {m['rss_mb']:>9.0f} {m['rss_mb'] * 2 ** 20 / args.chunks:>12.0f} "
+              f"{m['rss_mb'] - text_mb:>12.0f} {m['build_s']:>8.2f} {m['lookup_us']:>7.2f} {estimate}")
+
+
+if __name__ == '__main__':
+    main()
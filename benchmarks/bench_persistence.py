@@ -0,0 +1,123 @@
+"""Benchmark - Load time, RSS and incremental save cost of the segmented store format vs metadata.json.
+
+Run from the repository root:
+    python -m benchmarks.bench_persistence --vectors 200000
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+import numpy as np
+import faiss
+
+from rag.vector_store import FAISSVectorStore
+
+WORDS = "the quarterly report shows revenue growth across all regions while operating costs remained stable".split()
+
+
+def make_batch(rng, start: int, n: int, dim: int):
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    text = ' '.join(WORDS[i % len(WORDS)] for i in range(500))
+    metadata = [{'chunk_id': i, 'text': f"{start + i} {text}", 'source': f"doc-{(start + i) // 1000}.pdf",
+                 'token_count': 500, 'global_chunk_id': start + i} for i in range(n)]
+    return vectors, metadata
+
+
+def save_legacy(store: FAISSVectorStore, path: str) -> None:
+    # The previous format: the whole index plus every metadata row as one JSON document.
+    os.makedirs(path, exist_ok=True)
+    faiss.write_index(store.index, os.path.join(path, "index.faiss"))
+    with open(os.path.join(path, "metadata.json"), 'w') as f:
+        json.dump(list(store.metadata), f)
+
+
+def rss_mb() -> float:
+    # Current resident set size; importing torch via the rag package leaves a high
+    # ru_maxrss watermark, so peak RSS alone would hide what the load itself costs.
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(path: str, dim: int) -> None:
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    store = FAISSVectorStore(dim)
+    assert store.load(path)
+    load_time = time.perf_counter() - start
+    query = np.random.default_rng(1).normal(size=dim).astype(np.float32)
+    start = time.perf_counter()
+    hits = store.search(query, top_k=5)
+    search_time = time.perf_counter() - start
+    print(json.dumps({'load_s': load_time, 'first_search_s': search_time, 'hits': len(hits),
+                      'rss_mb': rss_mb() - rss_before}))
+
+
+def measure(path: str, dim: int) -> dict:
+    out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_persistence', '--child', path,
+                          '--dimension', str(dim)], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def dir_size_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vectors', type=int, default=100000)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--append', type=float, default=0.01, help="Fraction of rows added before re-saving")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.dimension)
+        return
+
+    rng = np.random.default_rng(0)
+    store = FAISSVectorStore(args.dimension, hnsw_threshold=0, ivf_threshold=0)
+    store.add_embeddings(*make_batch(rng, 0, args.vectors, args.dimension))
+    workdir = tempfile.mkdtemp(prefix='bench_persistence_')
+    legacy_dir, segmented_dir = os.path.join(workdir, 'legacy'), os.path.join(workdir, 'segmented')
+    try:
+        start = time.perf_counter()
+        save_legacy(store, legacy_dir)
+        legacy_save = time.perf_counter() - start
+        start = time.perf_counter()
+        store.save(segmented_dir)
+        segmented_save = time.perf_counter() - start
+
+        extra = max(1, int(args.vectors * args.append))
+        store.add_embeddings(*make_batch(rng, args.vectors, extra, args.dimension))
+        start = time.perf_counter()
+        save_legacy(store, legacy_dir)
+        legacy_resave = time.perf_counter() - start
+        start = time.perf_counter()
+        store.save(segmented_dir)
+        segmented_resave = time.perf_counter() - start
+        # Fold the appended segment into the checkpoint so the load below can memory-map it.
+        store.save(segmented_dir, compact=True)
+
+        legacy, segmented = measure(legacy_dir, args.dimension), measure(segmented_dir, args.dimension)
+        print(f"{args.vectors:,} vectors x {args.dimension} dims, re-save after +{extra:,} rows")
+        print(f"{'format':<12} {'size MB':>8} {'save s':>8} {'re-save s':>10} {'load s':>8} "
+              f"{'1st search s':>13} {'+RSS MB':>8}")
+        for name, save_s, resave_s, path, m in (('metadata.json', legacy_save, legacy_resave, legacy_dir, legacy),
+                                                 ('segmented', segmented_save, segmented_resave, segmented_dir,
+                                                  segmented)):
+            print(f"{name:<12} {dir_size_mb(path):>8.1f} {save_s:>8.3f} {resave_s:>10.3f} {m['load_s']:>8.3f} "
+                  f"{m['first_search_s']:>13.4f} {m['rss_mb']:>8.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""Benchmark - End-to-end ingestion and query workload against synthetic PDFs and a stub LLM.
+
+Run from the repository root (needs the embedding model locally, no network):
+    python -m benchmarks.bench_pipeline --documents 4 --pages 50 --queries 200 --output run.json
+    python -m benchmarks.bench_pipeline --chunk-size 400 --compare run.json
+
+Reports wall time and throughput per stage, p50/p95/p99 query latency and RSS, and
+writes them as JSON so runs with different settings can be compared.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import numpy as np
+import faiss
+
+from config import Config
+from rag import (PDFLoader, TextCleaner, TextChunker, EmbeddingGenerator, FAISSVectorStore, Retriever,
+                 AnswerGenerator, ContextAssembler)
+from benchmarks.stub_llm import start_stub_server
+from benchmarks.synthetic_pdf import TOPICS, synthetic_pages, write_pdf
+from benchmarks.bench_persistence import rss_mb
+
+QUESTIONS = ["What does the document say about {} and {}?", "Summarize the {} {} findings.",
+             "How is {} related to {}?", "Which section covers {} {}?"]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 1024)
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name: str, seconds: float, items: int, unit: str) -> None:
+        stage = self.stages.setdefault(name, {'seconds': 0.0, 'items': 0, 'unit': unit})
+        stage['seconds'] += seconds
+        stage['items'] += items
+
+    def timed(self, name: str, unit: str, func, *args, count=len):
+        start = time.perf_counter()
+        result = func(*args)
+        self.add(name, time.perf_counter() - start, count(result), unit)
+        return result
+
+    def report(self) -> dict:
+        for stage in self.stages.values():
+            stage['throughput'] = stage['items'] / stage['seconds'] if stage['seconds'] else 0.0
+        return self.stages
+
+
+def percentiles(samples_ms) -> dict:
+    samples = np.asarray(samples_ms)
+    return {'mean': float(samples.mean()), 'p50': float(np.percentile(samples, 50)),
+            'p95': float(np.percentile(samples, 95)), 'p99': float(np.percentile(samples, 99))}
+
+
+def make_corpus(directory: str, documents: int, pages: int, words_per_page: int):
+    paths = []
+    for n in range(documents):
+        path = os.path.join(directory, f"synthetic-{n:03d}.pdf")
+        write_pdf(path, synthetic_pages(pages, words_per_page, seed=n))
+        paths.append(path)
+    return paths
+
+
+def make_queries(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    vocabulary = ' '.join(TOPICS.values()).split()
+    return [rng.choice(QUESTIONS).format(*rng.sample(vocabulary, 2)) for _ in range(count)]
+
+
+def ingest(paths, components, timer: StageTimer, embed_batch: int) -> dict:
+    loader, cleaner, chunker, embed_gen, vector_store = components
+    memory = {}
+    for path in paths:
+        pages = timer.timed('extract', 'pages', lambda: list(loader.iter_pages(path)))
+        document = {'filename': os.path.basename(path), 'file_path': path, 'total_pages': len(pages), 'pages': pages}
+        cleaned = timer.timed('clean', 'pages', cleaner.clean_documents, [document],
+                              count=lambda docs: len(docs[0]['pages']))
+        chunks = timer.timed('chunk', 'chunks', chunker.chunk_documents, cleaned, vector_store.next_id)
+        for i in range(0, len(chunks), embed_batch):
+            batch = chunks[i:i + embed_batch]
+            embeddings = timer.timed('embed', 'chunks', embed_gen.generate_embeddings, [c['text'] for c in batch])
+            timer.timed('index', 'chunks', vector_store.add_embeddings, embeddings, batch,
+                        count=lambda _: len(batch))
+        memory = {'rss_mb': rss_mb(), 'peak_rss_mb': peak_rss_mb()}
+    return memory
+
+
+def run_queries(queries, retriever: Retriever, answer_gen: AnswerGenerator, stream: bool) -> dict:
+    latencies = {'retrieve': [], 'generate': [], 'end_to_end': []}
+    start = time.perf_counter()
+    for query in queries:
+        t0 = time.perf_counter()
+        chunks, _ = retriever.retrieve_assembled(query)
+        t1 = time.perf_counter()
+        if stream:
+            for _ in answer_gen.generate_stream_with_sources(query, chunks):
+                pass
+        else:
+            answer_gen.generate_with_sources(query, chunks)
+        t2 = time.perf_counter()
+        latencies['retrieve'].append((t1 - t0) * 1000)
+        latencies['generate'].append((t2 - t1) * 1000)
+        latencies['end_to_end'].append((t2 - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    return {'count': len(queries), 'seconds': elapsed, 'queries_per_s': len(queries) / elapsed,
+            'latency_ms': {name: percentiles(values) for name, values in latencies.items()},
+            'rss_mb': rss_mb(), 'peak_rss_mb': peak_rss_mb()}
+
+
+def compare(current: dict, baseline: dict) -> None:
+    # Throughput rather than seconds, so runs over different corpus sizes still line up.
+    print(f"\nAgainst {baseline['config'].get('label') or 'baseline'} (current / baseline)")
+    for name, stage in current['stages'].items():
+        before = baseline['stages'].get(name)
+        if before and before['throughput']:
+            print(f"  {name:<16} {before['throughput']:>10.1f} -> {stage['throughput']:>10.1f} {stage['unit']}/s "
+                  f"{stage['throughput'] / before['throughput']:>6.2f}x")
+    for name, latency in current['queries']['latency_ms'].items():
+        before = baseline['queries']['latency_ms'].get(name)
+        if before and before['p95']:
+            print(f"  {name + ' p95':<16} {before['p95']:>10.2f} -> {latency['p95']:>10.2f} ms      "
+                  f"{latency['p95'] / before['p95']:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=50, help="Pages per document")
+    parser.add_argument('--words-per-page', type=int, default=400)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--chunk-size', type=int, default=Config.CHUNK_SIZE)
+    parser.add_argument('--chunk-overlap', type=int, default=Config.CHUNK_OVERLAP)
+    parser.add_argument('--top-k', type=int, default=Config.TOP_K_CHUNKS)
+    parser.add_argument('--context-max-tokens', type=int, default=Config.CONTEXT_MAX_TOKENS)
+    parser.add_argument('--embed-batch', type=int, default=Config.INGEST_EMBED_BATCH)
+    parser.add_argument('--pdf-workers', type=int, default=Config.PDF_WORKERS)
+    parser.add_argument('--embedding-model', default=Config.EMBEDDING_MODEL)
+    parser.add_argument('--tokenizer-model', default=Config.TOKENIZER_MODEL)
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Stub LLM seconds before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.0, help="Stub LLM seconds between tokens")
+    parser.add_argument('--stream', action='store_true', help="Query through the streaming endpoint path")
+    parser.add_argument('--pdf-dir', help="Reuse or keep the generated PDFs here instead of a temp directory")
+    parser.add_argument('--label', help="Name for this run in the results file")
+    parser.add_argument('--output', help="Write results as JSON")
+    parser.add_argument('--compare', help="Print ratios against an earlier results file")
+    args = parser.parse_args()
+
+    pdf_dir = args.pdf_dir or tempfile.mkdtemp(prefix='bench-pdfs-')
+    os.makedirs(pdf_dir, exist_ok=True)
+    server, base_url = start_stub_server(latency=args.llm_latency, token_delay=args.token_delay)
+    timer = StageTimer()
+    try:
+        start = time.perf_counter()
+        paths = make_corpus(pdf_dir, args.documents, args.pages, args.words_per_page)
+        generate_s = time.perf_counter() - start
+
+        # Model loading is timed on its own so it does not skew the embedding stage.
+        start = time.perf_counter()
+        embed_gen = EmbeddingGenerator(args.embedding_model)
+        chunker = TextChunker(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                              tokenizer_name=args.tokenizer_model)
+        chunker.count_tokens("warm up")
+        timer.add('load_models', time.perf_counter() - start, 1, 'models')
+
+        vector_store = FAISSVectorStore(embed_gen.get_embedding_dimension(), background_rebuild=False)
+        components = (PDFLoader(max_workers=args.pdf_workers), TextCleaner(), chunker, embed_gen, vector_store)
+        ingest_start = time.perf_counter()
+        ingest_memory = ingest(paths, components, timer, args.embed_batch)
+        ingest_s = time.perf_counter() - ingest_start
+
+        # No query or answer caches: every query pays for embedding, search and generation.
+        retriever = Retriever(embed_gen, vector_store, top_k=args.top_k,
+                              assembler=ContextAssembler(chunker, max_tokens=args.context_max_tokens))
+        answer_gen = AnswerGenerator(api_key='benchmark', base_url=base_url)
+        queries = run_queries(make_queries(args.queries), retriever, answer_gen, args.stream)
+    finally:
+        server.shutdown()
+        if not args.pdf_dir:
+            shutil.rmtree(pdf_dir, ignore_errors=True)
+
+    total_pages = args.documents * args.pages
+    results = {
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count(), 'faiss': faiss.__version__, 'time': time.time()},
+        'corpus': {'documents': args.documents, 'pages': total_pages, 'chunks': vector_store.count,
+                   'generate_pdfs_s': generate_s},
+        'ingestion': {'seconds': ingest_s, 'pages_per_s': total_pages / ingest_s,
+                      'chunks_per_s': vector_store.count / ingest_s, **ingest_memory},
+        'stages': timer.report(),
+        'queries': queries,
+        'llm_requests': server.requests,
+    }
+
+    print(f"{args.documents} documents x {args.pages} pages, {vector_store.count} chunks, "
+          f"{args.queries} queries, chunk_size={args.chunk_size} top_k={args.top_k}")
+    print(f"{'stage':<12} {'seconds':>9} {'items':>8} {'throughput':>16}")
+    for name, stage in results['stages'].items():
+        print(f"{name:<12} {stage['seconds']:>9.3f} {stage['items']:>8} "
+              f"{stage['throughput']:>10.1f} {stage['unit']}/s")
+    print(f"{'ingestion':<12} {ingest_s:>9.3f} {total_pages:>8} {total_pages / ingest_s:>10.1f} pages/s")
+    print(f"\n{'query':<12} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, latency in queries['latency_ms'].items():
+        print(f"{name:<12} {latency['mean']:>9.2f} {latency['p50']:>9.2f} {latency['p95']:>9.2f} {latency['p99']:>9.2f}")
+    print(f"{queries['queries_per_s']:.1f} queries/s; RSS {queries['rss_mb']:.0f} MB, "
+          f"peak {queries['peak_rss_mb']:.0f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
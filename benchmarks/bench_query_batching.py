@@ -0,0 +1,60 @@
+"""Benchmark - Concurrent query embedding with and without the micro-batcher.
+
+Run from the repository root (needs the embedding model locally, no network):
+    python -m benchmarks.bench_query_batching --clients 1 4 16 --queries 400 --max-wait-ms 2
+
+Each client thread encodes its share of the queries one at a time, as /query does.
+"""
+
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from rag import EmbeddingBatcher, EmbeddingGenerator
+from benchmarks.bench_pipeline import make_queries, percentiles
+
+
+def run(encode, queries, clients: int) -> dict:
+    latencies = []
+
+    def client(share):
+        for query in share:
+            start = time.perf_counter()
+            encode(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, [queries[i::clients] for i in range(clients)]))
+    elapsed = time.perf_counter() - start
+    return {'queries_per_s': len(queries) / elapsed, **percentiles(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=Config.EMBEDDING_MODEL)
+    parser.add_argument('--queries', type=int, default=400)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--max-wait-ms', type=float, default=Config.QUERY_BATCH_MAX_WAIT_MS)
+    parser.add_argument('--max-batch', type=int, default=Config.QUERY_BATCH_MAX_SIZE)
+    args = parser.parse_args()
+
+    generator = EmbeddingGenerator(args.model)
+    encode_one = lambda text: generator.backend.encode_batch([text])[0]
+    queries = make_queries(args.queries)
+    encode_one(queries[0])
+
+    print(f"{args.queries} queries, max_wait={args.max_wait_ms}ms, max_batch={args.max_batch}")
+    print(f"{'clients':>7} {'mode':<8} {'queries/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean batch':>11}")
+    for clients in args.clients:
+        # A fresh batcher per row so the batch sizes reflect this concurrency level only.
+        batcher = EmbeddingBatcher(generator.backend.encode_batch, args.max_wait_ms, args.max_batch)
+        for mode, encode in (('direct', encode_one), ('batched', batcher.encode)):
+            result = run(encode, queries, clients)
+            mean_batch = f"{batcher.get_stats()['mean_batch_size']:.2f}" if mode == 'batched' else '1.00'
+            print(f"{clients:>7} {mode:<8} {result['queries_per_s']:>10.1f} {result['p50']:>8.2f} "
+                  f"{result['p95']:>8.2f} {result['p99']:>8.2f} {mean_batch:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Stub LLM - A local server that mimics the Groq/OpenAI chat-completions API.
+
+Point the app at it with GROQ_BASE_URL=http://127.0.0.1:8765 (any GROQ_API_KEY works):
+    python -m benchmarks.stub_llm --port 8765 --token-delay 0.02
+"""
+
+import json
+import time
+import uuid
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+DEFAULT_ANSWER = ("Based on the provided context, the document describes the requested topic "
+                  "in detail and summarizes the key findings.")
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, Nagle's algorithm and delayed
+    # ACKs add ~40 ms to every non-streamed response on a keep-alive connection.
+    disable_nagle_algorithm = True
+    # Overridden per server in start_stub_server.
+    answer = DEFAULT_ANSWER
+    latency = 0.0
+    token_delay = 0.0
+    failure_status = 429
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            fail = server.failures > 0
+            server.failures -= fail
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            if fail:
+                self._send_json({'error': {'message': 'Injected failure', 'type': 'stub_error'}},
+                                self.failure_status)
+            else:
+                self._complete(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _send_json(self, body, status: int = 200) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _complete(self, body) -> None:
+        time.sleep(self.latency)
+        prompt_tokens = sum(len(m.get('content', '').split()) for m in body.get('messages', []))
+        tokens = [w + ' ' for w in self.answer.split()]
+        tokens[-1] = tokens[-1].rstrip()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get('model', 'stub')
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(tokens),
+                 'total_tokens': prompt_tokens + len(tokens)}
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for i, token in enumerate(tokens + [None]):
+                delta = {'content': token} if token is not None else {}
+                if i == 0:
+                    delta['role'] = 'assistant'
+                chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                         'model': model, 'choices': [{'index': 0, 'delta': delta,
+                                                      'finish_reason': None if token is not None else 'stop'}]}
+                if token is None:
+                    chunk['x_groq'] = {'id': completion_id, 'usage': usage}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                if token is not None:
+                    time.sleep(self.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        time.sleep(self.token_delay * len(tokens))
+        self._send_json({
+            'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                         'finish_reason': 'stop', 'logprobs': None}],
+            'usage': usage
+        })
+
+
+def start_stub_server(host: str = '127.0.0.1', port: int = 0, answer: str = DEFAULT_ANSWER,
+                      latency: float = 0.0, token_delay: float = 0.0, failures: int = 0,
+                      failure_status: int = 429) -> Tuple[ThreadingHTTPServer, str]:
+    # The first `failures` requests get failure_status, to exercise client retries;
+    # server.max_active records the highest number of concurrent requests.
+    handler = type('Handler', (StubLLMHandler,), {'answer': answer, 'latency': latency,
+                                                  'token_delay': token_delay, 'failure_status': failure_status})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.failures = failures
+    server.active = 0
+    server.max_active = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument('--failures', type=int, default=0, help="Fail this many requests first")
+    parser.add_argument('--failure-status', type=int, default=429)
+    args = parser.parse_args()
+    server, url = start_stub_server(args.host, args.port, latency=args.latency, token_delay=args.token_delay,
+                                    failures=args.failures, failure_status=args.failure_status)
+    print(f"Stub LLM listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
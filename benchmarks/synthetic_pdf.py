@@ -0,0 +1,82 @@
+"""Synthetic PDFs - Writes multi-page text PDFs without any PDF library.
+
+    python -m benchmarks.synthetic_pdf out.pdf --pages 100
+"""
+
+import random
+import argparse
+import textwrap
+from typing import List
+
+TOPICS = {
+    'finance': "revenue quarterly margin forecast budget audit invoice dividend liquidity capital",
+    'legal': "contract clause liability warranty jurisdiction arbitration compliance indemnity statute",
+    'medical': "patient diagnosis dosage clinical symptom therapy trial placebo cardiology",
+    'engineering': "bearing tolerance torque firmware sensor calibration voltage assembly throughput",
+    'travel': "itinerary departure terminal luggage reservation visa customs boarding layover",
+}
+COMMON = ("the a of and to in for with on by this that is was were are report section "
+          "results table shows during across while compared previous year").split()
+
+
+def synthetic_pages(count: int, words_per_page: int = 400, seed: int = 0) -> List[str]:
+    # Each page leans on one topic so that queries have a meaningful nearest neighbour.
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    pages = []
+    for number in range(count):
+        topic = TOPICS[topics[(seed + number) % len(topics)]].split()
+        sentences, words = [], 0
+        while words < words_per_page:
+            length = rng.randint(8, 20)
+            sentence = [rng.choice(topic) if rng.random() < 0.35 else rng.choice(COMMON) for _ in range(length)]
+            sentences.append(' '.join(sentence).capitalize() + '.')
+            words += length
+        pages.append(' '.join(sentences))
+    return pages
+
+
+def _escape(line: str) -> str:
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path: str, pages: List[str], line_width: int = 95) -> None:
+    # Catalog, page tree and one shared Type1 font, then a content stream and page object per page.
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = textwrap.wrap(text, line_width) or ['']
+        ops = ["BT /F1 9 Tf 36 806 Td 11 TL"] + [f"({_escape(l)}) Tj T*" for l in lines] + ["ET"]
+        stream = '\n'.join(ops).encode('latin-1', 'replace')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {len(objects)} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R >> >> >>".encode())
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b''.join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--words-per-page', type=int, default=400)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_pdf(args.path, synthetic_pages(args.pages, args.words_per_page, args.seed))
+
+
+if __name__ == '__main__':
+    main()
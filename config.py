@@ -12,19 +12,70 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default-secret-key')
     GROQ_API_KEY = os.getenv('GROQ_API_KEY')
     LLM_MODEL = os.getenv('LLM_MODEL', 'llama-3.3-70b-versatile')
+    GROQ_BASE_URL = os.getenv('GROQ_BASE_URL')
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 3))
+    LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', 0.5))
+    LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', 8))
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 60))
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 20))
+    LLM_COALESCE = os.getenv('LLM_COALESCE', 'true').lower() == 'true'
     EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+    EMBEDDING_QUANTIZE = os.getenv('EMBEDDING_QUANTIZE', 'false').lower() == 'true'
+    EMBEDDING_THREADS = int(os.getenv('EMBEDDING_THREADS', 0))
+    EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv('EMBEDDING_MAX_BATCH_TOKENS', 8192))
+    TOKENIZER_MODEL = os.getenv('TOKENIZER_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+    PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'false').lower() == 'true'
+    CONTEXT_MAX_TOKENS = int(os.getenv('CONTEXT_MAX_TOKENS', 3000))
     TOP_K_CHUNKS = int(os.getenv('TOP_K_CHUNKS', 5))
     CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', 800))
     CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', 150))
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     FAISS_INDEX_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'faiss_index')
+    SESSION_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sessions')
+    ONNX_MODEL_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onnx_models')
+    EMBEDDING_CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'embedding_cache')
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 200000))
+    INDEX_HNSW_THRESHOLD = int(os.getenv('INDEX_HNSW_THRESHOLD', 50000))
+    INDEX_IVF_THRESHOLD = int(os.getenv('INDEX_IVF_THRESHOLD', 500000))
+    HNSW_M = int(os.getenv('HNSW_M', 32))
+    HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', 64))
+    IVF_NPROBE = int(os.getenv('IVF_NPROBE', 16))
+    INDEX_COMPRESSION = os.getenv('INDEX_COMPRESSION', 'none').lower()
+    INDEX_COMPRESS_THRESHOLD = int(os.getenv('INDEX_COMPRESS_THRESHOLD', 10000))
+    INDEX_PQ_M = int(os.getenv('INDEX_PQ_M', 48))
+    INDEX_RERANK_FACTOR = int(os.getenv('INDEX_RERANK_FACTOR', 4))
     ALLOWED_EXTENSIONS = {'pdf'}
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024
+    PDF_WORKERS = int(os.getenv('PDF_WORKERS', 0))
+    PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', 16))
+    CLEAN_WORKERS = int(os.getenv('CLEAN_WORKERS', 0))
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 2))
+    INGEST_MAX_PENDING = int(os.getenv('INGEST_MAX_PENDING', 16))
+    INGEST_EMBED_BATCH = int(os.getenv('INGEST_EMBED_BATCH', 64))
+    INGEST_PAGE_WINDOW = int(os.getenv('INGEST_PAGE_WINDOW', 32))
+    QUERY_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_CACHE_MAX_ENTRIES', 1024))
+    QUERY_CACHE_TTL = int(os.getenv('QUERY_CACHE_TTL', 3600))
+    QUERY_BATCH_ENABLED = os.getenv('QUERY_BATCH_ENABLED', 'true').lower() == 'true'
+    QUERY_BATCH_MAX_WAIT_MS = float(os.getenv('QUERY_BATCH_MAX_WAIT_MS', 2))
+    QUERY_BATCH_MAX_SIZE = int(os.getenv('QUERY_BATCH_MAX_SIZE', 32))
+    BATCH_QUERY_MAX_QUESTIONS = int(os.getenv('BATCH_QUERY_MAX_QUESTIONS', 256))
+    BATCH_QUERY_WORKERS = int(os.getenv('BATCH_QUERY_WORKERS', 8))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 256))
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 3600))
+    SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', 100))
+    SESSION_MAX_MEMORY_MB = int(os.getenv('SESSION_MAX_MEMORY_MB', 2048))
+    SESSION_IDLE_TTL = int(os.getenv('SESSION_IDLE_TTL', 1800))
 
     @staticmethod
     def init_app():
         os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
         os.makedirs(Config.FAISS_INDEX_FOLDER, exist_ok=True)
+        os.makedirs(Config.SESSION_FOLDER, exist_ok=True)
+        if Config.EMBEDDING_CACHE_ENABLED:
+            os.makedirs(Config.EMBEDDING_CACHE_FOLDER, exist_ok=True)
 
     @staticmethod
     def allowed_file(filename):
@@ -1,12 +1,41 @@
 """RAG Pipeline Module."""
 
-from .pdf_loader import PDFLoader
-from .text_cleaner import TextCleaner
-from .chunker import TextChunker
-from .embeddings import EmbeddingGenerator
-from .vector_store import FAISSVectorStore
-from .retriever import Retriever
-from .generator import AnswerGenerator
-
-__all__ = ['PDFLoader', 'TextCleaner', 'TextChunker', 'EmbeddingGenerator', 
-           'FAISSVectorStore', 'Retriever', 'AnswerGenerator']
+import importlib
+
+# Public name -> submodule. Submodules are imported on first access, so importing one
+# part of the package (or the app) does not load the rest.
+_EXPORTS = {
+    'preload': 'lazy',
+    'ModelRegistry': 'registry', 'model_registry': 'registry',
+    'MetricsRegistry': 'metrics', 'metrics_registry': 'metrics', 'collect_timings': 'metrics',
+    'PDFLoader': 'pdf_loader',
+    'TextCleaner': 'text_cleaner',
+    'TextChunker': 'chunker',
+    'LRUCache': 'cache',
+    'EmbeddingCache': 'embedding_cache',
+    'EmbeddingBatcher': 'batcher',
+    'EmbeddingGenerator': 'embeddings',
+    'FAISSVectorStore': 'vector_store',
+    'ContextAssembler': 'context',
+    'Retriever': 'retriever',
+    'LLMClient': 'llm_client', 'AsyncLLMClient': 'llm_client',
+    'AnswerGenerator': 'generator',
+    'IngestionJob': 'ingestion', 'IngestionJobManager': 'ingestion', 'IngestionQueueFull': 'ingestion',
+    'content_hash': 'ingestion',
+    'SessionManager': 'session_manager',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
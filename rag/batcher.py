@@ -0,0 +1,83 @@
+"""Embedding Batcher - Coalesces concurrent single-query encodes into one model call."""
+
+import time
+import queue
+import threading
+import numpy as np
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+from .metrics import metrics_registry
+
+QUERY_BATCH_SIZE = metrics_registry.histogram('rag_query_batch_size', 'Queries per micro-batched embedding call.',
+                                              buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+QUERY_QUEUE_DEPTH = metrics_registry.gauge('rag_query_batch_queue_depth',
+                                           'Queries waiting for the embedding micro-batcher.')
+
+
+class EmbeddingBatcher:
+    def __init__(self, encode_batch: Callable[[List[str]], np.ndarray], max_wait_ms: float = 2.0,
+                 max_batch: int = 32):
+        self.encode_batch = encode_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._queue = queue.Queue()
+        self._last_batch_size = 1
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'batches': 0, 'max_batch_size': 0, 'errors': 0}
+        threading.Thread(target=self._run, daemon=True, name='embedding-batcher').start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._queue.put((text, future))
+        QUERY_QUEUE_DEPTH.set(self._queue.qsize())
+        return future
+
+    def encode(self, text: str) -> np.ndarray:
+        return self.submit(text).result()
+
+    def _collect(self) -> List:
+        # Block for the first query, then give others up to max_wait to join it. The wait
+        # only applies once the previous batch showed concurrent callers, so a lone query
+        # is not delayed; anything already queued is always taken.
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + (self.max_wait if self._last_batch_size > 1 else 0)
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.perf_counter()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._last_batch_size = len(batch)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            QUERY_QUEUE_DEPTH.set(self._queue.qsize())
+            QUERY_BATCH_SIZE.observe(len(batch))
+            # Callers that gave up (cancelled futures) are dropped from the model call.
+            live = [(t, f) for t, f in batch if f.set_running_or_notify_cancel()]
+            futures = [f for _, f in live]
+            try:
+                embeddings = self.encode_batch([t for t, _ in live]) if live else []
+                for future, embedding in zip(futures, embeddings):
+                    future.set_result(embedding)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                with self._stats_lock:
+                    self._stats['errors'] += 1
+            with self._stats_lock:
+                self._stats['requests'] += len(batch)
+                self._stats['batches'] += 1
+                self._stats['max_batch_size'] = max(self._stats['max_batch_size'], len(batch))
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['mean_batch_size'] = round(stats['requests'] / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['queue_depth'] = self._queue.qsize()
+        stats['max_wait_ms'] = self.max_wait * 1000
+        stats['max_batch'] = self.max_batch
+        return stats
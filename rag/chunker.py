@@ -1,17 +1,23 @@
 """Text Chunker - Splits text into overlapping chunks."""
 
 import re
-from typing import List, Dict
-from transformers import AutoTokenizer
+import time
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .metrics import observe_stage
+from .registry import ModelRegistry, model_registry
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
 
 
 class TextChunker:
     def __init__(self, chunk_size: int = 800, chunk_overlap: int = 150,
-                 tokenizer_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+                 tokenizer_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 registry: Optional[ModelRegistry] = None):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+            self.tokenizer = (registry or model_registry).get_tokenizer(tokenizer_name)
         except:
             self.tokenizer = None
 
@@ -20,85 +26,209 @@ class TextChunker:
             return len(self.tokenizer.encode(text, add_special_tokens=False))
         return len(text.split())
 
+    def _fast_backend(self):
+        # The Rust tokenizer behind a fast HF tokenizer, used directly to skip the
+        # per-item Python wrapping; only when no truncation/padding is configured.
+        backend = getattr(self.tokenizer, 'backend_tokenizer', None)
+        if backend is None or backend.truncation is not None or backend.padding is not None:
+            return None
+        return backend
+
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        backend = self._fast_backend()
+        if backend is not None:
+            return [len(e.ids) for e in backend.encode_batch(texts, add_special_tokens=False)]
+        if self.tokenizer:
+            encoded = self.tokenizer(texts, add_special_tokens=False,
+                                     return_attention_mask=False, return_token_type_ids=False)
+            return [len(ids) for ids in encoded['input_ids']]
+        return [len(t.split()) for t in texts]
+
+    @property
+    def additive_counts(self) -> bool:
+        # With a whitespace-splitting pre-tokenizer (WordPiece/BERT), the token count of
+        # ' '.join(parts) is the sum of the parts' counts, so joined text never needs
+        # re-tokenizing. Other tokenizers fall back to counting the joined text.
+        if self.tokenizer is None:
+            return True
+        backend = getattr(self.tokenizer, 'backend_tokenizer', None)
+        pre_tokenizer = backend.pre_tokenizer if backend is not None else None
+        return type(pre_tokenizer).__name__ in ('BertPreTokenizer', 'Whitespace', 'WhitespaceSplit')
+
+    def _count_word_tokens(self, sentence: str, words: List[str]) -> List[int]:
+        backend = self._fast_backend()
+        if backend is None or not self.additive_counts:
+            return self.count_tokens_batch(words)
+        # Tokenize the sentence once and attribute each token to the word its offset falls in.
+        starts = [m.start() for m in re.finditer(r'\S+', sentence)]
+        counts = [0] * len(starts)
+        for token_start, _ in backend.encode(sentence, add_special_tokens=False).offsets:
+            counts[bisect_right(starts, token_start) - 1] += 1
+        return counts
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        return [s.strip() for s in _SENTENCE_BREAK.split(text) if s.strip()]
+
+    @staticmethod
+    def iter_sentences(texts: Iterable[str]) -> Iterator[List[Tuple[str, int, int]]]:
+        # Sentences of the concatenated texts as split_sentences would split the whole, each
+        # with the indices of the pieces it starts and ends in; one list per piece. A break
+        # only counts once its whitespace run is known to have ended, so the unfinished tail
+        # of each piece is held back for the next.
+        pending = ''
+        starts, pieces = [], []  # where each piece still in `pending` begins, and its index
+
+        def located(begin: int, end: int) -> Optional[Tuple[str, int, int]]:
+            sentence = pending[begin:end]
+            stripped = sentence.strip()
+            if not stripped:
+                return None
+            first = begin + len(sentence) - len(sentence.lstrip())
+            last = first + len(stripped) - 1
+            return (stripped, pieces[bisect_right(starts, first) - 1], pieces[bisect_right(starts, last) - 1])
+
+        for index, text in enumerate(texts):
+            if not text:
+                continue
+            scan_from = len(pending.rstrip())
+            starts.append(len(pending))
+            pieces.append(index)
+            pending += text
+            sentences = []
+            end = 0
+            for match in _SENTENCE_BREAK.finditer(pending, scan_from):
+                if match.end() == len(pending):
+                    break
+                sentences.append(located(end, match.start()))
+                end = match.end()
+            pending = pending[end:]
+            starts = [s - end for s in starts]
+            while len(starts) > 1 and starts[1] <= 0:
+                del starts[0], pieces[0]
+            starts[0] = 0
+            sentences = [s for s in sentences if s is not None]
+            if sentences:
+                yield sentences
+        tail = located(0, len(pending))
+        if tail is not None:
+            yield [tail]
+
     def chunk_text(self, text: str, source: str = "document") -> List[Dict]:
         if not text.strip():
             return []
+        return list(self.iter_chunks([text], source))
 
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-
-        chunks = []
+    def iter_chunks(self, texts: Iterable[str], source: str = "document",
+                    first_page: Optional[int] = None) -> Iterator[Dict]:
+        # Chunks text that arrives in pieces (e.g. cleaned pages) exactly as chunk_text
+        # chunks the pieces joined; the open chunk and its overlap carry over from one piece
+        # to the next, so only one piece's sentences and chunks are held. With first_page,
+        # piece n is page first_page + n and chunks record the pages they span.
+        additive = self.additive_counts
         current_chunk = []
+        current_counts = []
+        current_pages = []
         current_tokens = 0
         chunk_id = 0
+        ready = []
+
+        def emit(parts: List[str], counts: List[int], pages: List[Tuple[int, int]]) -> None:
+            chunk = self._make_chunk(' '.join(parts), chunk_id, source, sum(counts) if additive else None)
+            if first_page is not None:
+                chunk['page_start'] = first_page + pages[0][0]
+                chunk['page_end'] = first_page + pages[-1][1]
+            ready.append(chunk)
 
-        for sentence in sentences:
-            tokens = self.count_tokens(sentence)
-
-            if tokens > self.chunk_size:
-                if current_chunk:
-                    chunks.append(self._make_chunk(' '.join(current_chunk), chunk_id, source))
-                    chunk_id += 1
-                    current_chunk = []
-                    current_tokens = 0
-                
-                words = sentence.split()
-                temp = []
-                temp_tokens = 0
-                for word in words:
-                    wt = self.count_tokens(word)
-                    if temp_tokens + wt > self.chunk_size:
-                        chunks.append(self._make_chunk(' '.join(temp), chunk_id, source))
+        for sentences in self.iter_sentences(texts):
+            start = time.perf_counter()
+            # Every sentence is tokenized exactly once, in a single batch call per piece.
+            tokens_batch = self.count_tokens_batch([s for s, _, _ in sentences])
+            for (sentence, first, last), tokens in zip(sentences, tokens_batch):
+                if tokens > self.chunk_size:
+                    if current_chunk:
+                        emit(current_chunk, current_counts, current_pages)
                         chunk_id += 1
-                        temp = [word]
-                        temp_tokens = wt
-                    else:
-                        temp.append(word)
-                        temp_tokens += wt
-                if temp:
-                    current_chunk = temp
-                    current_tokens = temp_tokens
-                continue
+                        current_chunk = []
+                        current_counts = []
+                        current_pages = []
+                        current_tokens = 0
 
-            if current_tokens + tokens > self.chunk_size:
-                if current_chunk:
-                    chunks.append(self._make_chunk(' '.join(current_chunk), chunk_id, source))
-                    chunk_id += 1
-                    
-                    overlap = []
-                    overlap_tokens = 0
-                    for s in reversed(current_chunk):
-                        st = self.count_tokens(s)
-                        if overlap_tokens + st <= self.chunk_overlap:
-                            overlap.insert(0, s)
-                            overlap_tokens += st
+                    # Words of an oversized sentence are attributed to the sentence's pages.
+                    words = sentence.split()
+                    temp = []
+                    temp_counts = []
+                    temp_tokens = 0
+                    for word, wt in zip(words, self._count_word_tokens(sentence, words)):
+                        if temp_tokens + wt > self.chunk_size:
+                            emit(temp, temp_counts, [(first, last)])
+                            chunk_id += 1
+                            temp = [word]
+                            temp_counts = [wt]
+                            temp_tokens = wt
                         else:
-                            break
-                    current_chunk = overlap + [sentence]
-                    current_tokens = self.count_tokens(' '.join(current_chunk))
+                            temp.append(word)
+                            temp_counts.append(wt)
+                            temp_tokens += wt
+                    if temp:
+                        current_chunk = temp
+                        current_counts = temp_counts
+                        current_pages = [(first, last)] * len(temp)
+                        current_tokens = temp_tokens
+                    continue
+
+                if current_tokens + tokens > self.chunk_size:
+                    if current_chunk:
+                        emit(current_chunk, current_counts, current_pages)
+                        chunk_id += 1
+
+                        # Overlap is built from the cached per-piece counts.
+                        overlap_start = len(current_chunk)
+                        overlap_tokens = 0
+                        for i in range(len(current_chunk) - 1, -1, -1):
+                            if overlap_tokens + current_counts[i] <= self.chunk_overlap:
+                                overlap_start = i
+                                overlap_tokens += current_counts[i]
+                            else:
+                                break
+                        current_chunk = current_chunk[overlap_start:] + [sentence]
+                        current_counts = current_counts[overlap_start:] + [tokens]
+                        current_pages = current_pages[overlap_start:] + [(first, last)]
+                        if additive:
+                            current_tokens = sum(current_counts)
+                        else:
+                            current_tokens = self.count_tokens(' '.join(current_chunk))
+                    else:
+                        current_chunk = [sentence]
+                        current_counts = [tokens]
+                        current_pages = [(first, last)]
+                        current_tokens = tokens
                 else:
-                    current_chunk = [sentence]
-                    current_tokens = tokens
-            else:
-                current_chunk.append(sentence)
-                current_tokens += tokens
+                    current_chunk.append(sentence)
+                    current_counts.append(tokens)
+                    current_pages.append((first, last))
+                    current_tokens += tokens
+            observe_stage('chunk', time.perf_counter() - start, len(ready))
+            yield from ready
+            ready.clear()
 
         if current_chunk:
-            chunks.append(self._make_chunk(' '.join(current_chunk), chunk_id, source))
-
-        return chunks
+            emit(current_chunk, current_counts, current_pages)
+            yield from ready
 
-    def _make_chunk(self, text: str, chunk_id: int, source: str) -> Dict:
+    def _make_chunk(self, text: str, chunk_id: int, source: str, token_count: Optional[int] = None) -> Dict:
         return {
             'chunk_id': chunk_id,
             'text': text,
             'source': source,
-            'token_count': self.count_tokens(text)
+            'token_count': self.count_tokens(text) if token_count is None else token_count
         }
 
-    def chunk_documents(self, documents: List[Dict]) -> List[Dict]:
+    def chunk_documents(self, documents: List[Dict], start_id: int = 0) -> List[Dict]:
         all_chunks = []
-        gid = 0
+        gid = start_id
         for doc in documents:
             chunks = self.chunk_text(doc.get('full_text', ''), doc.get('filename', 'unknown'))
             for c in chunks:
@@ -0,0 +1,93 @@
+"""Context Assembler - Merges overlapping chunks and packs them into a token budget."""
+
+import re
+from typing import List, Dict, Tuple
+from .chunker import TextChunker
+
+
+class ContextAssembler:
+    def __init__(self, chunker: TextChunker, max_tokens: int = 3000):
+        # max_tokens <= 0 disables the budget; merging and deduplication still apply.
+        self.chunker = chunker
+        self.max_tokens = max_tokens
+        self.stats = {'queries': 0, 'chunks_in': 0, 'blocks_out': 0, 'tokens_in': 0, 'tokens_out': 0}
+
+    @staticmethod
+    def _groups(chunks: List[Dict]) -> List[List[Dict]]:
+        # Runs of consecutive global_chunk_ids from one source are neighbours in the
+        # original text, where the chunker's overlap repeats the boundary sentences.
+        ordered = sorted(chunks, key=lambda c: (c.get('source', ''), c.get('global_chunk_id', -1)))
+        groups = []
+        for c in ordered:
+            prev = groups[-1][-1] if groups else None
+            if (prev is not None and 'global_chunk_id' in c and prev.get('source') == c.get('source')
+                    and c['global_chunk_id'] == prev.get('global_chunk_id', -2) + 1):
+                groups[-1].append(c)
+            else:
+                groups.append([c])
+        return groups
+
+    def assemble(self, chunks: List[Dict]) -> Tuple[List[Dict], Dict]:
+        if not chunks:
+            return [], {'tokens_in': 0, 'tokens_out': 0, 'tokens_saved': 0, 'chunks_in': 0, 'blocks_out': 0}
+        counts = [c.get('token_count') for c in chunks]
+        if None in counts:
+            counts = self.chunker.count_tokens_batch([c['text'] for c in chunks])
+        tokens_in = sum(counts)
+
+        # Most relevant block first, so the budget cuts the least useful text.
+        groups = sorted(self._groups(chunks), key=lambda g: -max(c.get('similarity_score', 0) for c in g))
+        seen = set()
+        blocks = []
+        for group in groups:
+            sentences = []
+            for c in group:
+                for sentence in self.chunker.split_sentences(c['text']):
+                    key = re.sub(r'\s+', ' ', sentence).lower()
+                    if key not in seen:
+                        seen.add(key)
+                        sentences.append(sentence)
+            if sentences:
+                blocks.append((group, sentences))
+
+        sentence_tokens = self.chunker.count_tokens_batch([s for _, sentences in blocks for s in sentences])
+        remaining = self.max_tokens if self.max_tokens > 0 else float('inf')
+        assembled = []
+        pos = 0
+        for group, sentences in blocks:
+            tokens = sentence_tokens[pos:pos + len(sentences)]
+            pos += len(sentences)
+            kept, used = [], 0
+            for sentence, n in zip(sentences, tokens):
+                if used + n > remaining:
+                    break
+                kept.append(sentence)
+                used += n
+            if not kept:
+                continue
+            remaining -= used
+            assembled.append({
+                **group[0],
+                'text': ' '.join(kept),
+                'similarity_score': max(c.get('similarity_score', 0) for c in group),
+                'chunk_ids': [c.get('global_chunk_id', c.get('chunk_id')) for c in group],
+                'token_count': used,
+                'truncated': len(kept) < len(sentences)
+            })
+
+        tokens_out = sum(c['token_count'] for c in assembled)
+        self.stats['queries'] += 1
+        self.stats['chunks_in'] += len(chunks)
+        self.stats['blocks_out'] += len(assembled)
+        self.stats['tokens_in'] += tokens_in
+        self.stats['tokens_out'] += tokens_out
+        return assembled, {'tokens_in': tokens_in, 'tokens_out': tokens_out,
+                           'tokens_saved': max(0, tokens_in - tokens_out),
+                           'chunks_in': len(chunks), 'blocks_out': len(assembled)}
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'tokens_saved': max(0, self.stats['tokens_in'] - self.stats['tokens_out']),
+            'max_tokens': self.max_tokens
+        }
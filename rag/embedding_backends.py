@@ -0,0 +1,181 @@
+"""Embedding Backends - PyTorch and ONNX Runtime encoders behind one batch API."""
+
+import os
+import re
+import json
+import inspect
+import threading
+import numpy as np
+from typing import List, Optional
+
+BACKENDS = ('torch', 'onnx')
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def _pooling_mode(model) -> str:
+    # Newer sentence-transformers name the mode; older ones set one boolean flag per mode.
+    config = model[1].get_config_dict() if len(model) > 1 else {}
+    mode = config.get('pooling_mode')
+    if mode is None:
+        mode = next((m for m in ('cls', 'mean', 'max') if config.get(f'pooling_mode_{m}_token')
+                     or config.get(f'pooling_mode_{m}_tokens')), 'mean')
+    if mode not in ('cls', 'mean', 'max'):
+        raise ValueError(f"Pooling mode {mode!r} is not supported by the ONNX backend")
+    return mode
+
+
+def _pool(tokens: np.ndarray, mask: np.ndarray, mode: str) -> np.ndarray:
+    if mode == 'cls':
+        return tokens[:, 0]
+    mask = mask[..., None].astype(tokens.dtype)
+    if mode == 'max':
+        return np.where(mask > 0, tokens, -np.inf).max(axis=1)
+    return (tokens * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+class TorchEmbeddingBackend:
+    def __init__(self, model, threads: int = 0):
+        if threads > 0:
+            import torch
+            # Process-wide: PyTorch has one intra-op pool.
+            torch.set_num_threads(threads)
+        self.model = model
+        self.tokenizer = getattr(model, 'tokenizer', None)
+        self._length_tokenizer = _length_tokenizer(self.tokenizer)
+        self.max_length = getattr(model, 'max_seq_length', None)
+        self.dimension = model.get_sentence_embedding_dimension()
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        return _token_lengths(self.tokenizer, texts, self.max_length, self._length_tokenizer)
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                 normalize_embeddings=True, show_progress_bar=False)
+
+
+class OnnxEmbeddingBackend:
+    CONFIG_FILE = "encoder.json"
+
+    def __init__(self, model_dir: str, quantize: bool = False, threads: int = 0):
+        import onnxruntime
+        from transformers import AutoTokenizer
+        with open(os.path.join(model_dir, self.CONFIG_FILE)) as f:
+            config = json.load(f)
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        model_file = os.path.join(model_dir, "model-int8.onnx" if quantize else "model.onnx")
+        self.session = onnxruntime.InferenceSession(model_file, options, providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self._length_tokenizer = _length_tokenizer(self.tokenizer)
+        # Padding/truncation reconfigure the shared Rust tokenizer per call.
+        self._tokenizer_lock = threading.Lock()
+        self.pooling = config['pooling']
+        self.max_length = config['max_length']
+        self.dimension = config['dimension']
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        if self._length_tokenizer is not None:
+            return _token_lengths(self.tokenizer, texts, self.max_length, self._length_tokenizer)
+        with self._tokenizer_lock:
+            return _token_lengths(self.tokenizer, texts, self.max_length)
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        with self._tokenizer_lock:
+            encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                     return_tensors='np')
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        tokens = self.session.run(None, feeds)[0]
+        return _normalize(_pool(tokens, encoded['attention_mask'], self.pooling))
+
+    @classmethod
+    def model_dir(cls, export_dir: str, model_name: str) -> str:
+        return os.path.join(export_dir, re.sub(r'[^\w.-]', '_', model_name))
+
+    @classmethod
+    def export(cls, model, model_dir: str, quantize: bool = False) -> None:
+        # One-off conversion of a SentenceTransformer: the transformer goes to ONNX and
+        # pooling/normalization are redone in numpy, so serving never loads PyTorch weights.
+        import torch
+        os.makedirs(model_dir, exist_ok=True)
+        model_file = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(model_file):
+            transformer = model[0].auto_model.eval()
+            sample = model.tokenizer(["export sample text"], return_tensors='pt')
+            names = [n for n in ('input_ids', 'attention_mask', 'token_type_ids') if n in sample]
+
+            class Encoder(torch.nn.Module):
+                def __init__(self):
+                    super().__init__()
+                    # A submodule, so its weights export as initializers rather than traced constants.
+                    self.transformer = transformer
+
+                def forward(self, *inputs):
+                    return self.transformer(**dict(zip(names, inputs)))[0]
+
+            axes = {name: {0: 'batch', 1: 'sequence'} for name in names + ['token_embeddings']}
+            # Newer PyTorch defaults to the dynamo exporter; the TorchScript one needs no extras.
+            extra = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+            tmp_file = model_file + ".tmp"
+            with torch.no_grad():
+                torch.onnx.export(Encoder(), tuple(sample[n] for n in names), tmp_file, input_names=names,
+                                  output_names=['token_embeddings'], dynamic_axes=axes, opset_version=17, **extra)
+            os.replace(tmp_file, model_file)
+            model.tokenizer.save_pretrained(model_dir)
+            with open(os.path.join(model_dir, cls.CONFIG_FILE), 'w') as f:
+                json.dump({'pooling': _pooling_mode(model), 'max_length': model.max_seq_length,
+                           'dimension': model.get_sentence_embedding_dimension()}, f)
+        quantized_file = os.path.join(model_dir, "model-int8.onnx")
+        if quantize and not os.path.exists(quantized_file):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(model_file, quantized_file + ".tmp", weight_type=QuantType.QInt8)
+            os.replace(quantized_file + ".tmp", quantized_file)
+
+    @classmethod
+    def is_exported(cls, model_dir: str, quantize: bool = False) -> bool:
+        names = [cls.CONFIG_FILE, "model-int8.onnx" if quantize else "model.onnx"]
+        return all(os.path.exists(os.path.join(model_dir, name)) for name in names)
+
+
+def bucket_batches(lengths: List[int], batch_size: int, max_batch_tokens: int = 0) -> List[np.ndarray]:
+    # Longest first so similar lengths share a batch and padding stays small; a batch is
+    # also capped so that (rows x longest row) fits max_batch_tokens.
+    order = np.argsort(-np.asarray(lengths), kind='stable')
+    batches = []
+    start = 0
+    while start < len(order):
+        size = batch_size
+        if max_batch_tokens > 0:
+            size = max(1, min(batch_size, max_batch_tokens // max(1, lengths[order[start]])))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def _length_tokenizer(tokenizer):
+    # A private copy of the Rust tokenizer behind a fast HF tokenizer, with padding and
+    # truncation off, for counting tokens. The shared one is reconfigured by every encode
+    # call, on whichever thread makes it, so counting must never touch its settings.
+    backend = getattr(tokenizer, 'backend_tokenizer', None)
+    if backend is None:
+        return None
+    counter = type(backend).from_str(backend.to_str())
+    counter.no_padding()
+    counter.no_truncation()
+    return counter
+
+
+def _token_lengths(tokenizer, texts: List[str], max_length: Optional[int] = None, counter=None) -> List[int]:
+    if counter is not None:
+        lengths = [len(e.ids) for e in counter.encode_batch(texts)]
+    elif tokenizer is not None:
+        encoded = tokenizer(texts, truncation=bool(max_length), max_length=max_length, return_attention_mask=False)
+        lengths = [len(ids) for ids in encoded['input_ids']]
+    else:
+        lengths = [len(t.split()) for t in texts]
+    return [min(n, max_length) for n in lengths] if max_length else lengths
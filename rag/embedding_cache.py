@@ -0,0 +1,122 @@
+"""Embedding Cache - Content-addressed on-disk cache of chunk embeddings."""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import List, Dict, Tuple
+
+
+class EmbeddingCache:
+    DB_FILE = "cache.sqlite"
+    LEGACY_FILES = ("index.json", "vectors.f32")
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = 200000, touch_batch: int = 1024):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.path = os.path.join(cache_dir, re.sub(r'[^\w.-]', '_', model_name))
+        self.dimension = None
+        self._lock = threading.Lock()
+        self._db = None
+        self._touched = {}  # key -> last use, written with the next batch
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def open(self, dimension: int) -> None:
+        # One SQLite file per model. Rows are keyed by content hash and SQLite locks the file
+        # across processes, so several app processes can share the directory.
+        with self._lock:
+            if self._db is not None:
+                if dimension != self.dimension:
+                    raise ValueError(f"Cache dimension {self.dimension} does not match {dimension}")
+                return
+            os.makedirs(self.path, exist_ok=True)
+            for name in self.LEGACY_FILES:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+            db = sqlite3.connect(os.path.join(self.path, self.DB_FILE), timeout=30, check_same_thread=False,
+                                 isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+                db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, vector BLOB, used REAL)")
+                db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+                row = db.execute("SELECT value FROM meta WHERE name = 'dimension'").fetchone()
+                if row is None or int(row[0]) != dimension:
+                    db.execute("DELETE FROM entries")
+                    db.execute("INSERT OR REPLACE INTO meta VALUES ('dimension', ?)", (str(dimension),))
+            self._db = db
+            self.dimension = dimension
+
+    def make_key(self, text: str) -> str:
+        normalized = ' '.join(text.split())
+        return hashlib.sha1(f"{self.model_name}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        keys = [self.make_key(text) for text in texts]
+        with self._lock:
+            found = {}
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                found.update(self._db.execute(
+                    f"SELECT key, vector FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch))
+            misses = []
+            now = time.time()
+            for i, key in enumerate(keys):
+                blob = found.get(key)
+                if blob is None:
+                    misses.append(i)
+                    continue
+                vectors[i] = np.frombuffer(blob, dtype=np.float32)
+                self._touched[key] = now
+            # Recency only orders eviction, so hits are recorded in batches rather than per lookup.
+            if len(self._touched) >= self.touch_batch:
+                with self._db:
+                    self._db.execute("BEGIN IMMEDIATE")
+                    self._write_touches()
+            self.hits += len(texts) - len(misses)
+            self.misses += len(misses)
+        return vectors, misses
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        now = time.time()
+        rows = [(self.make_key(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for text, vector in zip(texts, vectors)]
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._write_touches()
+            self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", rows)
+            excess = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._db.execute("DELETE FROM entries WHERE key IN "
+                                 "(SELECT key FROM entries ORDER BY used LIMIT ?)", (excess,))
+                self.evictions += excess
+
+    def _write_touches(self) -> None:
+        if self._touched:
+            self._db.executemany("UPDATE entries SET used = MAX(used, ?) WHERE key = ?",
+                                 [(used, key) for key, used in self._touched.items()])
+            self._touched = {}
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] if self._db else 0
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'evictions': self.evictions
+        }
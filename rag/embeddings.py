@@ -1,34 +1,79 @@
 """Embeddings Generator - Creates vector embeddings using Sentence-Transformers."""
 
 import numpy as np
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Optional
+from .registry import ModelRegistry, model_registry
+from .embedding_cache import EmbeddingCache
+from .embedding_backends import BACKENDS, TorchEmbeddingBackend, bucket_batches
+from .metrics import EMBEDDING_BATCH_SIZE, timed
 
 
 class EmbeddingGenerator:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", registry: Optional[ModelRegistry] = None,
+                 cache: Optional[EmbeddingCache] = None, backend: str = 'torch', quantize: bool = False,
+                 threads: int = 0, max_batch_tokens: int = 8192, onnx_dir: Optional[str] = None,
+                 query_batching: bool = False, batch_wait_ms: float = 2.0, max_query_batch: int = 32):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {backend}")
         self.model_name = model_name
-        print(f"Loading embedding model: {model_name}...")
-        self.model = SentenceTransformer(model_name)
-        self.embedding_dimension = self.model.get_sentence_embedding_dimension()
-        print(f"Model loaded. Dimension: {self.embedding_dimension}")
+        self.model_id = self.model_id_for(model_name, backend, quantize)
+        self.max_batch_tokens = max_batch_tokens
+        registry = registry or model_registry
+        # Shared, read-only handle: every session reuses the process-wide model.
+        if backend == 'onnx':
+            self.backend = registry.get_onnx_embedding_model(model_name, onnx_dir or 'onnx_models', quantize, threads)
+        else:
+            self.backend = TorchEmbeddingBackend(registry.get_embedding_model(model_name), threads)
+        self.embedding_dimension = self.backend.dimension
+        self.batcher = (registry.get_query_batcher(self.model_id, self.backend.encode_batch, batch_wait_ms,
+                                                   max_query_batch) if query_batching else None)
+        self.cache = cache
+        if cache is not None:
+            cache.open(self.embedding_dimension)
+
+    @staticmethod
+    def model_id_for(model_name: str, backend: str = 'torch', quantize: bool = False) -> str:
+        # Backends agree closely but not exactly, so caches keep their vectors apart.
+        if backend == 'torch':
+            return model_name
+        return f"{model_name}@{backend}-int8" if quantize else f"{model_name}@{backend}"
 
     def generate_embedding(self, text: str) -> np.ndarray:
         if not text.strip():
             return np.zeros(self.embedding_dimension)
-        return self.model.encode([text], convert_to_numpy=True, normalize_embeddings=True)[0]
+        with timed('embed_query'):
+            if self.batcher is not None:
+                return self.batcher.encode(text)
+            return self.backend.encode_batch([text])[0]
 
-    def generate_embeddings(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+    def generate_embeddings(self, texts: List[str], batch_size: int = 32, stage: str = 'embed') -> np.ndarray:
         if not texts:
             return np.array([])
-        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, 
-                                  normalize_embeddings=True, show_progress_bar=True)
+        # Batches of similar token length waste less compute on padding; results go
+        # back into input order.
+        embeddings = np.empty((len(texts), self.embedding_dimension), dtype=np.float32)
+        for batch in bucket_batches(self.backend.token_lengths(texts), batch_size, self.max_batch_tokens):
+            EMBEDDING_BATCH_SIZE.observe(len(batch))
+            with timed(stage, len(batch)):
+                embeddings[batch] = self.backend.encode_batch([texts[i] for i in batch])
+        return embeddings
+
+    def generate_cached_embeddings(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        if self.cache is None or not texts:
+            return self.generate_embeddings(texts, batch_size)
+        embeddings, misses = self.cache.get_many(texts)
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            new_embeddings = self.generate_embeddings(miss_texts, batch_size)
+            embeddings[misses] = new_embeddings
+            self.cache.put_many(miss_texts, new_embeddings)
+        return embeddings
 
     def generate_embeddings_for_chunks(self, chunks: List[Dict], batch_size: int = 32) -> List[Dict]:
         if not chunks:
             return []
         texts = [c.get('text', '') for c in chunks]
-        embeddings = self.generate_embeddings(texts, batch_size)
+        embeddings = self.generate_cached_embeddings(texts, batch_size)
         for i, chunk in enumerate(chunks):
             chunk['embedding'] = embeddings[i]
         return chunks
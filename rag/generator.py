@@ -1,8 +1,13 @@
 """Answer Generator - Uses Groq API with LLaMA for grounded answers."""
 
 import os
-from typing import List, Dict, Optional
-from groq import Groq
+import time
+from typing import AsyncIterator, List, Dict, Optional, Iterator, Tuple
+
+from .cache import LRUCache
+from .llm_client import AsyncLLMClient, LLMClient
+from .metrics import observe_stage, timed
+from .text_cleaner import TextCleaner
 
 
 class AnswerGenerator:
@@ -19,46 +24,173 @@ Question: {question}
 
 Answer using ONLY the context above:"""
 
-    def __init__(self, api_key: Optional[str] = None, model: str = "llama-3.3-70b-versatile"):
+    NO_CONTEXT_ANSWER = "No documents uploaded. Please upload PDFs first."
+    # For a search scoped to documents or pages that matched no chunks.
+    NO_SCOPED_CONTEXT_ANSWER = "No content in the selected documents/pages."
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "llama-3.3-70b-versatile",
+                 base_url: Optional[str] = None, cache: Optional[LRUCache] = None,
+                 client: Optional[LLMClient] = None, async_client: Optional[AsyncLLMClient] = None):
         self.api_key = api_key or os.getenv('GROQ_API_KEY')
-        if not self.api_key:
+        if client is None and not self.api_key:
             raise ValueError("GROQ_API_KEY required")
         self.model = model
-        self.client = Groq(api_key=self.api_key)
+        # base_url lets tests and benchmarks point at a local stub of the API. The app passes
+        # one shared client so that pooling, the concurrency cap and coalescing span sessions.
+        self.base_url = base_url
+        self.client = client or LLMClient(self.api_key, base_url)
+        self.async_client = async_client
         self.available_models = ["llama-3.3-70b-versatile", "llama-3.1-8b-instant", 
                                   "mixtral-8x7b-32768", "gemma2-9b-it"]
+        self.cache = cache
+        self.text_cleaner = TextCleaner()
+        self._cache_version = None
+        self.tokens_saved = 0
+
+    def _messages(self, question: str, context: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": self.USER_PROMPT.format(context=context, question=question)}
+        ]
 
     def generate(self, question: str, context: str, temperature: float = 0.1) -> Dict:
         if not context.strip():
-            return {'answer': "No documents uploaded. Please upload PDFs first.", 
-                    'model': self.model, 'usage': None}
+            return {'answer': self.NO_CONTEXT_ANSWER, 'model': self.model, 'usage': None}
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPT},
-                    {"role": "user", "content": self.USER_PROMPT.format(context=context, question=question)}
-                ],
-                temperature=temperature,
-                max_tokens=1024
-            )
+            with timed('llm'):
+                response = self.client.complete(self.model, self._messages(question, context), temperature, 1024)
             return {
                 'answer': response.choices[0].message.content,
                 'model': self.model,
-                'usage': {'total_tokens': response.usage.total_tokens}
+                'usage': {'prompt_tokens': response.usage.prompt_tokens,
+                          'completion_tokens': response.usage.completion_tokens,
+                          'total_tokens': response.usage.total_tokens}
             }
         except Exception as e:
             return {'answer': f"Error: {str(e)}", 'model': self.model, 'error': str(e), 'usage': None}
 
-    def generate_with_sources(self, question: str, chunks: List[Dict], temperature: float = 0.1) -> Dict:
-        context = "\n\n".join([f"[{c.get('source', 'Doc')}]\n{c['text']}" for c in chunks])
-        sources = list(set([c.get('source', 'Unknown') for c in chunks]))
-        result = self.generate(question, context, temperature)
-        result['sources'] = sources
+    def generate_stream(self, question: str, context: str, temperature: float = 0.1) -> Iterator[str]:
+        if not context.strip():
+            yield self.NO_CONTEXT_ANSWER
+            return
+
+        try:
+            yield from self._stream(question, context, temperature)
+        except Exception as e:
+            yield f"Error: {str(e)}"
+
+    def _stream(self, question: str, context: str, temperature: float) -> Iterator[str]:
+        start = time.perf_counter()
+        first_token = True
+        for chunk in self.client.stream(self.model, self._messages(question, context), temperature, 1024):
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token:
+                    observe_stage('llm_first_token', time.perf_counter() - start)
+                    first_token = False
+                yield chunk.choices[0].delta.content
+        observe_stage('llm_stream', time.perf_counter() - start)
+
+    async def agenerate_stream(self, question: str, context: str, temperature: float = 0.1) -> AsyncIterator[str]:
+        # asyncio counterpart of generate_stream; the async client is made on first use,
+        # inside the caller's event loop.
+        if not context.strip():
+            yield self.NO_CONTEXT_ANSWER
+            return
+        if self.async_client is None:
+            c = self.client
+            self.async_client = AsyncLLMClient(c.api_key, c.base_url, c.max_concurrency, c.max_retries,
+                                               c.backoff_base, c.backoff_max, c.timeout, c.max_connections,
+                                               c.coalesce)
+        start = time.perf_counter()
+        first_token = True
+        try:
+            async for chunk in self.async_client.stream(self.model, self._messages(question, context),
+                                                        temperature, 1024):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token:
+                        observe_stage('llm_first_token', time.perf_counter() - start)
+                        first_token = False
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            yield f"Error: {str(e)}"
+            return
+        observe_stage('llm_stream', time.perf_counter() - start)
+
+    def build_context(self, chunks: List[Dict]) -> str:
+        return "\n\n".join([f"[{c.get('source', 'Doc')}]\n{c['text']}" for c in chunks])
+
+    @staticmethod
+    def get_sources(chunks: List[Dict]) -> List[str]:
+        return list(set([c.get('source', 'Unknown') for c in chunks]))
+
+    def _cache_key(self, question: str, chunks: List[Dict], temperature: float,
+                   index_version: Optional[int]) -> Optional[Tuple]:
+        if self.cache is None or not chunks:
+            return None
+        if index_version != self._cache_version:
+            # The index changed, so cached answers may be grounded in stale or removed chunks.
+            self.cache.clear()
+            self._cache_version = index_version
+        chunk_ids = tuple((c.get('source'), tuple(c.get('chunk_ids') or [c.get('global_chunk_id', c.get('chunk_id'))]))
+                          for c in chunks)
+        return (self.text_cleaner.clean_query(question), chunk_ids, self.model, temperature, index_version)
+
+    def _cached_answer(self, key: Optional[Tuple]) -> Optional[Dict]:
+        cached = self.cache.get(key) if key is not None else None
+        if cached is not None and cached.get('usage'):
+            self.tokens_saved += cached['usage']['total_tokens']
+        return cached
+
+    def generate_with_sources(self, question: str, chunks: List[Dict], temperature: float = 0.1,
+                              index_version: Optional[int] = None, scoped: bool = False) -> Dict:
+        if scoped and not chunks:
+            return {'answer': self.NO_SCOPED_CONTEXT_ANSWER, 'model': self.model, 'usage': None,
+                    'sources': [], 'chunks_used': 0}
+        key = self._cache_key(question, chunks, temperature, index_version)
+        cached = self._cached_answer(key)
+        if cached is not None:
+            result = {**cached, 'cached': True}
+        else:
+            result = self.generate(question, self.build_context(chunks), temperature)
+            if key is not None and 'error' not in result:
+                self.cache.put(key, dict(result))
+        result['sources'] = self.get_sources(chunks)
         result['chunks_used'] = len(chunks)
         return result
 
+    def generate_stream_with_sources(self, question: str, chunks: List[Dict], temperature: float = 0.1,
+                                     index_version: Optional[int] = None, scoped: bool = False) -> Iterator[str]:
+        if scoped and not chunks:
+            yield self.NO_SCOPED_CONTEXT_ANSWER
+            return
+        key = self._cache_key(question, chunks, temperature, index_version)
+        cached = self._cached_answer(key)
+        if cached is not None:
+            yield cached['answer']
+            return
+        if key is None:
+            yield from self.generate_stream(question, self.build_context(chunks), temperature)
+            return
+
+        parts = []
+        try:
+            for token in self._stream(question, self.build_context(chunks), temperature):
+                parts.append(token)
+                yield token
+        except Exception as e:
+            yield f"Error: {str(e)}"
+            return
+        # Streamed responses carry no usage block, so they count as hits but not as saved tokens.
+        self.cache.put(key, {'answer': ''.join(parts), 'model': self.model, 'usage': None})
+
+    def get_stats(self) -> Dict:
+        return {
+            'model': self.model,
+            'llm_client': self.client.get_stats(),
+            'answer_cache': {**self.cache.get_stats(), 'tokens_saved': self.tokens_saved} if self.cache else None
+        }
+
     def set_model(self, model: str) -> bool:
         if model in self.available_models:
             self.model = model
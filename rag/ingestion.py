@@ -0,0 +1,192 @@
+"""Ingestion Jobs - Runs the upload pipeline on a bounded background worker pool."""
+
+import os
+import time
+import uuid
+import hashlib
+import threading
+from itertools import islice
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import BinaryIO, Iterable, Iterator, List, Dict, Optional
+
+from .pdf_loader import PDFLoader
+
+
+def content_hash(stream: BinaryIO, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(block_size), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+class IngestionJob:
+    def __init__(self, owner: str, file_paths: List[str]):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.file_paths = file_paths
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.finished_at = None
+        self.documents = []
+        self.skipped = []
+        self.errors = []
+        self.progress = {
+            'documents_total': len(file_paths),
+            'documents_done': 0,
+            'pages_extracted': 0,
+            'chunks_total': 0,
+            'chunks_embedded': 0,
+            'vectors_added': 0
+        }
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('completed', 'failed')
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'documents': list(self.documents),
+            'skipped': list(self.skipped),
+            'errors': list(self.errors)
+        }
+
+
+class IngestionJobManager:
+    def __init__(self, max_workers: int = 2, max_pending: int = 16,
+                 embed_batch_size: int = 64, page_window: int = 32, job_ttl: int = 3600,
+                 pdf_workers: int = 0, clean_workers: int = 0):
+        self.max_pending = max_pending
+        self.embed_batch_size = embed_batch_size
+        self.page_window = page_window
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest')
+        # Process pools for extraction and cleaning, shared by all jobs and started on first use.
+        self._pool_workers = {'pdf': pdf_workers, 'clean': clean_workers}
+        self._pools = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, file_paths: List[str], user_session: Dict) -> IngestionJob:
+        # user_session is the app's per-user dict: pipeline components plus the
+        # 'documents' list and an 'ingest_lock' serializing writes to its vector store.
+        with self._lock:
+            self._prune()
+            active = sum(1 for j in self._jobs.values() if not j.finished)
+            if active >= self.max_pending:
+                raise IngestionQueueFull("Too many uploads in progress, try again shortly")
+            job = IngestionJob(owner, file_paths)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, user_session)
+        return job
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[IngestionJob]:
+        job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def active_jobs(self, owner: str) -> List[IngestionJob]:
+        return [j for j in list(self._jobs.values()) if j.owner == owner and not j.finished]
+
+    def _process_pool(self, name: str) -> Optional[Executor]:
+        workers = self._pool_workers[name]
+        if workers <= 1:
+            return None
+        with self._lock:
+            pool = self._pools.get(name)
+            # A pool whose worker died refuses new work; replace it rather than fail every later job.
+            if pool is None or getattr(pool, '_broken', False):
+                pool = self._pools[name] = PDFLoader.process_pool(workers)
+            return pool
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.job_ttl
+        for job_id in [k for k, j in self._jobs.items() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IngestionJob, user_session: Dict) -> None:
+        job.status = 'running'
+        for file_path in job.file_paths:
+            try:
+                self._ingest_file(job, user_session, file_path)
+            except Exception as e:
+                job.errors.append({'filename': os.path.basename(file_path), 'error': str(e)})
+            job.progress['documents_done'] += 1
+        job.status = 'failed' if job.errors and not job.documents and not job.skipped else 'completed'
+        job.finished_at = time.time()
+
+    @staticmethod
+    def _find_document(user_session: Dict, filename: str) -> Optional[Dict]:
+        return next((d for d in user_session['documents'] if d['filename'] == filename), None)
+
+    def _ingest_file(self, job: IngestionJob, user_session: Dict, file_path: str) -> None:
+        filename = os.path.basename(file_path)
+        with open(file_path, 'rb') as f:
+            digest = content_hash(f)
+        existing = self._find_document(user_session, filename)
+        if existing is not None and existing.get('sha256') == digest:
+            job.skipped.append(filename)
+            return
+
+        vector_store = user_session['vector_store']
+        with user_session['ingest_lock']:
+            existing = self._find_document(user_session, filename)
+            first_id = vector_store.next_id
+            pages_before = job.progress['pages_extracted']
+            try:
+                self._stream_file(job, user_session, file_path, filename, first_id)
+            except Exception:
+                # Drop the part of the new version already indexed; the old one is untouched.
+                vector_store.remove_document(filename, start=first_id)
+                raise
+            # A changed file with the same name replaces the old version's chunks.
+            if existing is not None:
+                vector_store.remove_document(filename, end=first_id)
+                user_session['documents'].remove(existing)
+            entry = {'filename': filename, 'pages': job.progress['pages_extracted'] - pages_before, 'sha256': digest}
+            user_session['documents'].append(entry)
+        job.documents.append({**entry, 'replaced': existing is not None})
+
+    @staticmethod
+    def _page_texts(job: IngestionJob, pages: Iterable[Dict]) -> Iterator[str]:
+        for page in pages:
+            job.progress['pages_extracted'] += 1
+            yield page['text']
+
+    def _stream_file(self, job: IngestionJob, user_session: Dict, file_path: str, filename: str,
+                     first_id: int) -> None:
+        # Pages flow through clean -> chunk -> embed -> index without the document ever
+        # being held whole: the cleaner works on page_window pages at a time, the chunker
+        # on one cleaned page, and at most embed_batch_size chunks wait for embedding.
+        pages = self._page_texts(job, user_session['pdf_loader'].iter_pages(file_path, self._process_pool('pdf')))
+        texts = user_session['text_cleaner'].iter_clean_text(pages, self._process_pool('clean'),
+                                                             window_pages=self.page_window)
+        chunks = user_session['chunker'].iter_chunks(texts, filename, first_page=1)
+        global_id = first_id
+        while True:
+            batch = list(islice(chunks, self.embed_batch_size))
+            if not batch:
+                return
+            for chunk in batch:
+                chunk['global_chunk_id'] = global_id
+                global_id += 1
+            job.progress['chunks_total'] += len(batch)
+            embeddings = user_session['embedding_gen'].generate_cached_embeddings([c['text'] for c in batch])
+            job.progress['chunks_embedded'] += len(batch)
+            # Each batch is searchable as soon as it is added.
+            user_session['vector_store'].add_embeddings(embeddings, batch)
+            job.progress['vectors_added'] += len(batch)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+            self._pools.clear()
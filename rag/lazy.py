@@ -0,0 +1,54 @@
+"""Lazy Imports - Defers heavy third-party modules until first use, with an explicit preload."""
+
+import time
+import importlib
+from typing import Dict, List, Optional, Sequence
+
+# Roughly in dependency order, so each timing covers only what that module adds.
+HEAVY_MODULES = ('numpy', 'faiss', 'pdfplumber', 'httpx', 'groq', 'torch', 'transformers', 'sentence_transformers')
+
+
+class LazyModule:
+    # Stands in for a module and imports it on the first attribute access. Unlike
+    # importlib's LazyLoader it is safe to race: import_module takes the import lock.
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = self.__dict__['_module'] = importlib.import_module(self._name)
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def preload(modules: Sequence[str] = HEAVY_MODULES, embedding_models: Optional[List[str]] = None,
+            tokenizers: Optional[List[str]] = None) -> Dict[str, float]:
+    # Pays the import (and optionally model load) cost up front, e.g. from a background
+    # thread once the server is accepting connections. Returns seconds per step.
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Error preloading {name}: {e}")
+            continue
+        timings[name] = time.perf_counter() - start
+    if embedding_models or tokenizers:
+        from .registry import model_registry
+        start = time.perf_counter()
+        model_registry.warm_up(embedding_models, tokenizers)
+        timings['models'] = time.perf_counter() - start
+    return timings
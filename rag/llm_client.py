@@ -0,0 +1,296 @@
+"""LLM Client - Shared, pooled Groq client with a concurrency cap, retries and request coalescing."""
+
+import json
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from .lazy import lazy_import
+from .metrics import LLM_REQUESTS, metrics_registry, record_llm_usage
+
+groq = lazy_import('groq')
+httpx = lazy_import('httpx')
+
+LLM_RETRIES = metrics_registry.counter('rag_llm_retries_total', 'LLM calls retried after a 429/5xx or connection error.',
+                                       ('model',))
+LLM_COALESCED = metrics_registry.counter('rag_llm_coalesced_total',
+                                         'Completions answered by an identical in-flight upstream call.', ('model',))
+LLM_IN_FLIGHT = metrics_registry.gauge('rag_llm_in_flight', 'Upstream LLM calls currently in flight.')
+
+
+class _LLMClientBase:
+    def __init__(self, api_key: str, base_url: Optional[str] = None, max_concurrency: int = 8,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 timeout: float = 60.0, max_connections: int = 20, coalesce: bool = True):
+        self.api_key = api_key
+        self.base_url = base_url or None
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.http_client = None
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.coalesce = coalesce
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'upstream_calls': 0, 'coalesced': 0, 'retries': 0, 'errors': 0,
+                       'in_flight': 0, 'max_in_flight': 0}
+
+    @property
+    def client(self):
+        # Built on first use, so importing the app does not import the SDK.
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._make_client()
+        return self._client
+
+    def _limits(self):
+        # One keep-alive pool for every session; retries are ours, so the SDK's are off.
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+
+    @staticmethod
+    def _key(model: str, messages: List[Dict], temperature: float, max_tokens: int) -> Tuple:
+        return (model, json.dumps(messages, sort_keys=True), temperature, max_tokens)
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        # APITimeoutError is an APIConnectionError; 4xx other than 429 will not get better.
+        if isinstance(error, groq.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return isinstance(error, groq.APIConnectionError)
+
+    def _delay(self, attempt: int, error: Exception) -> float:
+        # Full jitter spreads out callers that were rejected together; a Retry-After
+        # from the server takes precedence.
+        response = getattr(error, 'response', None)
+        try:
+            retry_after = float(response.headers.get('retry-after')) if response is not None else None
+        except (TypeError, ValueError):
+            retry_after = None
+        if retry_after is None:
+            retry_after = random.uniform(0, self.backoff_base * 2 ** attempt)
+        return min(retry_after, self.backoff_max)
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += amount
+            if name == 'in_flight':
+                self._stats['max_in_flight'] = max(self._stats['max_in_flight'], self._stats['in_flight'])
+                LLM_IN_FLIGHT.set(self._stats['in_flight'])
+
+    def _should_retry(self, model: str, attempt: int, error: Exception) -> bool:
+        if attempt >= self.max_retries or not self._retryable(error):
+            LLM_REQUESTS.inc(model=model, status='error')
+            self._count('errors')
+            return False
+        LLM_RETRIES.inc(model=model)
+        self._count('retries')
+        return True
+
+    @staticmethod
+    def _record_chunk(model: str, chunk) -> None:
+        # Groq reports usage on the final chunk under x_groq.
+        record_llm_usage(model, getattr(getattr(chunk, 'x_groq', None), 'usage', None))
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(max_concurrency=self.max_concurrency, max_retries=self.max_retries, coalesce=self.coalesce)
+        return stats
+
+
+class LLMClient(_LLMClientBase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def _make_client(self):
+        self.http_client = httpx.Client(timeout=self.timeout, limits=self._limits())
+        return groq.Groq(api_key=self.api_key, base_url=self.base_url, max_retries=0, http_client=self.http_client)
+
+    def _create(self, model: str, **kwargs):
+        attempt = 0
+        while True:
+            with self._semaphore:
+                self._count('in_flight')
+                self._count('upstream_calls')
+                try:
+                    return self.client.chat.completions.create(model=model, **kwargs)
+                except Exception as e:
+                    if not self._should_retry(model, attempt, e):
+                        raise
+                    delay = self._delay(attempt, e)
+                finally:
+                    self._count('in_flight', -1)
+            # Back off outside the semaphore so waiting callers can use the slot.
+            time.sleep(delay)
+            attempt += 1
+
+    def complete(self, model: str, messages: List[Dict], temperature: float = 0.1, max_tokens: int = 1024):
+        self._count('requests')
+        if not self.coalesce:
+            return self._complete(model, messages, temperature, max_tokens)
+        key = self._key(model, messages, temperature, max_tokens)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            LLM_COALESCED.inc(model=model)
+            self._count('coalesced')
+            return future.result()
+        try:
+            future.set_result(self._complete(model, messages, temperature, max_tokens))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        return future.result()
+
+    def _complete(self, model: str, messages: List[Dict], temperature: float, max_tokens: int):
+        response = self._create(model, messages=messages, temperature=temperature, max_tokens=max_tokens)
+        LLM_REQUESTS.inc(model=model, status='ok')
+        record_llm_usage(model, response.usage)
+        return response
+
+    def stream(self, model: str, messages: List[Dict], temperature: float = 0.1,
+               max_tokens: int = 1024) -> Iterator:
+        # Streams are not coalesced, and are only retried until the response starts.
+        # The slot is held until the stream is consumed or closed.
+        self._count('requests')
+        stream = self._create_stream(model, messages=messages, temperature=temperature, max_tokens=max_tokens)
+        try:
+            for chunk in stream:
+                self._record_chunk(model, chunk)
+                yield chunk
+        except Exception:
+            LLM_REQUESTS.inc(model=model, status='error')
+            self._count('errors')
+            raise
+        finally:
+            stream.close()
+            self._count('in_flight', -1)
+            self._semaphore.release()
+        LLM_REQUESTS.inc(model=model, status='ok')
+
+    def _create_stream(self, model: str, **kwargs):
+        # Returns holding a semaphore slot, which the caller releases when the stream ends.
+        attempt = 0
+        while True:
+            self._semaphore.acquire()
+            self._count('in_flight')
+            self._count('upstream_calls')
+            try:
+                return self.client.chat.completions.create(model=model, stream=True, **kwargs)
+            except BaseException as e:
+                self._count('in_flight', -1)
+                self._semaphore.release()
+                if not isinstance(e, Exception) or not self._should_retry(model, attempt, e):
+                    raise
+                delay = self._delay(attempt, e)
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        if self.http_client is not None:
+            self.http_client.close()
+
+
+class AsyncLLMClient(_LLMClientBase):
+    # asyncio primitives belong to one event loop, so use one instance per loop.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._inflight = {}
+
+    def _make_client(self):
+        self.http_client = httpx.AsyncClient(timeout=self.timeout, limits=self._limits())
+        return groq.AsyncGroq(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                              http_client=self.http_client)
+
+    async def _create(self, model: str, **kwargs):
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                self._count('in_flight')
+                self._count('upstream_calls')
+                try:
+                    return await self.client.chat.completions.create(model=model, **kwargs)
+                except Exception as e:
+                    if not self._should_retry(model, attempt, e):
+                        raise
+                    delay = self._delay(attempt, e)
+                finally:
+                    self._count('in_flight', -1)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def complete(self, model: str, messages: List[Dict], temperature: float = 0.1, max_tokens: int = 1024):
+        self._count('requests')
+        key = self._key(model, messages, temperature, max_tokens)
+        task = self._inflight.get(key) if self.coalesce else None
+        if task is not None:
+            LLM_COALESCED.inc(model=model)
+            self._count('coalesced')
+            # shield: one cancelled follower must not cancel the call the others wait on.
+            return await asyncio.shield(task)
+        task = asyncio.ensure_future(self._complete(model, messages, temperature, max_tokens))
+        if self.coalesce:
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _complete(self, model: str, messages: List[Dict], temperature: float, max_tokens: int):
+        response = await self._create(model, messages=messages, temperature=temperature, max_tokens=max_tokens)
+        LLM_REQUESTS.inc(model=model, status='ok')
+        record_llm_usage(model, response.usage)
+        return response
+
+    async def stream(self, model: str, messages: List[Dict], temperature: float = 0.1,
+                     max_tokens: int = 1024) -> AsyncIterator:
+        self._count('requests')
+        stream = await self._create_stream(model, messages=messages, temperature=temperature, max_tokens=max_tokens)
+        try:
+            async for chunk in stream:
+                self._record_chunk(model, chunk)
+                yield chunk
+        except Exception:
+            LLM_REQUESTS.inc(model=model, status='error')
+            self._count('errors')
+            raise
+        finally:
+            await stream.close()
+            self._count('in_flight', -1)
+            self._semaphore.release()
+        LLM_REQUESTS.inc(model=model, status='ok')
+
+    async def _create_stream(self, model: str, **kwargs):
+        attempt = 0
+        while True:
+            await self._semaphore.acquire()
+            self._count('in_flight')
+            self._count('upstream_calls')
+            try:
+                return await self.client.chat.completions.create(model=model, stream=True, **kwargs)
+            except BaseException as e:
+                self._count('in_flight', -1)
+                self._semaphore.release()
+                if not isinstance(e, Exception) or not self._should_retry(model, attempt, e):
+                    raise
+                delay = self._delay(attempt, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def close(self) -> None:
+        if self.http_client is not None:
+            await self.http_client.aclose()
@@ -0,0 +1,259 @@
+"""Metadata Store - Chunk metadata held in compact columns or read lazily from on-disk segments."""
+
+import os
+import json
+import mmap
+import bisect
+import numpy as np
+from typing import List, Dict, Iterator
+
+
+class _Segment:
+    # One append-only segment: JSON lines plus an int64 offset table (count + 1 entries).
+    def __init__(self, prefix: str, start: int, count: int):
+        self.prefix = prefix
+        self.start = start
+        self.count = count
+        self._offsets = None
+        self._mmap = None
+
+    def _open(self) -> None:
+        with open(self.prefix + ".meta", 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        # Assigned last: row() treats a loaded offset table as "segment is open".
+        self._offsets = np.load(self.prefix + ".offsets.npy", mmap_mode='r')
+
+    def row(self, i: int) -> Dict:
+        if self._offsets is None:
+            self._open()
+        return json.loads(self._mmap[int(self._offsets[i]):int(self._offsets[i + 1])])
+
+    def close(self) -> None:
+        if self._mmap:
+            self._mmap.close()
+        self._mmap = self._offsets = None
+
+
+class _Column:
+    # A numpy array that grows by doubling, so appends are amortized O(1).
+    def __init__(self, dtype):
+        self.data = np.empty(0, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values: List) -> None:
+        end = self.size + len(values)
+        if end > len(self.data):
+            grown = np.empty(max(end, 2 * len(self.data), 1024), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:end] = values
+        self.size = end
+
+
+class _ColumnarRows:
+    # In-memory rows as columns: int64 ids and page numbers, interned source names, and chunk
+    # text as byte ranges of one growing buffer per source, where a chunk that starts with the
+    # previous chunk's tail (the chunker's overlap) reuses those bytes. Keys outside COLUMNS
+    # (or with non-int values where an int is expected) are kept per row in `extras`; a row
+    # keeps exactly its keys.
+    COLUMNS = ('chunk_id', 'text', 'source', 'token_count', 'global_chunk_id', 'page_start', 'page_end')
+    INT_COLUMNS = ('chunk_id', 'token_count', 'global_chunk_id', 'page_start', 'page_end')
+    MISSING = np.iinfo(np.int64).min
+    # Embeddings belong in the index, not in metadata.
+    SKIP = ('embedding',)
+
+    def __init__(self):
+        self.ints = {name: _Column(np.int64) for name in self.INT_COLUMNS}
+        self.source = _Column(np.int32)
+        self.text_start = _Column(np.int64)
+        self.text_end = _Column(np.int64)
+        self.sources = []
+        self._source_ids = {}
+        self.buffers = []
+        self._last_text = {}
+        self.extras = {}
+
+    def __len__(self) -> int:
+        return self.source.size
+
+    def _intern(self, name) -> int:
+        source_id = self._source_ids.get(name)
+        if source_id is None:
+            source_id = self._source_ids[name] = len(self.sources)
+            self.sources.append(name)
+            self.buffers.append(bytearray())
+        return source_id
+
+    def extend(self, metas: List[Dict]) -> None:
+        first = len(self)
+        ints = {name: [] for name in self.INT_COLUMNS}
+        sources, starts, ends = [], [], []
+        for n, meta in enumerate(metas):
+            extra = {k: v for k, v in meta.items() if k not in self.COLUMNS and k not in self.SKIP}
+            for name in self.INT_COLUMNS:
+                value = meta.get(name)
+                if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+                    ints[name].append(value)
+                else:
+                    ints[name].append(self.MISSING)
+                    if name in meta:
+                        extra[name] = value
+            # A missing source is interned as None; the row then comes back without one.
+            source_id = self._intern(meta['source'] if isinstance(meta.get('source'), str) else None)
+            if 'source' in meta and not isinstance(meta['source'], str):
+                extra['source'] = meta['source']
+            sources.append(source_id)
+            text = meta.get('text')
+            if isinstance(text, str):
+                data = text.encode('utf-8')
+                buffer = self.buffers[source_id]
+                start = self._overlap_start(buffer, self._last_text.get(source_id), data)
+                buffer += data[len(buffer) - start:]
+                self._last_text[source_id] = (start, start + len(data))
+                starts.append(start)
+                ends.append(start + len(data))
+            else:
+                starts.append(-1)
+                ends.append(-1)
+                if 'text' in meta:
+                    extra['text'] = text
+            if extra:
+                self.extras[first + n] = extra
+        for name, values in ints.items():
+            self.ints[name].extend(values)
+        self.source.extend(sources)
+        self.text_start.extend(starts)
+        self.text_end.extend(ends)
+
+    @staticmethod
+    def _overlap_start(buffer: bytearray, last, data: bytes, probe_bytes: int = 32) -> int:
+        # Earliest offset in the previous chunk from which the buffer's tail is a prefix of
+        # data; UTF-8 is self-synchronizing, so a match always starts on a character.
+        if last is None or last[1] != len(buffer) or len(data) < probe_bytes:
+            return len(buffer)
+        prev_start, prev_end = last
+        probe = data[:probe_bytes]
+        p = buffer.find(probe, prev_start, prev_end)
+        while p != -1:
+            if prev_end - p <= len(data) and buffer[p:prev_end] == data[:prev_end - p]:
+                return p
+            p = buffer.find(probe, p + 1, prev_end)
+        return len(buffer)
+
+    def row(self, i: int) -> Dict:
+        row = {}
+        chunk_id = self.ints['chunk_id'].data[i]
+        if chunk_id != self.MISSING:
+            row['chunk_id'] = int(chunk_id)
+        source_id = int(self.source.data[i])
+        start = int(self.text_start.data[i])
+        if start >= 0:
+            row['text'] = self.buffers[source_id][start:int(self.text_end.data[i])].decode('utf-8')
+        if self.sources[source_id] is not None:
+            row['source'] = self.sources[source_id]
+        for name in self.INT_COLUMNS[1:]:
+            value = self.ints[name].data[i]
+            if value != self.MISSING:
+                row[name] = int(value)
+        extra = self.extras.get(i)
+        if extra:
+            row.update(extra)
+        return row
+
+    def memory_usage(self) -> int:
+        columns = list(self.ints.values()) + [self.source, self.text_start, self.text_end]
+        return (sum(c.data.nbytes for c in columns) + sum(len(b) for b in self.buffers)
+                + sum(len(s or '') + 64 for s in self.sources)
+                + len(self.extras) * ChunkMetadataStore.ROW_OVERHEAD_BYTES)
+
+
+class ChunkMetadataStore:
+    # Rough per-row cost of a small dict, for rows with keys outside the columns.
+    ROW_OVERHEAD_BYTES = 400
+    MISSING = _ColumnarRows.MISSING
+
+    def __init__(self):
+        self._segments = []
+        self._segment_starts = []
+        self._memory = _ColumnarRows()
+        self._memory_start = 0
+
+    def __len__(self) -> int:
+        return self._memory_start + len(self._memory)
+
+    def __getitem__(self, i: int) -> Dict:
+        # A fresh dict per call: callers may add fields (scores) without touching the store.
+        if i < 0:
+            i += len(self)
+        if i >= self._memory_start:
+            if i >= len(self):
+                raise IndexError(i)
+            return self._memory.row(i - self._memory_start)
+        segment = self._segments[bisect.bisect_right(self._segment_starts, i) - 1]
+        return segment.row(i - segment.start)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def segments(self) -> int:
+        return len(self._segments)
+
+    def take(self, ids: np.ndarray, batch: int = 4096) -> 'ChunkMetadataStore':
+        # A new in-memory store with just these rows, in order. Text buffers are rebuilt
+        # from the rows taken, so the bytes of rows left behind are released.
+        store = ChunkMetadataStore()
+        for first in range(0, len(ids), batch):
+            store.extend([self[int(i)] for i in ids[first:first + batch]])
+        return store
+
+    def append(self, meta: Dict) -> None:
+        self._memory.extend([meta])
+
+    def int_values(self, name: str, ids: np.ndarray) -> np.ndarray:
+        # One integer column (see _ColumnarRows.INT_COLUMNS) for many rows, MISSING where a
+        # row lacks it. In-memory rows are read straight from the column; rows in on-disk
+        # segments are parsed.
+        ids = np.asarray(ids, dtype=np.int64)
+        values = np.full(len(ids), self.MISSING, dtype=np.int64)
+        in_memory = ids >= self._memory_start
+        values[in_memory] = self._memory.ints[name].data[ids[in_memory] - self._memory_start]
+        for n in np.flatnonzero(~in_memory):
+            value = self[int(ids[n])].get(name)
+            if isinstance(value, int) and not isinstance(value, bool):
+                values[n] = value
+        return values
+
+    def extend(self, metas: List[Dict]) -> None:
+        self._memory.extend(metas)
+
+    def memory_usage(self) -> int:
+        # Rows in attached segments live in the page cache, not in this process's heap.
+        return self._memory.memory_usage()
+
+    def attach_segment(self, prefix: str, start: int, count: int) -> None:
+        # Only valid while everything so far is on disk; rows are read on first access.
+        if len(self._memory) or start != self._memory_start:
+            raise ValueError("Segments must be attached in order before any in-memory rows")
+        self._segments.append(_Segment(prefix, start, count))
+        self._segment_starts.append(start)
+        self._memory_start = start + count
+
+    def write_segment(self, prefix: str, start: int, end: int) -> None:
+        offsets = np.zeros(end - start + 1, dtype=np.int64)
+        with open(prefix + ".meta", 'wb') as f:
+            for n, i in enumerate(range(start, end), start=1):
+                f.write(json.dumps(self[i]).encode('utf-8') + b"\n")
+                offsets[n] = f.tell()
+        np.save(prefix + ".offsets.npy", offsets)
+
+    def close(self) -> None:
+        for segment in self._segments:
+            segment.close()
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict]) -> 'ChunkMetadataStore':
+        store = cls()
+        store.extend(rows)
+        return store
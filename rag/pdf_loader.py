@@ -1,44 +1,118 @@
 """PDF Loader - Extracts text from PDF files using pdfplumber."""
 
-import pdfplumber
 import os
-from typing import List, Dict
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Iterator, Optional, Tuple
+
+from .lazy import lazy_import
+from .metrics import observe_stage
+
+pdfplumber = lazy_import('pdfplumber')
+
+
+def _extract_page(page) -> Tuple[str, float]:
+    start = time.perf_counter()
+    text = page.extract_text() or ""
+    # pdfplumber keeps every parsed character and the text map on the page object, and the
+    # document keeps every page object; closing the page keeps memory flat across a long file.
+    page.close()
+    return text, time.perf_counter() - start
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[str, float]]:
+    # Runs in a worker process, so it must stay a picklable module-level function.
+    # Timings travel back with the text since worker processes have their own metrics.
+    with pdfplumber.open(file_path) as pdf:
+        return [_extract_page(pdf.pages[i]) for i in range(start, end)]
 
 
 class PDFLoader:
-    def __init__(self):
+    def __init__(self, max_workers: int = 0, pages_per_task: int = 16):
         self.extracted_documents = []
+        self.max_workers = max_workers
+        self.pages_per_task = max(1, pages_per_task)
+
+    @staticmethod
+    def process_pool(max_workers: int) -> ProcessPoolExecutor:
+        # Workers come from a forkserver, not a fork of this process: a fork taken while other
+        # threads hold locks (the import lock, model loads) can deadlock, and would inherit
+        # every loaded model.
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('forkserver'))
 
-    def load_single_pdf(self, file_path: str) -> Dict:
+    def _count_pages(self, file_path: str) -> int:
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+
+    def iter_pages(self, file_path: str, executor: Optional[Executor] = None) -> Iterator[Dict]:
+        # Pages are yielded in order as soon as their range is extracted, so callers
+        # can start processing before the whole file has been parsed.
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"PDF not found: {file_path}")
 
-        filename = os.path.basename(file_path)
-        pages_text = []
-        full_text = []
+        if executor is None and self.max_workers <= 1:
+            with pdfplumber.open(file_path) as pdf:
+                for page_num, page in enumerate(pdf.pages, start=1):
+                    text, seconds = _extract_page(page)
+                    observe_stage('extract_page', seconds)
+                    yield {'page_number': page_num, 'text': text}
+            return
 
-        with pdfplumber.open(file_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, start=1):
-                text = page.extract_text() or ""
-                pages_text.append({'page_number': page_num, 'text': text})
-                full_text.append(text)
+        own_executor = executor is None
+        if own_executor:
+            executor = self.process_pool(self.max_workers)
+        pending = deque()
+        try:
+            total = self._count_pages(file_path)
+            ranges = deque((s, min(s + self.pages_per_task, total))
+                           for s in range(0, total, self.pages_per_task))
+            # Keep a bounded window of ranges in flight so memory does not grow with page count.
+            window = max(2, 2 * (self.max_workers or 1))
+            while ranges or pending:
+                while ranges and len(pending) < window:
+                    start, end = ranges.popleft()
+                    pending.append((start, executor.submit(_extract_page_range, file_path, start, end)))
+                start, future = pending.popleft()
+                for offset, (text, seconds) in enumerate(future.result()):
+                    observe_stage('extract_page', seconds)
+                    yield {'page_number': start + offset + 1, 'text': text}
+        finally:
+            for _, future in pending:
+                future.cancel()
+            if own_executor:
+                executor.shutdown(cancel_futures=True)
+
+    def load_single_pdf(self, file_path: str, executor: Optional[Executor] = None) -> Dict:
+        filename = os.path.basename(file_path)
+        pages_text = list(self.iter_pages(file_path, executor))
 
         return {
             'filename': filename,
             'file_path': file_path,
             'total_pages': len(pages_text),
             'pages': pages_text,
-            'full_text': '\n\n'.join(full_text)
+            'full_text': '\n\n'.join(p['text'] for p in pages_text)
         }
 
+    def _load_isolated(self, file_path: str, executor: Optional[Executor] = None) -> Optional[Dict]:
+        try:
+            return self.load_single_pdf(file_path, executor)
+        except Exception as e:
+            print(f"Error loading {file_path}: {e}")
+            return None
+
     def load_multiple_pdfs(self, file_paths: List[str]) -> List[Dict]:
-        documents = []
-        for file_path in file_paths:
-            try:
-                doc = self.load_single_pdf(file_path)
-                documents.append(doc)
-            except Exception as e:
-                print(f"Error loading {file_path}: {e}")
+        if self.max_workers <= 1 or len(file_paths) <= 1:
+            results = [self._load_isolated(fp) for fp in file_paths]
+        else:
+            # One process pool shared by all files; a driver thread per file keeps
+            # page ranges from every file queued so workers never sit idle between files.
+            with self.process_pool(self.max_workers) as executor, \
+                    ThreadPoolExecutor(max_workers=len(file_paths)) as drivers:
+                results = list(drivers.map(lambda fp: self._load_isolated(fp, executor), file_paths))
+        documents = [doc for doc in results if doc is not None]
         self.extracted_documents = documents
         return documents
 
@@ -0,0 +1,112 @@
+"""Model Registry - Loads embedding models and tokenizers once per process."""
+
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .batcher import EmbeddingBatcher
+from .embedding_backends import OnnxEmbeddingBackend
+from .lazy import lazy_import
+from .metrics import observe_stage
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+sentence_transformers = lazy_import('sentence_transformers')
+transformers = lazy_import('transformers')
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._handles = {}
+        self._stats = {}
+        self._batchers = {}
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _get_or_load(self, kind: str, name: str, loader):
+        key = (kind, name)
+        handle = self._handles.get(key)
+        if handle is None:
+            # Per-key lock: concurrent first requests wait for one load,
+            # while other models can still load in parallel.
+            with self._key_lock(key):
+                handle = self._handles.get(key)
+                if handle is None:
+                    print(f"Loading {kind}: {name}...")
+                    start = time.perf_counter()
+                    handle = loader(name)
+                    elapsed = time.perf_counter() - start
+                    observe_stage('model_load', elapsed)
+                    stats = {'kind': kind, 'name': name, 'load_seconds': round(elapsed, 3),
+                             'memory_bytes': self._estimate_memory(handle), 'requests': 0}
+                    with self._lock:
+                        self._stats[key] = stats
+                    self._handles[key] = handle
+                    print(f"Loaded {kind} {name} in {elapsed:.2f}s")
+        with self._lock:
+            self._stats[key]['requests'] += 1
+        return handle
+
+    @staticmethod
+    def _estimate_memory(handle) -> Optional[int]:
+        if not hasattr(handle, 'parameters'):
+            return None
+        total = 0
+        for tensor in list(handle.parameters()) + list(handle.buffers()):
+            total += tensor.numel() * tensor.element_size()
+        return total
+
+    def get_embedding_model(self, model_name: str) -> 'SentenceTransformer':
+        return self._get_or_load('embedding_model', model_name, sentence_transformers.SentenceTransformer)
+
+    def get_onnx_embedding_model(self, model_name: str, export_dir: str, quantize: bool = False,
+                                 threads: int = 0) -> OnnxEmbeddingBackend:
+        model_dir = OnnxEmbeddingBackend.model_dir(export_dir, model_name)
+
+        def load(_):
+            # The first run converts the PyTorch model; later runs only load the ONNX file.
+            if not OnnxEmbeddingBackend.is_exported(model_dir, quantize):
+                OnnxEmbeddingBackend.export(self.get_embedding_model(model_name), model_dir, quantize)
+            return OnnxEmbeddingBackend(model_dir, quantize, threads)
+        name = f"{model_name} (int8)" if quantize else model_name
+        return self._get_or_load('onnx_embedding_model', name, load)
+
+    def get_query_batcher(self, model_id: str, encode_batch, max_wait_ms: float = 2.0,
+                          max_batch: int = 32) -> EmbeddingBatcher:
+        # One per model, so queries from every session share the same batches.
+        with self._lock:
+            batcher = self._batchers.get(model_id)
+            if batcher is None:
+                batcher = self._batchers[model_id] = EmbeddingBatcher(encode_batch, max_wait_ms, max_batch)
+            return batcher
+
+    def get_tokenizer(self, tokenizer_name: str):
+        return self._get_or_load('tokenizer', tokenizer_name, transformers.AutoTokenizer.from_pretrained)
+
+    def warm_up(self, embedding_models: Optional[List[str]] = None,
+                tokenizers: Optional[List[str]] = None) -> None:
+        for name in embedding_models or []:
+            self.get_embedding_model(name)
+        for name in tokenizers or []:
+            try:
+                self.get_tokenizer(name)
+            except Exception as e:
+                print(f"Error loading tokenizer {name}: {e}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = [dict(s) for s in self._stats.values()]
+        return {
+            'loaded': len(stats),
+            'total_memory_bytes': sum(s['memory_bytes'] or 0 for s in stats),
+            'total_load_seconds': round(sum(s['load_seconds'] for s in stats), 3),
+            'models': stats
+        }
+
+
+model_registry = ModelRegistry()
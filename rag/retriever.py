@@ -1,25 +1,92 @@
 """Retriever - Finds relevant chunks for a query."""
 
+import numpy as np
 from typing import List, Dict, Tuple, Optional
+from .cache import LRUCache
+from .context import ContextAssembler
 from .embeddings import EmbeddingGenerator
+from .metrics import timed
+from .text_cleaner import TextCleaner
 from .vector_store import FAISSVectorStore
 
 
 class Retriever:
     def __init__(self, embedding_generator: EmbeddingGenerator, 
-                 vector_store: FAISSVectorStore, top_k: int = 5):
+                 vector_store: FAISSVectorStore, top_k: int = 5, query_cache: Optional[LRUCache] = None,
+                 assembler: Optional[ContextAssembler] = None):
         self.embedding_generator = embedding_generator
         self.vector_store = vector_store
         self.top_k = top_k
+        # Query embeddings only depend on the model, so one cache can be shared by every session.
+        self.query_cache = query_cache
+        self.text_cleaner = TextCleaner()
+        self.assembler = assembler
 
-    def retrieve(self, query: str, top_k: Optional[int] = None) -> List[Dict]:
+    def embed_query(self, query: str):
+        if self.query_cache is None:
+            return self.embedding_generator.generate_embedding(query)
+        key = (self.embedding_generator.model_id, self.text_cleaner.clean_query(query))
+        query_embedding = self.query_cache.get(key)
+        if query_embedding is None:
+            query_embedding = self.embedding_generator.generate_embedding(key[1])
+            self.query_cache.put(key, query_embedding)
+        return query_embedding
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        # Cache hits are reused; every miss goes through one batched encode.
+        keys = [self.text_cleaner.clean_query(q) for q in queries]
+        embeddings = np.zeros((len(queries), self.embedding_generator.embedding_dimension), dtype=np.float32)
+        misses = []
+        for i, key in enumerate(keys):
+            cached = self.query_cache.get((self.embedding_generator.model_id, key)) if self.query_cache else None
+            if cached is not None:
+                embeddings[i] = cached
+            elif key.strip():
+                misses.append(i)
+        if misses:
+            encoded = self.embedding_generator.generate_embeddings([keys[i] for i in misses], len(misses),
+                                                                   stage='embed_query')
+            embeddings[misses] = encoded
+            if self.query_cache is not None:
+                for i, embedding in zip(misses, encoded):
+                    self.query_cache.put((self.embedding_generator.model_id, keys[i]), embedding)
+        return embeddings
+
+    def retrieve(self, query: str, top_k: Optional[int] = None, sources: Optional[List[str]] = None,
+                 pages: Optional[List[Tuple[int, int]]] = None) -> List[Dict]:
+        # sources and pages scope the search to those documents and (first, last) page ranges.
         k = top_k or self.top_k
-        query_embedding = self.embedding_generator.generate_embedding(query)
-        results = self.vector_store.search(query_embedding, top_k=k)
+        query_embedding = self.embed_query(query)
+        results = self.vector_store.search(query_embedding, top_k=k, sources=sources, pages=pages)
         return [{**meta, 'similarity_score': score} for meta, score in results]
 
+    def retrieve_batch(self, queries: List[str], top_k: Optional[int] = None, sources: Optional[List[str]] = None,
+                       pages: Optional[List[Tuple[int, int]]] = None) -> List[List[Dict]]:
+        # Same results as retrieve() per query, from one encode and one multi-row search.
+        if not queries:
+            return []
+        k = top_k or self.top_k
+        batch = self.vector_store.search_batch(self.embed_queries(queries), top_k=k, sources=sources, pages=pages)
+        return [[{**meta, 'similarity_score': score} for meta, score in results] for results in batch]
+
+    def _assemble(self, chunks: List[Dict]) -> Tuple[List[Dict], Optional[Dict]]:
+        if self.assembler is None:
+            return chunks, None
+        with timed('assemble', len(chunks)):
+            return self.assembler.assemble(chunks)
+
+    def retrieve_assembled(self, query: str, top_k: Optional[int] = None, sources: Optional[List[str]] = None,
+                           pages: Optional[List[Tuple[int, int]]] = None) -> Tuple[List[Dict], Optional[Dict]]:
+        # Chunks ready for the prompt: merged, deduplicated and within the token budget.
+        return self._assemble(self.retrieve(query, top_k, sources, pages))
+
+    def retrieve_assembled_batch(self, queries: List[str], top_k: Optional[int] = None,
+                                 sources: Optional[List[str]] = None, pages: Optional[List[Tuple[int, int]]] = None
+                                 ) -> List[Tuple[List[Dict], Optional[Dict]]]:
+        return [self._assemble(chunks) for chunks in self.retrieve_batch(queries, top_k, sources, pages)]
+
     def retrieve_with_context(self, query: str, top_k: Optional[int] = None) -> Tuple[str, List[Dict]]:
-        chunks = self.retrieve(query, top_k)
+        chunks, _ = self.retrieve_assembled(query, top_k)
         context_parts = []
         for c in chunks:
             context_parts.append(f"[{c.get('source', 'Doc')}] (Score: {c['similarity_score']:.2f})\n{c['text']}")
@@ -27,8 +94,12 @@ class Retriever:
 
     def get_stats(self) -> Dict:
         return {
-            'model': self.embedding_generator.model_name,
+            'model': self.embedding_generator.model_id,
             'dimension': self.embedding_generator.embedding_dimension,
             'vectors': self.vector_store.get_stats(),
+            'embedding_cache': self.embedding_generator.cache.get_stats() if self.embedding_generator.cache else None,
+            'query_cache': self.query_cache.get_stats() if self.query_cache else None,
+            'query_batcher': self.embedding_generator.batcher.get_stats() if self.embedding_generator.batcher else None,
+            'context_assembly': self.assembler.get_stats() if self.assembler else None,
             'top_k': self.top_k
         }
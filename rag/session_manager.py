@@ -0,0 +1,201 @@
+"""Session Manager - Bounded per-user sessions with LRU eviction and spill-to-disk."""
+
+import os
+import json
+import time
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class SessionManager:
+    SESSION_FILE = "session.json"
+    INDEX_DIR = "index"
+
+    def __init__(self, factory: Callable[[], Dict], spill_dir: str, max_sessions: int = 100,
+                 max_memory_bytes: int = 0, idle_ttl: int = 1800,
+                 is_busy: Optional[Callable[[str], bool]] = None):
+        # factory builds an empty session dict with at least 'vector_store',
+        # 'documents' and 'chat_history'; is_busy reports background work for a user.
+        self.factory = factory
+        self.spill_dir = spill_dir
+        self.max_sessions = max_sessions
+        self.max_memory_bytes = max_memory_bytes
+        self.idle_ttl = idle_ttl
+        self.is_busy = is_busy or (lambda user_id: False)
+        self._sessions = OrderedDict()  # user_id -> session, least recently used first
+        self._last_access = {}
+        self._leases = {}
+        self._evicting = set()
+        self._lock = threading.RLock()
+        # Striped per-user locks serialise one user's load, spill and removal.
+        self._user_locks = [threading.Lock() for _ in range(64)]
+        self._last_sweep = time.time()
+        self.stats = {'created': 0, 'evictions': 0, 'rehydrations': 0, 'expired': 0, 'spill_errors': 0}
+
+    def _spill_path(self, user_id: str) -> str:
+        return os.path.join(self.spill_dir, user_id)
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        return self._user_locks[hash(user_id) % len(self._user_locks)]
+
+    def _get(self, user_id: str, lease: bool) -> Dict:
+        # Loading and spilling happen under the user's lock only; the manager lock
+        # covers the bookkeeping, so one user's disk I/O never blocks the others.
+        with self._lock:
+            user_session = self._touch(user_id, lease)
+        if user_session is None:
+            with self._user_lock(user_id):
+                with self._lock:
+                    user_session = self._touch(user_id, lease)
+                if user_session is None:
+                    user_session = self.factory()
+                    rehydrated = self._rehydrate(user_id, user_session)
+                    with self._lock:
+                        self.stats['rehydrations' if rehydrated else 'created'] += 1
+                        self._sessions[user_id] = user_session
+                        self._touch(user_id, lease)
+        self._enforce_budget(keep=user_id)
+        return user_session
+
+    def _touch(self, user_id: str, lease: bool) -> Optional[Dict]:
+        # A session being spilled is not handed out; the caller waits for its user lock.
+        user_session = self._sessions.get(user_id)
+        if user_session is None or user_id in self._evicting:
+            return None
+        self._sessions.move_to_end(user_id)
+        self._last_access[user_id] = time.time()
+        if lease:
+            self._leases[user_id] = self._leases.get(user_id, 0) + 1
+        return user_session
+
+    def get(self, user_id: str) -> Dict:
+        return self._get(user_id, lease=False)
+
+    def acquire(self, user_id: str) -> Dict:
+        # A leased session is never evicted; callers release it when the request ends.
+        return self._get(user_id, lease=True)
+
+    def release(self, user_id: str) -> None:
+        with self._lock:
+            count = self._leases.get(user_id, 0) - 1
+            if count > 0:
+                self._leases[user_id] = count
+            else:
+                self._leases.pop(user_id, None)
+
+    def remove(self, user_id: str) -> None:
+        with self._user_lock(user_id):
+            with self._lock:
+                self._sessions.pop(user_id, None)
+                self._last_access.pop(user_id, None)
+            shutil.rmtree(self._spill_path(user_id), ignore_errors=True)
+
+    def _evictable(self, user_id: str) -> bool:
+        return not self._leases.get(user_id) and not self.is_busy(user_id)
+
+    @staticmethod
+    def estimate_bytes(user_session: Dict) -> int:
+        history = sum(len(e.get('question', '')) + len(e.get('answer', '')) for e in user_session['chat_history'])
+        return user_session['vector_store'].memory_usage() + history
+
+    def memory_usage(self) -> int:
+        # Summed without the manager lock: each store's memory_usage waits on that store's
+        # lock, which compaction and index rebuilds hold for a while.
+        with self._lock:
+            sessions = [s for u, s in self._sessions.items() if u not in self._evicting]
+        return sum(self.estimate_bytes(s) for s in sessions)
+
+    def _enforce_budget(self, keep: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            idle = []
+            if self.idle_ttl and now - self._last_sweep > min(60, self.idle_ttl):
+                self._last_sweep = now
+                idle = [u for u, t in self._last_access.items() if now - t > self.idle_ttl and u != keep]
+        for user_id in idle:
+            if self.evict(user_id, if_evictable=True):
+                with self._lock:
+                    self.stats['expired'] += 1
+
+        while True:
+            # Sessions already being spilled are as good as gone.
+            with self._lock:
+                over_budget = len(self._sessions) - len(self._evicting) > self.max_sessions
+            if not over_budget and self.max_memory_bytes:
+                over_budget = self.memory_usage() > self.max_memory_bytes
+            if not over_budget:
+                return
+            with self._lock:
+                victim = next((u for u in self._sessions
+                               if u != keep and u not in self._evicting and self._evictable(u)), None)
+            if victim is None or not self.evict(victim, if_evictable=True):
+                return
+
+    def evict(self, user_id: str, if_evictable: bool = False) -> bool:
+        with self._user_lock(user_id):
+            with self._lock:
+                user_session = self._sessions.get(user_id)
+                if user_session is None or (if_evictable and not self._evictable(user_id)):
+                    return False
+                # Marked before the I/O so no request is handed the session while it is written out.
+                self._evicting.add(user_id)
+            try:
+                try:
+                    self._spill(user_id, user_session)
+                except Exception as e:
+                    # Keep the session in memory rather than lose its documents.
+                    print(f"Error spilling session {user_id}: {e}")
+                    with self._lock:
+                        self.stats['spill_errors'] += 1
+                    return False
+                with self._lock:
+                    del self._sessions[user_id]
+                    self._last_access.pop(user_id, None)
+                    self.stats['evictions'] += 1
+                return True
+            finally:
+                with self._lock:
+                    self._evicting.discard(user_id)
+
+    def _spill(self, user_id: str, user_session: Dict) -> None:
+        path = self._spill_path(user_id)
+        if not user_session['documents'] and not user_session['chat_history']:
+            # An earlier spill would bring back documents deleted since.
+            shutil.rmtree(path, ignore_errors=True)
+            return
+        os.makedirs(path, exist_ok=True)
+        # Incremental when the store was rehydrated from this same directory.
+        user_session['vector_store'].save(os.path.join(path, self.INDEX_DIR))
+        tmp_path = os.path.join(path, self.SESSION_FILE + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'documents': user_session['documents'], 'chat_history': user_session['chat_history']}, f)
+        os.replace(tmp_path, os.path.join(path, self.SESSION_FILE))
+
+    def _rehydrate(self, user_id: str, user_session: Dict) -> bool:
+        path = self._spill_path(user_id)
+        session_file = os.path.join(path, self.SESSION_FILE)
+        if not os.path.exists(session_file):
+            return False
+        with open(session_file) as f:
+            saved = json.load(f)
+        index_path = os.path.join(path, self.INDEX_DIR)
+        if os.path.isdir(index_path) and not user_session['vector_store'].load(index_path):
+            print(f"Error loading spilled index for session {user_id}")
+            return False
+        user_session['documents'].extend(saved.get('documents', []))
+        user_session['chat_history'].extend(saved.get('chat_history', []))
+        return True
+
+    def get_stats(self) -> Dict:
+        memory_bytes = self.memory_usage()
+        with self._lock:
+            return {
+                **self.stats,
+                'active': len(self._sessions),
+                'leased': len(self._leases),
+                'memory_bytes': memory_bytes,
+                'max_sessions': self.max_sessions,
+                'max_memory_bytes': self.max_memory_bytes
+            }
@@ -2,45 +2,171 @@
 
 import re
 import unicodedata
-from typing import List, Dict
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .metrics import timed
+
+# Everything outside word characters, whitespace and this punctuation becomes a space.
+_DISALLOWED = re.compile(r'[^\w\s.,!?;:\'"()\-\[\]{}@#$%&*+=/<>]')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SPACE_RUN = re.compile(r'  +')
+# Earlier versions replaced this literal with an apostrophe (a quoting slip in a
+# str.replace chain); kept so cleaned text stays byte-identical.
+_LEGACY_LITERAL = ', "\'").replace('
+_DASHES = {'–': '-', '—': '-'}
+
+
+def _ascii_table() -> Dict[int, str]:
+    # Tabs become spaces up front: every tab ends up inside a collapsed [ \t]+ run anyway.
+    table = {ord('\t'): ' '}
+    for code in range(128):
+        if code != ord('\t') and _DISALLOWED.match(chr(code)):
+            table[code] = ' '
+    return table
+
+
+_ASCII_TABLE = str.maketrans(_ascii_table())
+
+
+def _map_characters(text: str) -> str:
+    # NFKD, dash folding and the character filter. ASCII text is NFKD-invariant and is
+    # handled by a single str.translate; anything else takes the regex filter.
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+    if _LEGACY_LITERAL in text:
+        text = text.replace(_LEGACY_LITERAL, "'")
+    if text.isascii():
+        return text.translate(_ASCII_TABLE)
+    for dash, replacement in _DASHES.items():
+        text = text.replace(dash, replacement)
+    text = _DISALLOWED.sub(' ', text)
+    return text.replace('\t', ' ') if '\t' in text else text
+
+
+def _clean_page(text: str) -> Tuple[str, str, str]:
+    # Returns the cleaned text plus what its leading/trailing whitespace contributes
+    # when pages are joined with '\n\n': the whitespace run spanning a page break
+    # collapses to (trail before its first newline) + '\n\n' + (lead after its last one).
+    text = _map_characters(text)
+    body = text.strip()
+    if not body:
+        return '', '', ''
+    start = len(text) - len(text.lstrip())
+    lead = text[:start].rsplit('\n', 1)[-1]
+    trail = text[start + len(body):].split('\n', 1)[0]
+    body = _SPACE_RUN.sub(' ', _PARAGRAPH_BREAK.sub('\n\n', body))
+    return body, _SPACE_RUN.sub(' ', lead), _SPACE_RUN.sub(' ', trail)
+
+
+def _clean_pages(texts: List[str]) -> List[Tuple[str, str, str]]:
+    # Runs in a worker process, so it must stay a picklable module-level function.
+    return [_clean_page(t) for t in texts]
+
+
+def _page_pieces(cleaned: List[Tuple[str, str, str]],
+                 previous_trail: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    # Each page's part of the joined text ('' for a blank page), plus the trail of the last
+    # non-blank page so that a later batch of pages can be joined onto these.
+    pieces = []
+    for body, lead, trail in cleaned:
+        if not body:
+            pieces.append('')
+            continue
+        pieces.append(body if previous_trail is None else previous_trail + '\n\n' + lead + body)
+        previous_trail = trail
+    return pieces, previous_trail
+
+
+def _join_pages(cleaned: List[Tuple[str, str, str]]) -> str:
+    return ''.join(_page_pieces(cleaned)[0])
 
 
 class TextCleaner:
-    def __init__(self):
-        pass
+    def __init__(self, max_workers: int = 0, parallel_min_chars: int = 2_000_000,
+                 pages_per_task: int = 32):
+        self.max_workers = max_workers
+        self.parallel_min_chars = parallel_min_chars
+        self.pages_per_task = max(1, pages_per_task)
 
     def clean_text(self, text: str) -> str:
         if not text:
             return ""
-        
-        # Normalize unicode
-        text = unicodedata.normalize('NFKD', text)
-        
-        # Replace special quotes
-        text = text.replace('"', '"').replace('"', '"')
-        text = text.replace(''', "'").replace(''', "'")
-        text = text.replace('–', '-').replace('—', '-')
-        
-        # Remove special characters but keep punctuation
-        text = re.sub(r'[^\w\s.,!?;:\'"()\-\[\]{}@#$%&*+=/<>]', ' ', text)
-        
-        # Normalize whitespace
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        text = re.sub(r'[ \t]+', ' ', text)
-        
-        return text.strip()
-
-    def clean_documents(self, documents: List[Dict]) -> List[Dict]:
+        return _clean_page(text)[0]
+
+    def clean_pages(self, texts: List[str], executor: Optional[Executor] = None) -> List[Tuple[str, str, str]]:
+        parallel = executor is not None or self.max_workers > 1
+        if not parallel or len(texts) < 2 or sum(len(t) for t in texts) < self.parallel_min_chars:
+            return _clean_pages(texts)
+        batches = [texts[i:i + self.pages_per_task] for i in range(0, len(texts), self.pages_per_task)]
+        if executor is not None:
+            return [page for batch in executor.map(_clean_pages, batches) for page in batch]
+        # A forkserver rather than a fork of this threaded process, as in PDFLoader.process_pool.
+        with ProcessPoolExecutor(max_workers=self.max_workers,
+                                 mp_context=multiprocessing.get_context('forkserver')) as pool:
+            return [page for batch in pool.map(_clean_pages, batches) for page in batch]
+
+    def clean_documents(self, documents: List[Dict], executor: Optional[Executor] = None) -> List[Dict]:
+        with timed('clean', sum(len(doc.get('pages') or ()) or 1 for doc in documents)):
+            return self._clean_documents(documents, executor)
+
+    def _clean_documents(self, documents: List[Dict], executor: Optional[Executor]) -> List[Dict]:
         cleaned = []
         for doc in documents:
             cleaned_doc = doc.copy()
-            cleaned_doc['full_text'] = self.clean_text(doc['full_text'])
-            if 'pages' in doc:
-                cleaned_doc['pages'] = [
-                    {**p, 'text': self.clean_text(p['text'])} for p in doc['pages']
-                ]
+            pages = doc.get('pages')
+            texts = [p['text'] for p in pages] if pages else None
+            # Each page is cleaned once; full_text is stitched from the cleaned pages
+            # whenever it is (or would be) the pages joined by blank lines.
+            if texts is not None and ('full_text' not in doc or doc['full_text'] == '\n\n'.join(texts)):
+                results = self.clean_pages(texts, executor)
+                cleaned_doc['pages'] = [{**p, 'text': r[0]} for p, r in zip(pages, results)]
+                cleaned_doc['full_text'] = _join_pages(results)
+            else:
+                cleaned_doc['full_text'] = self.clean_text(doc.get('full_text', ''))
+                if pages is not None:
+                    cleaned_doc['pages'] = [{**p, 'text': self.clean_text(p['text'])} for p in pages]
             cleaned.append(cleaned_doc)
         return cleaned
 
+    def iter_clean_text(self, texts: Iterable[str], executor: Optional[Executor] = None,
+                        window_pages: int = 32) -> Iterator[str]:
+        # Streaming clean_documents: page texts are cleaned a window at a time, and each
+        # page yields its piece of the cleaned full_text ('' for a blank page), so pieces
+        # line up with pages and concatenate to the full_text of the same pages.
+        # Without an executor windows are cleaned here: a pool per window costs more than it saves.
+        texts = iter(texts)
+        previous_trail = None
+        if executor is None:
+            while True:
+                window = list(islice(texts, max(1, window_pages)))
+                if not window:
+                    return
+                with timed('clean', len(window)):
+                    pieces, previous_trail = _page_pieces(_clean_pages(window), previous_trail)
+                yield from pieces
+        # With a long-lived pool, the next windows are cleaned in workers while this one is stitched.
+        pending = deque()
+        depth = max(2, 2 * (self.max_workers or 1))
+        try:
+            while True:
+                while len(pending) < depth:
+                    window = list(islice(texts, max(1, window_pages)))
+                    if not window:
+                        break
+                    pending.append((len(window), executor.submit(_clean_pages, window)))
+                if not pending:
+                    return
+                count, future = pending.popleft()
+                with timed('clean', count):
+                    pieces, previous_trail = _page_pieces(future.result(), previous_trail)
+                yield from pieces
+        finally:
+            for _, future in pending:
+                future.cancel()
+
     def clean_query(self, query: str) -> str:
         return re.sub(r'\s+', ' ', query.strip())
@@ -1,65 +1,865 @@
 """FAISS Vector Store - Stores and searches embeddings."""
 
 import os
+import re
 import json
+import math
+import tempfile
+import threading
 import numpy as np
-import faiss
 from typing import List, Dict, Tuple, Optional
+from .lazy import lazy_import
+from .metadata_store import ChunkMetadataStore
+from .metrics import timed
+
+faiss = lazy_import('faiss')
+
+
+class _VectorFile:
+    # Append-only float32 rows addressed by chunk id and read back through memory maps:
+    # rows of a saved vectors file, then rows appended since in an unlinked spool file.
+    def __init__(self, dimension: int, spool_dir: Optional[str] = None):
+        self.dimension = dimension
+        self.spool_dir = spool_dir
+        self._base = None
+        self._base_rows = 0
+        self._spool = None
+        self._spool_rows = 0
+        self._spool_map = None
+
+    def __len__(self) -> int:
+        return self._base_rows + self._spool_rows
+
+    def append(self, vectors: np.ndarray) -> None:
+        if self._spool is None:
+            self._spool = tempfile.TemporaryFile(dir=self.spool_dir)
+        self._spool.seek(0, os.SEEK_END)
+        self._spool.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._spool_rows += len(vectors)
+        self._spool_map = None
+
+    def take(self, ids: np.ndarray) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.empty((len(ids), self.dimension), dtype=np.float32)
+        in_base = ids < self._base_rows
+        if in_base.any():
+            out[in_base] = self._base[ids[in_base]]
+        if not in_base.all():
+            if self._spool_map is None:
+                self._spool.flush()
+                self._spool_map = np.memmap(self._spool, dtype=np.float32, mode='r',
+                                            shape=(self._spool_rows, self.dimension))
+            out[~in_base] = self._spool_map[ids[~in_base] - self._base_rows]
+        return out
+
+    def write(self, path: str, start: int) -> None:
+        # Writes rows from start onwards; a full rewrite goes through a new file so an
+        # existing mapping of the old one stays valid.
+        target = path if start else path + ".tmp"
+        with open(target, 'r+b' if start else 'wb') as f:
+            f.seek(start * self.dimension * 4)
+            for first in range(start, len(self), 65536):
+                f.write(self.take(np.arange(first, min(first + 65536, len(self)))).tobytes())
+        if not start:
+            os.replace(target, path)
+
+    def attach(self, path: str, rows: int) -> None:
+        self._base = np.memmap(path, dtype=np.float32, mode='r', shape=(rows, self.dimension)) if rows else None
+        self._base_rows = rows
+        self.close_spool()
+
+    def close_spool(self) -> None:
+        if self._spool is not None:
+            self._spool_map = None
+            self._spool.close()
+        self._spool, self._spool_rows = None, 0
+
+
+class _DocumentIds:
+    # One document's live chunk ids and the packed bitmap of them that IDSelectorBitmap
+    # reads (bit i of byte i // 8), stored from byte `offset` on; page spans are read from
+    # the metadata the first time a page filter needs them.
+    def __init__(self, ranges: List[List[int]]):
+        self.ids = np.concatenate([np.arange(start, end, dtype=np.int64) for start, end in ranges])
+        self.ids.sort()
+        self.offset = int(self.ids[0]) // 8
+        self.bitmap = self.pack(self.ids)
+        self.pages = None
+
+    def pack(self, ids: np.ndarray) -> np.ndarray:
+        mask = np.zeros(int(self.ids[-1]) + 1 - self.offset * 8, dtype=bool)
+        mask[ids - self.offset * 8] = True
+        return np.packbits(mask, bitorder='little')
 
 
 class FAISSVectorStore:
-    def __init__(self, dimension: int, index_path: Optional[str] = None):
+    # Index tiers in order; the store only ever moves up as the corpus grows.
+    TIERS = ('flat', 'hnsw', 'ivf')
+    FORMAT_VERSION = 3
+    # Format 2 indexes are positional; they are given sequential ids on load.
+    READABLE_VERSIONS = (2, 3)
+    MANIFEST_FILE = "manifest.json"
+    FULL_VECTORS_FILE = "vectors.f32"
+    COMPRESSIONS = ('none', 'fp16', 'int8', 'pq')
+    # Fewest vectors to train each codec on; k-means warns below 39 points per PQ centroid.
+    MIN_TRAINING = {'none': 0, 'fp16': 0, 'int8': 1, 'pq': 39 * 256}
+    # Compaction gives removed chunks still in an HNSW graph ids from here on: far above any
+    # chunk id, so no filter or result ever reaches them before a rebuild drops them.
+    RETIRED_ID_BASE = 1 << 62
+
+    def __init__(self, dimension: int, index_path: Optional[str] = None,
+                 hnsw_threshold: int = 50000, ivf_threshold: int = 500000,
+                 hnsw_m: int = 32, ef_construction: int = 200, ef_search: int = 64,
+                 nprobe: int = 16, background_rebuild: bool = True, compact_ratio: float = 0.5,
+                 tombstone_ratio: float = 0.2, compression: str = 'none', compress_threshold: int = 10000,
+                 pq_m: int = 48, rerank_factor: int = 4, spool_dir: Optional[str] = None,
+                 exact_filter_max: int = 1024):
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"Unknown index compression: {compression}")
+        if compression == 'pq' and dimension % pq_m:
+            raise ValueError(f"pq_m ({pq_m}) must divide the embedding dimension ({dimension})")
         self.dimension = dimension
         self.index_path = index_path
-        self.index = faiss.IndexFlatIP(dimension)
-        self.metadata = []
+        self.hnsw_threshold = hnsw_threshold
+        self.ivf_threshold = ivf_threshold
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+        self.background_rebuild = background_rebuild
+        self.compact_ratio = compact_ratio
+        self.tombstone_ratio = tombstone_ratio
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.pq_m = pq_m
+        self.rerank_factor = rerank_factor
+        self.spool_dir = spool_dir
+        # Filters matching at most this many chunks are scored exactly instead of searched.
+        self.exact_filter_max = exact_filter_max
+        self.tier = 'flat'
+        self.index = self._build_index('flat')
+        self.storage = self._detect_storage(self.index)
+        # Full-precision copies of every vector, on disk, while the index holds compressed
+        # codes: used to re-rank candidates and to rebuild without compounding the loss.
+        self._full = _VectorFile(dimension, spool_dir) if compression != 'none' else None
+        # Chunk ids are metadata row numbers; removed rows stay in the store but leave the index.
+        self.metadata = ChunkMetadataStore()
+        self.documents = {}  # source -> [[first_id, end_id], ...] of live chunks
+        self._document_ids = {}  # source -> _DocumentIds, built on first filtered search
+        # Ids removed from the store but still physically in an index that cannot delete
+        # in place (HNSW, or a read-only memory-mapped checkpoint); masked at search time.
+        self._tombstones = set()
+        self._tombstone_selector = None
+        self._removed_since_checkpoint = set()
+        self._pending_removals = None
+        self._rebuilding = None
+        # Set when self.index is a read-only memory-mapped checkpoint.
+        self._mmapped = False
+        self._saved_path = None
+        self._saved_count = 0
+        # Bumped whenever the indexed content changes; answer caches key on it.
+        self.version = 0
+        # Background ingestion adds while request threads search the same store.
+        self._lock = threading.RLock()
+
+    def _tier_for(self, ntotal: int) -> str:
+        if self.ivf_threshold and ntotal >= self.ivf_threshold:
+            return 'ivf'
+        if self.hnsw_threshold and ntotal >= self.hnsw_threshold:
+            return 'hnsw'
+        return 'flat'
+
+    def _storage_for(self, ntotal: int) -> str:
+        # Small indexes stay exact: compressed codes need enough vectors to train on.
+        if ntotal >= max(self.compress_threshold, self.MIN_TRAINING[self.compression]):
+            return self.compression
+        return 'none'
+
+    def _factory_string(self, tier: str, ntotal: int, storage: str) -> str:
+        # IVF stores ids natively; flat and HNSW are positional and need an id map.
+        codes = {'none': 'Flat', 'fp16': 'SQfp16', 'int8': 'SQ8', 'pq': f'PQ{self.pq_m}'}[storage]
+        if tier == 'hnsw':
+            return f"IDMap2,HNSW{self.hnsw_m},{codes}"
+        if tier == 'ivf':
+            return f"IVF{self.ivf_nlist(ntotal)},{codes}"
+        return f"IDMap2,{codes}"
+
+    @staticmethod
+    def ivf_nlist(ntotal: int) -> int:
+        return max(1, min(65536, int(4 * math.sqrt(ntotal))))
+
+    @staticmethod
+    def _inner(index):
+        return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+
+    def _build_index(self, tier: str, vectors: Optional[np.ndarray] = None, ids: Optional[np.ndarray] = None):
+        ntotal = 0 if vectors is None else len(vectors)
+        storage = self._storage_for(ntotal)
+        if tier == 'hnsw' and storage == 'pq':
+            # The factory builds HNSW over PQ with the L2 metric only.
+            index = faiss.IndexIDMap2(faiss.IndexHNSWPQ(self.dimension, self.pq_m, self.hnsw_m, 8,
+                                                        faiss.METRIC_INNER_PRODUCT))
+        else:
+            index = faiss.index_factory(self.dimension, self._factory_string(tier, ntotal, storage),
+                                        faiss.METRIC_INNER_PRODUCT)
+        inner = self._inner(index)
+        if tier == 'hnsw':
+            inner.hnsw.efConstruction = self.ef_construction
+        if tier == 'ivf':
+            # Rebuilds and document removal look vectors up by chunk id.
+            inner.set_direct_map_type(faiss.DirectMap.Hashtable)
+        if vectors is not None and ntotal:
+            if not index.is_trained:
+                # Train on a bounded sample; more rows barely change the centroids or codebooks.
+                sample_size = 256 * getattr(inner, 'nlist', 256)
+                sample = vectors[np.random.default_rng(0).permutation(ntotal)[:sample_size]]
+                index.train(sample)
+            index.add_with_ids(vectors, ids)
+        self._apply_search_params(index)
+        return index
+
+    def _apply_search_params(self, index) -> None:
+        params = faiss.ParameterSpace()
+        inner = self._inner(index)
+        if isinstance(inner, faiss.IndexHNSW):
+            params.set_index_parameter(inner, 'efSearch', self.ef_search)
+        elif isinstance(inner, faiss.IndexIVF):
+            params.set_index_parameter(inner, 'nprobe', self.nprobe)
+
+    def _search_params(self, selector):
+        inner = self._inner(self.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        if isinstance(inner, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        return faiss.SearchParameters(sel=selector)
+
+    def _index_ids(self, index) -> np.ndarray:
+        if isinstance(index, faiss.IndexIDMap):
+            return faiss.vector_to_array(index.id_map).astype(np.int64)
+        invlists = faiss.extract_index_ivf(index).invlists
+        return np.concatenate([np.zeros(0, dtype=np.int64)] + [
+            faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+            for l in range(invlists.nlist) if invlists.list_size(l)])
+
+    def _vectors(self, index, ids: np.ndarray) -> np.ndarray:
+        # A compressed index only reconstructs approximations; prefer the full-precision copies.
+        if self._full is not None:
+            return self._full.take(ids)
+        return index.reconstruct_batch(ids)
+
+    def _export(self, index) -> Tuple[np.ndarray, np.ndarray]:
+        ids = self._index_ids(index)
+        if self._tombstones:
+            ids = ids[~np.isin(ids, np.fromiter(self._tombstones, dtype=np.int64))]
+        ids.sort()
+        return self._vectors(index, ids), ids
+
+    def set_search_params(self, ef_search: Optional[int] = None, nprobe: Optional[int] = None,
+                          rerank_factor: Optional[int] = None) -> None:
+        with self._lock:
+            if ef_search is not None:
+                self.ef_search = ef_search
+            if nprobe is not None:
+                self.nprobe = nprobe
+            if rerank_factor is not None:
+                self.rerank_factor = rerank_factor
+            self._apply_search_params(self.index)
+
+    def _maybe_upgrade(self) -> None:
+        if self._rebuilding:
+            return
+        target = self._tier_for(self.count)
+        if self.TIERS.index(target) > self.TIERS.index(self.tier):
+            self._start_rebuild(target)
+        elif (len(self._tombstones) > self.tombstone_ratio * self.index.ntotal
+              or self.storage == 'none' and self._storage_for(self.count) != 'none'):
+            # Rebuild at the same tier to drop tombstoned vectors or to start compressing.
+            self._start_rebuild(self.tier)
+
+    def _start_rebuild(self, target: str) -> None:
+        self._rebuilding = target
+        if self.background_rebuild:
+            threading.Thread(target=self._rebuild, args=(target,), daemon=True,
+                             name=f"faiss-rebuild-{target}").start()
+        else:
+            self._rebuild(target)
+
+    def _rebuild(self, target: str) -> None:
+        upgraded = False
+        try:
+            with self._lock:
+                source = self.index
+                next_id = self.next_id
+                vectors, ids = self._export(source)
+                self._pending_removals = []
+            # The expensive build runs without the lock; searches, adds and removals continue on the old index.
+            new_index = self._build_index(target, vectors, ids)
+            del vectors, ids
+            with self._lock:
+                if self.index is not source:
+                    return
+                removed = np.array(self._pending_removals, dtype=np.int64)
+                added = np.setdiff1d(np.arange(next_id, self.next_id, dtype=np.int64), removed)
+                if len(added):
+                    new_index.add_with_ids(self._vectors(source, added), added)
+                self.index = new_index
+                self.tier = target
+                self.storage = self._detect_storage(new_index)
+                self._mmapped = False
+                self._set_tombstones(set())
+                self._pending_removals = None
+                if len(removed):
+                    self._remove_ids(removed[removed < next_id])
+                upgraded = True
+        except Exception as e:
+            print(f"Error rebuilding index as {target}: {e}")
+        finally:
+            with self._lock:
+                self._rebuilding = None
+                self._pending_removals = None
+                # The corpus may have crossed the next threshold during the build.
+                if upgraded:
+                    self._maybe_upgrade()
+
+    @property
+    def count(self) -> int:
+        return self.index.ntotal - len(self._tombstones)
+
+    @property
+    def next_id(self) -> int:
+        return len(self.metadata)
+
+    def _can_remove_in_place(self) -> bool:
+        return not self._mmapped and not isinstance(self._inner(self.index), faiss.IndexHNSW)
+
+    def _set_tombstones(self, tombstones: set) -> None:
+        self._tombstones = tombstones
+        self._tombstone_selector = None
+        if tombstones:
+            ids = np.fromiter(tombstones, dtype=np.int64)
+            batch = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+            # Keep the id array and inner selector alive as long as the wrapper.
+            self._tombstone_selector = (faiss.IDSelectorNot(batch), batch, ids)
+
+    def _remove_ids(self, ids: np.ndarray) -> None:
+        self._removed_since_checkpoint.update(ids.tolist())
+        if self._pending_removals is not None:
+            self._pending_removals.extend(ids.tolist())
+        if not self._can_remove_in_place():
+            self._set_tombstones(self._tombstones | set(ids.tolist()))
+        elif isinstance(self.index, faiss.IndexIDMap):
+            self.index.remove_ids(faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)))
+        else:
+            # The IVF hashtable direct map only removes from an explicit id array.
+            self.index.remove_ids(faiss.IDSelectorArray(len(ids), faiss.swig_ptr(ids)))
+
+    def _materialize(self) -> None:
+        # A memory-mapped checkpoint is read-only; copy it into RAM before the first write.
+        self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+        self._apply_search_params(self.index)
+        self._mmapped = False
+        if self._tombstones and self._can_remove_in_place():
+            tombstones = np.fromiter(self._tombstones, dtype=np.int64)
+            self._set_tombstones(set())
+            self._remove_ids(tombstones)
+
+    @staticmethod
+    def _track_chunk(documents: Dict, source: str, chunk_id: int) -> None:
+        ranges = documents.setdefault(source, [])
+        if ranges and ranges[-1][1] == chunk_id:
+            ranges[-1][1] = chunk_id + 1
+        else:
+            ranges.append([chunk_id, chunk_id + 1])
 
     def add_embeddings(self, embeddings: np.ndarray, chunks_metadata: List[Dict]) -> None:
         if len(embeddings) == 0:
             return
         embeddings = embeddings.astype(np.float32)
         faiss.normalize_L2(embeddings)
-        self.index.add(embeddings)
-        for meta in chunks_metadata:
-            self.metadata.append({k: v for k, v in meta.items() if k != 'embedding'})
-
-    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Tuple[Dict, float]]:
-        if self.index.ntotal == 0:
-            return []
-        query = query_embedding.astype(np.float32).reshape(1, -1)
-        faiss.normalize_L2(query)
-        top_k = min(top_k, self.index.ntotal)
-        scores, indices = self.index.search(query, top_k)
-        results = []
-        for idx, score in zip(indices[0], scores[0]):
-            if 0 <= idx < len(self.metadata):
-                results.append((self.metadata[idx], float(score)))
-        return results
-
-    def save(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            if self._mmapped:
+                self._materialize()
+            first_id = self.next_id
+            with timed('faiss_add', len(embeddings)):
+                self.index.add_with_ids(embeddings, np.arange(first_id, first_id + len(embeddings), dtype=np.int64))
+                if self._full is not None:
+                    self._full.append(embeddings)
+            self.metadata.extend(chunks_metadata)
+            for chunk_id, meta in enumerate(chunks_metadata, start=first_id):
+                self._track_chunk(self.documents, meta.get('source', ''), chunk_id)
+                self._document_ids.pop(meta.get('source', ''), None)
+            self.version += 1
+            self._maybe_upgrade()
+
+    def remove_document(self, source: str, start: int = 0, end: Optional[int] = None) -> int:
+        # Only chunk ids in [start, end) are removed, e.g. the old version of a document
+        # once its replacement (added from id `start` on) is complete.
+        with self._lock:
+            ranges = self.documents.get(source)
+            if not ranges:
+                return 0
+            end = self.next_id if end is None else end
+            removed, kept = [], []
+            for first, last in ranges:
+                low, high = max(first, start), min(last, end)
+                if low >= high:
+                    kept.append([first, last])
+                    continue
+                removed.append(np.arange(low, high, dtype=np.int64))
+                kept.extend(r for r in ([first, low], [high, last]) if r[0] < r[1])
+            if kept:
+                self.documents[source] = kept
+            else:
+                del self.documents[source]
+            self._document_ids.pop(source, None)
+            if not removed:
+                return 0
+            ids = np.concatenate(removed)
+            self._remove_ids(ids)
+            self.version += 1
+            if self.next_id - self.count > self.tombstone_ratio * self.next_id:
+                self.compact()
+            self._maybe_upgrade()
+            return len(ids)
+
+    def compact(self) -> int:
+        # Drops removed chunks for good: live chunks are renumbered 0..count-1 in order, and
+        # index ids, full-precision vectors, metadata rows and document ranges follow, so the
+        # text of removed chunks is released. Chunk ids taken before (next_id, search hits)
+        # do not survive this. Returns the number of rows dropped.
+        with self._lock:
+            live = self._live_ids(0, self.next_id)
+            dropped = self.next_id - len(live)
+            # A rebuild in flight exports and re-adds by the old ids; the next removal or save retries.
+            if not dropped or self._rebuilding:
+                return 0
+            if self._mmapped:
+                self._materialize()
+            self._renumber_index(live)
+            if self._full is not None:
+                full = _VectorFile(self.dimension, self.spool_dir)
+                for first in range(0, len(live), 65536):
+                    full.append(self._full.take(live[first:first + 65536]))
+                self._full = full
+            metadata, self.metadata = self.metadata, self.metadata.take(live)
+            metadata.close()
+            self.documents = {source: self._renumber_ranges(ranges, live) for source, ranges in self.documents.items()}
+            self._document_ids = {}
+            self._removed_since_checkpoint = set()
+            # Saved segments are numbered the old way; the next save rewrites everything.
+            self._saved_path, self._saved_count = None, 0
+            self.version += 1
+            return dropped
+
+    def _renumber_index(self, live: np.ndarray) -> None:
+        old_ids = self._index_ids(self.index)
+        order = np.argsort(old_ids)
+        sorted_ids = old_ids[order]
+        rank = np.minimum(np.searchsorted(live, sorted_ids), max(len(live) - 1, 0))
+        is_live = (live[rank] == sorted_ids) if len(live) else np.zeros(len(sorted_ids), dtype=bool)
+        new_sorted = np.where(is_live, rank, self.RETIRED_ID_BASE + np.cumsum(~is_live) - 1).astype(np.int64)
+
+        def renumber(ids: np.ndarray) -> np.ndarray:
+            return new_sorted[np.searchsorted(sorted_ids, ids)]
+
+        if isinstance(self.index, faiss.IndexIDMap):
+            faiss.copy_array_to_vector(renumber(old_ids), self.index.id_map)
+            if isinstance(self.index, faiss.IndexIDMap2):
+                self.index.construct_rev_map()
+        else:
+            ivf = faiss.extract_index_ivf(self.index)
+            invlists = ivf.invlists
+            for l in range(invlists.nlist):
+                n = invlists.list_size(l)
+                if n:
+                    ids = renumber(faiss.rev_swig_ptr(invlists.get_ids(l), n))
+                    codes = faiss.rev_swig_ptr(invlists.get_codes(l), n * invlists.code_size).copy()
+                    invlists.update_entries(l, 0, n, faiss.swig_ptr(ids), faiss.swig_ptr(codes))
+            # The hashtable maps chunk ids to list positions; rebuild it for the new ids.
+            ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+            ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        self._set_tombstones(set(new_sorted[~is_live].tolist()))
+
+    @staticmethod
+    def _renumber_ranges(ranges: List[List[int]], live: np.ndarray) -> List[List[int]]:
+        # Every id inside a range is live, so a range maps to a run starting at its first id's rank.
+        renumbered = []
+        for first, last in ranges:
+            start = int(np.searchsorted(live, first))
+            if renumbered and renumbered[-1][1] == start:
+                renumbered[-1][1] = start + last - first
+            else:
+                renumbered.append([start, start + last - first])
+        return renumbered
+
+    def _document_filter(self, source: str) -> Optional[_DocumentIds]:
+        document = self._document_ids.get(source)
+        if document is None and self.documents.get(source):
+            document = self._document_ids[source] = _DocumentIds(self.documents[source])
+        return document
+
+    def _filter(self, sources: Optional[List[str]],
+                pages: Optional[List[Tuple[int, int]]]) -> Tuple[np.ndarray, np.ndarray]:
+        # Ids of live chunks from the given documents that overlap any of the (first, last)
+        # page ranges, and the same set as one packed bitmap over all ids. Chunks without
+        # page numbers never match a page filter.
+        bitmap = np.zeros((self.next_id + 7) // 8, dtype=np.uint8)
+        selected = []
+        for source in dict.fromkeys(self.documents if sources is None else sources):
+            document = self._document_filter(source)
+            if document is None:
+                continue
+            ids, packed = document.ids, document.bitmap
+            if pages is not None:
+                if document.pages is None:
+                    document.pages = (self.metadata.int_values('page_start', document.ids),
+                                      self.metadata.int_values('page_end', document.ids))
+                starts, ends = document.pages
+                keep = np.zeros(len(ids), dtype=bool)
+                for first, last in pages:
+                    keep |= (starts != ChunkMetadataStore.MISSING) & (starts <= last) & (ends >= first)
+                if not keep.any():
+                    continue
+                ids = ids[keep]
+                packed = document.pack(ids)
+            bitmap[document.offset:document.offset + len(packed)] |= packed
+            selected.append(ids)
+        ids = np.concatenate(selected) if selected else np.zeros(0, dtype=np.int64)
+        return ids, bitmap
+
+    def _search_exact(self, queries: np.ndarray, ids: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Few enough candidates to score them all, which also sidesteps HNSW's weak recall
+        # when a selector rejects most of the graph.
+        with timed('faiss_exact', len(ids) * len(queries)):
+            scores = queries @ self._vectors(self.index, ids).T
+            if top_k < len(ids):
+                top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+                scores, ids = np.take_along_axis(scores, top, axis=1), ids[top]
+            else:
+                ids = np.broadcast_to(ids, scores.shape)
+            order = np.argsort(-scores, axis=1, kind='stable')
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5, sources: Optional[List[str]] = None,
+               pages: Optional[List[Tuple[int, int]]] = None) -> List[Tuple[Dict, float]]:
+        return self.search_batch(query_embedding.reshape(1, -1), top_k, sources, pages)[0]
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 5, sources: Optional[List[str]] = None,
+                     pages: Optional[List[Tuple[int, int]]] = None) -> List[List[Tuple[Dict, float]]]:
+        # One index call for all rows: FAISS parallelizes across queries and the lock is taken once.
+        # sources and pages restrict every row to those documents and (first, last) page ranges.
+        queries = np.array(query_embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        faiss.normalize_L2(queries)
+        with self._lock:
+            if self.count == 0 or len(queries) == 0:
+                return [[] for _ in range(len(queries))]
+            filtered = sources is not None or pages is not None
+            if filtered:
+                ids, bitmap = self._filter(sources, pages)
+                if len(ids) == 0:
+                    return [[] for _ in range(len(queries))]
+            count = len(ids) if filtered else self.count
+            top_k = min(top_k, count)
+            # Over-fetch from compressed codes, then re-score the candidates exactly.
+            rerank = self._full is not None and self.storage != 'none' and self.rerank_factor > 1
+            fetch = min(top_k * self.rerank_factor, count) if rerank else top_k
+            if filtered and len(ids) <= self.exact_filter_max:
+                all_scores, all_indices = self._search_exact(queries, ids, top_k)
+                rerank = False
+            else:
+                if filtered:
+                    # The bitmap already excludes removed chunks, so it replaces the tombstone mask.
+                    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+                    params = self._search_params(selector)
+                else:
+                    params = self._search_params(self._tombstone_selector[0]) if self._tombstones else None
+                with timed('faiss_search', len(queries)):
+                    all_scores, all_indices = self.index.search(queries, fetch, params=params)
+            batch = []
+            for query, indices, scores in zip(queries, all_indices, all_scores):
+                if rerank:
+                    with timed('faiss_rerank', fetch):
+                        indices = indices[indices >= 0]
+                        scores = self._full.take(indices) @ query
+                        order = np.argsort(-scores, kind='stable')[:top_k]
+                        indices, scores = indices[order], scores[order]
+                batch.append([(self.metadata[idx], float(score)) for idx, score in zip(indices, scores)
+                              if 0 <= idx < len(self.metadata)])
+        return batch
+
+    def _read_manifest(self, path: str) -> Optional[Dict]:
+        manifest_path = os.path.join(path, self.MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') not in self.READABLE_VERSIONS:
+            raise ValueError(f"Unsupported index format: {manifest.get('format_version')}")
+        return manifest
+
+    def _live_ids(self, start: int, end: int) -> np.ndarray:
+        parts = [np.arange(max(a, start), min(b, end), dtype=np.int64)
+                 for ranges in self.documents.values() for a, b in ranges if a < end and b > start]
+        return np.sort(np.concatenate([np.zeros(0, dtype=np.int64)] + parts))
+
+    def save(self, path: Optional[str] = None, compact: bool = False) -> None:
+        # Layout: manifest.json, an index checkpoint, and append-only segments holding
+        # metadata rows (JSON lines + offsets) and, past the checkpoint, raw float32 vectors
+        # with their chunk ids. Ids removed since the checkpoint are listed as deleted.
+        # Saving again to the same directory only writes rows added since the last save; a
+        # checkpoint compacts removed chunks away and rewrites the metadata as one segment.
         save_path = path or self.index_path
         if not save_path:
             return
+        save_path = os.path.abspath(save_path)
         os.makedirs(save_path, exist_ok=True)
-        faiss.write_index(self.index, os.path.join(save_path, "index.faiss"))
-        with open(os.path.join(save_path, "metadata.json"), 'w') as f:
-            json.dump(self.metadata, f)
+        with self._lock:
+            manifest = self._read_manifest(save_path) if save_path == self._saved_path else None
+            # Upgrading an older manifest in place keeps its file numbering and writes a checkpoint,
+            # since its tail vectors carry no ids.
+            upgrade = manifest is not None and manifest['format_version'] != self.FORMAT_VERSION
+            if upgrade:
+                manifest['format_version'] = self.FORMAT_VERSION
+            start = self._saved_count if manifest else 0
+            if manifest is None:
+                # File names continue from whatever the directory holds, so the files of a
+                # previous save stay intact until the new manifest replaces it.
+                try:
+                    previous = self._read_manifest(save_path)
+                except ValueError:
+                    previous = None
+                manifest = {'format_version': self.FORMAT_VERSION, 'dimension': self.dimension,
+                            'checkpoint': None, 'segments': [], 'next_file': previous['next_file'] if previous else 1}
+            checkpoint_count = manifest['checkpoint']['ntotal'] if manifest['checkpoint'] else 0
+            write_checkpoint = (compact or upgrade or manifest['checkpoint'] is None
+                                or self.index.ntotal - checkpoint_count > self.compact_ratio * checkpoint_count)
+            if write_checkpoint:
+                self.compact()
+                start, manifest['segments'] = 0, []
+            ntotal, rows = self.index.ntotal, self.next_id
+
+            if rows > start:
+                name = f"seg-{manifest['next_file']:06d}"
+                manifest['next_file'] += 1
+                prefix = os.path.join(save_path, name)
+                self.metadata.write_segment(prefix, start, rows)
+                if not write_checkpoint:
+                    ids = self._live_ids(start, rows)
+                    self._vectors(self.index, ids).tofile(prefix + ".vec")
+                    np.save(prefix + ".ids.npy", ids)
+                # Rows removed before they were ever saved have no vectors on disk to delete.
+                self._removed_since_checkpoint = {i for i in self._removed_since_checkpoint if not start <= i < rows}
+                manifest['segments'].append({'name': name, 'start': start, 'count': rows - start,
+                                             'vectors': not write_checkpoint})
+
+            if write_checkpoint:
+                name = f"index-{manifest['next_file']:06d}.faiss"
+                manifest['next_file'] += 1
+                faiss.write_index(self.index, os.path.join(save_path, name))
+                manifest['checkpoint'] = {'file': name, 'ntotal': ntotal}
+                for segment in manifest['segments']:
+                    segment['vectors'] = False
+                self._removed_since_checkpoint = set(self._tombstones)
+
+            if self._full is not None:
+                full_path = os.path.join(save_path, self.FULL_VECTORS_FILE)
+                self._full.write(full_path, manifest.get('full_vectors', 0) if start else 0)
+                self._full.attach(full_path, rows)
+                manifest['full_vectors'] = rows
+
+            if write_checkpoint and self.metadata.segments and rows:
+                # The segments it read from were just replaced; read rows from the merged one.
+                metadata, self.metadata = self.metadata, ChunkMetadataStore()
+                self.metadata.attach_segment(os.path.join(save_path, manifest['segments'][-1]['name']), 0, rows)
+                metadata.close()
+
+            manifest['tier'] = self.tier
+            manifest['compression'] = self.storage
+            manifest['documents'] = self.documents
+            manifest['deleted'] = sorted(self._removed_since_checkpoint)
+            tmp_path = os.path.join(save_path, self.MANIFEST_FILE + ".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, os.path.join(save_path, self.MANIFEST_FILE))
+            self._remove_unreferenced(save_path, manifest)
+            self._saved_path, self._saved_count = save_path, rows
+
+    @staticmethod
+    def _remove_unreferenced(path: str, manifest: Dict) -> None:
+        keep = {manifest['checkpoint']['file']} if manifest['checkpoint'] else set()
+        for segment in manifest['segments']:
+            keep.update({segment['name'] + ".meta", segment['name'] + ".offsets.npy"})
+            if segment['vectors']:
+                keep.update({segment['name'] + ".vec", segment['name'] + ".ids.npy"})
+        for name in os.listdir(path):
+            if re.match(r'(seg-\d+\.|index-\d+\.faiss$)', name) and name not in keep:
+                os.remove(os.path.join(path, name))
 
-    def load(self, path: Optional[str] = None) -> bool:
+    def _detect_tier(self, index) -> str:
+        inner = self._inner(index)
+        if isinstance(inner, faiss.IndexHNSW):
+            return 'hnsw'
+        if isinstance(inner, faiss.IndexIVF):
+            return 'ivf'
+        return 'flat'
+
+    def _detect_storage(self, index) -> str:
+        inner = self._inner(index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner = faiss.downcast_index(inner.storage)
+        if isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+            return 'fp16' if inner.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else 'int8'
+        if isinstance(inner, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+            return 'pq'
+        return 'none'
+
+    def _code_size(self, index) -> int:
+        inner = self._inner(index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner = faiss.downcast_index(inner.storage)
+        return inner.code_size
+
+    def _load_full_vectors(self, path: str, manifest: Optional[Dict], index, rows: int) -> Optional[_VectorFile]:
+        if self.compression == 'none':
+            return None
+        full = _VectorFile(self.dimension, self.spool_dir)
+        if manifest and manifest.get('full_vectors') == rows:
+            full.attach(os.path.join(path, self.FULL_VECTORS_FILE), rows)
+            return full
+        if self._detect_storage(index) != 'none':
+            print("Full-precision vectors missing; searching compressed codes without re-ranking")
+            return None
+        # Saved uncompressed: the index itself holds the exact vectors. Removed rows stay zero.
+        ids = np.sort(self._index_ids(index))
+        for first in range(0, rows, 65536):
+            block = np.zeros((min(65536, rows - first), self.dimension), dtype=np.float32)
+            present = ids[(ids >= first) & (ids < first + len(block))]
+            block[present - first] = index.reconstruct_batch(present)
+            full.append(block)
+        return full
+
+    @staticmethod
+    def _with_ids(index):
+        # Older files hold positional flat/HNSW indexes; their chunk ids are the positions.
+        if isinstance(index, faiss.IndexIVF):
+            if index.direct_map.type != faiss.DirectMap.Hashtable:
+                index.set_direct_map_type(faiss.DirectMap.Hashtable)
+            return index
+        if isinstance(index, faiss.IndexIDMap):
+            return index
+        # IndexIDMap2 only wraps an empty index, so swap the loaded one in afterwards.
+        wrapped = faiss.IndexIDMap2(faiss.IndexFlatIP(index.d))
+        wrapped.index = index
+        wrapped.referenced_objects = [index]
+        faiss.copy_array_to_vector(np.arange(index.ntotal, dtype=np.int64), wrapped.id_map)
+        wrapped.ntotal = index.ntotal
+        wrapped.construct_rev_map()
+        return wrapped
+
+    @staticmethod
+    def _documents_from(metadata: ChunkMetadataStore) -> Dict:
+        documents = {}
+        for chunk_id, meta in enumerate(metadata):
+            FAISSVectorStore._track_chunk(documents, meta.get('source', ''), chunk_id)
+        return documents
+
+    def _load_manifest(self, path: str, manifest: Dict, mmap: bool):
+        legacy = manifest['format_version'] < self.FORMAT_VERSION
+        tail = [s for s in manifest['segments'] if s['vectors']]
+        # Vectors past the checkpoint have to be added, which a read-only mapping cannot take.
+        use_mmap = mmap and not tail
+        flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if use_mmap else 0
+        index = self._with_ids(faiss.read_index(os.path.join(path, manifest['checkpoint']['file']), flags))
+        for segment in tail:
+            prefix = os.path.join(path, segment['name'])
+            vectors = np.fromfile(prefix + ".vec", dtype=np.float32).reshape(-1, self.dimension)
+            ids = (np.arange(segment['start'], segment['start'] + len(vectors), dtype=np.int64) if legacy
+                   else np.load(prefix + ".ids.npy"))
+            index.add_with_ids(vectors, ids)
+        metadata = ChunkMetadataStore()
+        for segment in manifest['segments']:
+            metadata.attach_segment(os.path.join(path, segment['name']), segment['start'], segment['count'])
+        return index, metadata, use_mmap
+
+    def load(self, path: Optional[str] = None, mmap: bool = True) -> bool:
         load_path = path or self.index_path
         if not load_path:
             return False
+        load_path = os.path.abspath(load_path)
         try:
-            self.index = faiss.read_index(os.path.join(load_path, "index.faiss"))
-            with open(os.path.join(load_path, "metadata.json")) as f:
-                self.metadata = json.load(f)
+            manifest = self._read_manifest(load_path)
+            if manifest is not None:
+                index, metadata, mmapped = self._load_manifest(load_path, manifest, mmap)
+                documents, deleted = manifest.get('documents'), manifest.get('deleted', [])
+            else:
+                # Format 1: a single index.faiss plus metadata.json.
+                index = self._with_ids(faiss.read_index(os.path.join(load_path, "index.faiss")))
+                with open(os.path.join(load_path, "metadata.json")) as f:
+                    metadata = ChunkMetadataStore.from_rows(json.load(f))
+                mmapped, documents, deleted = False, None, []
+            if documents is None:
+                documents = self._documents_from(metadata)
+            tier = self._detect_tier(index)
+            self._apply_search_params(index)
+            full = self._load_full_vectors(load_path, manifest, index, len(metadata))
+            with self._lock:
+                self.index, self.metadata, self.tier = index, metadata, tier
+                self.storage = self._detect_storage(index)
+                self._full = full
+                self.documents = documents
+                self._document_ids = {}
+                self._mmapped = mmapped
+                self._set_tombstones(set())
+                self._removed_since_checkpoint = set()
+                if deleted:
+                    self._remove_ids(np.array(deleted, dtype=np.int64))
+                self._saved_path = load_path if manifest is not None else None
+                self._saved_count = len(metadata) if manifest is not None else 0
+                self.version += 1
+                self._maybe_upgrade()
             return True
         except:
             return False
 
     def clear(self) -> None:
-        self.index = faiss.IndexFlatIP(self.dimension)
-        self.metadata = []
+        with self._lock:
+            self.index = self._build_index('flat')
+            self.tier = 'flat'
+            self.storage = self._detect_storage(self.index)
+            self._full = _VectorFile(self.dimension, self.spool_dir) if self.compression != 'none' else None
+            self.metadata = ChunkMetadataStore()
+            self.documents = {}
+            self._document_ids = {}
+            self._set_tombstones(set())
+            self._removed_since_checkpoint = set()
+            self._mmapped = False
+            self._saved_path, self._saved_count = None, 0
+            self.version += 1
+
+    def memory_usage(self) -> int:
+        # Approximate heap bytes: a memory-mapped checkpoint is backed by the page cache.
+        # Read without the lock, which compaction and rebuilds hold for a while: the session
+        # manager sizes every store to enforce its budget, and an estimate need not wait.
+        index, metadata = self.index, self.metadata
+        index_bytes = 0 if self._mmapped else index.ntotal * self._code_size(index)
+        if self._detect_tier(index) == 'hnsw':
+            index_bytes += index.ntotal * self.hnsw_m * 2 * 4
+        # Chunk id maps: forward array plus reverse hash entries.
+        index_bytes += index.ntotal * 16
+        return index_bytes + metadata.memory_usage()
 
     def get_stats(self) -> Dict:
-        return {'total_vectors': self.index.ntotal, 'dimension': self.dimension}
+        return {
+            'total_vectors': self.count,
+            'documents': len(self.documents),
+            'tombstones': len(self._tombstones),
+            'dimension': self.dimension,
+            'index_tier': self.tier,
+            'compression': self.storage,
+            'rerank_factor': self.rerank_factor if self._full is not None and self.storage != 'none' else 0,
+            'version': self.version,
+            'rebuilding_to': self._rebuilding,
+            'ef_search': self.ef_search,
+            'nprobe': self.nprobe
+        }
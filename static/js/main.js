@@ -4,6 +4,7 @@ document.addEventListener('DOMContentLoaded', () => {
     if (document.getElementById('chatForm')) initChat();
     const clearBtn = document.getElementById('clearBtn');
     if (clearBtn) clearBtn.addEventListener('click', clearSession);
+    document.querySelectorAll('.delete-doc').forEach(btn => btn.addEventListener('click', () => deleteDocument(btn.dataset.name)));
 });
 
 function initUpload() {
@@ -45,10 +46,12 @@ function initUpload() {
         try {
             const res = await fetch('/upload', { method: 'POST', body: formData });
             const data = await res.json();
-            if (res.ok && data.success) {
+            if (res.ok && data.success && !data.job_id) {
                 status.textContent = '✓ ' + data.message;
                 status.className = 'upload-status success';
-                setTimeout(() => location.reload(), 1000);
+            } else if (res.ok && data.success) {
+                status.textContent = data.message;
+                await pollJob(data.status_url);
             } else {
                 status.textContent = data.error || 'Upload failed';
                 status.className = 'upload-status error';
@@ -60,6 +63,26 @@ function initUpload() {
             uploadBtn.disabled = false;
         }
     }
+    async function pollJob(url) {
+        while (true) {
+            const res = await fetch(url);
+            const job = await res.json();
+            if (!res.ok) throw new Error(job.error);
+            const p = job.progress;
+            if (job.status === 'completed' || job.status === 'failed') {
+                const failed = job.errors.map(e => e.filename).join(', ');
+                status.textContent = job.status === 'completed'
+                    ? `✓ Processed ${job.documents.length} document(s) with ${p.vectors_added} chunks` + (failed ? ` (failed: ${failed})` : '')
+                    : 'Processing failed: ' + (job.errors[0]?.error || 'unknown error');
+                status.className = 'upload-status ' + (job.status === 'completed' ? 'success' : 'error');
+                if (job.status === 'completed') setTimeout(() => location.reload(), 1000);
+                else uploadBtn.disabled = false;
+                return;
+            }
+            status.textContent = `Processing ${p.documents_done}/${p.documents_total} document(s) · ${p.pages_extracted} pages · ${p.chunks_embedded}/${p.chunks_total} chunks embedded`;
+            await new Promise(r => setTimeout(r, 1000));
+        }
+    }
 }
 
 function initChat() {
@@ -83,14 +106,29 @@ function initChat() {
         addMsg(q, 'user');
         loading.classList.add('active');
         try {
-            const res = await fetch('/query', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ question: q }) });
-            const data = await res.json();
-            if (res.ok && data.success) {
-                addMsg(data.answer, 'assistant', data.sources);
-                showContext(data.context);
-            } else {
+            const res = await fetch('/query/stream', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ question: q }) });
+            if (!res.ok) {
+                const data = await res.json();
                 addMsg(data.error || 'Error occurred', 'assistant');
+                return;
             }
+            let msg = null, sources = [], answer = '';
+            await readEvents(res, (event, data) => {
+                if (event === 'sources') {
+                    sources = data.sources;
+                    showContext(data.context);
+                } else if (event === 'token') {
+                    if (!msg) { loading.classList.remove('active'); msg = addMsg('', 'assistant'); }
+                    answer += data.text;
+                    msg.querySelector('p').innerHTML = answer.replace(/\n/g, '<br>');
+                    messages.scrollTop = messages.scrollHeight;
+                } else if (event === 'done') {
+                    if (msg) msg.remove();
+                    addMsg(data.answer, 'assistant', sources);
+                } else if (event === 'error') {
+                    addMsg(data.error, 'assistant');
+                }
+            });
         } catch {
             addMsg('Network error', 'assistant');
         } finally {
@@ -107,6 +145,25 @@ function initChat() {
         div.className = `message ${type}-message`;
         div.innerHTML = `<div class="message-avatar">${avatar}</div><div class="message-content"><p>${text.replace(/\n/g, '<br>')}</p>${srcHtml}</div>`;
         messages.appendChild(div);
+        return div;
+    }
+    async function readEvents(res, onEvent) {
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let sep;
+            while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                const raw = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+                const event = (raw.match(/^event: (.*)$/m) || [])[1] || 'message';
+                const data = (raw.match(/^data: (.*)$/m) || [])[1];
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
     }
     function showContext(chunks) {
         if (!chunks?.length) { contextContent.innerHTML = '<p class="context-placeholder">No context</p>'; return; }
@@ -115,6 +172,15 @@ function initChat() {
     }
 }
 
+async function deleteDocument(name) {
+    if (!confirm(`Remove ${name}?`)) return;
+    try {
+        const res = await fetch(`/documents/${encodeURIComponent(name)}`, { method: 'DELETE' });
+        if (!res.ok) { alert((await res.json()).error || 'Error'); return; }
+        location.reload();
+    } catch { alert('Error'); }
+}
+
 async function clearSession() {
     if (!confirm('Clear all documents and chat?')) return;
     try { await fetch('/clear', { method: 'POST' }); location.href = '/'; } catch { alert('Error'); }
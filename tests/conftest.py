@@ -0,0 +1,92 @@
+"""Shared fixtures: small in-memory models, so the suite runs offline."""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ("the of and to in is for on that with as by this are from at be or an it which data model "
+         "results analysis system report section figure table value performance method approach "
+         "revenue quarterly growth customer annual risk market compliance policy").split()
+
+
+@pytest.fixture(scope='session')
+def tokenizer():
+    # A WordPiece tokenizer trained on a few words, so most words split into several tokens.
+    tokenizers = pytest.importorskip('tokenizers')
+    transformers = pytest.importorskip('transformers')
+    tok = tokenizers.Tokenizer(tokenizers.models.WordPiece(unk_token='[UNK]'))
+    tok.normalizer = tokenizers.normalizers.BertNormalizer(lowercase=True)
+    tok.pre_tokenizer = tokenizers.pre_tokenizers.BertPreTokenizer()
+    trainer = tokenizers.trainers.WordPieceTrainer(vocab_size=120,
+                                                   special_tokens=['[UNK]', '[CLS]', '[SEP]', '[PAD]'])
+    tok.train_from_iterator([' '.join(WORDS)] * 10, trainer)
+    tok.post_processor = tokenizers.processors.TemplateProcessing(
+        single='[CLS] $A [SEP]', special_tokens=[('[CLS]', tok.token_to_id('[CLS]')),
+                                                 ('[SEP]', tok.token_to_id('[SEP]'))])
+    return transformers.PreTrainedTokenizerFast(tokenizer_object=tok, unk_token='[UNK]', cls_token='[CLS]',
+                                                sep_token='[SEP]', pad_token='[PAD]')
+
+
+def missing_tokenizer(name):
+    raise OSError(f"No tokenizer {name} offline")
+
+
+@pytest.fixture(params=['whitespace', 'wordpiece'])
+def registry(request):
+    # Stands in for the model registry: TextChunker falls back to whitespace counts without a tokenizer.
+    if request.param == 'whitespace':
+        return SimpleNamespace(get_tokenizer=missing_tokenizer)
+    tok = request.getfixturevalue('tokenizer')
+    return SimpleNamespace(get_tokenizer=lambda name: tok)
+
+
+@pytest.fixture
+def llm_stub():
+    # Starts stub LLM servers (see benchmarks/stub_llm.py) and stops them after the test.
+    from benchmarks.stub_llm import start_stub_server
+    servers = []
+
+    def start(**kwargs):
+        server, url = start_stub_server(**kwargs)
+        servers.append(server)
+        return server, url
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class FakeSentenceTransformer:
+    """Hashes words into a bag-of-words vector; enough for retrieval to find matching text."""
+
+    max_seq_length = 256
+
+    def __init__(self, name, dimension: int = 32):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True,
+               show_progress_bar=False):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, sum(word.encode()) % self.dimension] += 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+@pytest.fixture
+def fake_models(monkeypatch, tokenizer):
+    # The registry loads through these module attributes, so nothing is downloaded.
+    import rag.registry
+    monkeypatch.setattr(rag.registry, 'sentence_transformers',
+                        SimpleNamespace(SentenceTransformer=FakeSentenceTransformer))
+    monkeypatch.setattr(rag.registry, 'transformers',
+                        SimpleNamespace(AutoTokenizer=SimpleNamespace(from_pretrained=lambda name: tokenizer)))
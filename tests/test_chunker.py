@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from benchmarks.bench_chunker import LegacyTextChunker, synthetic_text
+from rag.chunker import TextChunker
+
+EDGE_WORDS = ['Alpha', 'beta.', 'gamma!', 'delta?', 'x' * 90 + '.', 'é', '\n\n', '  ', 'word', 'end.\t', '—', '\n']
+
+
+def random_text(rng: random.Random) -> str:
+    return ' '.join(rng.choice(EDGE_WORDS) for _ in range(rng.randint(0, 400)))
+
+
+def split_at(text: str, rng: random.Random, pieces: int):
+    cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, pieces)))
+    return [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.fixture
+def chunkers(registry):
+    return (TextChunker(chunk_size=60, chunk_overlap=15, registry=registry),
+            LegacyTextChunker(chunk_size=60, chunk_overlap=15, registry=registry))
+
+
+def test_chunk_text_matches_legacy(chunkers):
+    chunker, legacy = chunkers
+    texts = [synthetic_text(3, seed=seed) for seed in range(3)]
+    texts += [random_text(random.Random(seed)) for seed in range(40)]
+    texts += ['', '   ', 'One sentence without a break', 'a. b! c? ' * 50]
+    for text in texts:
+        assert chunker.chunk_text(text, 'doc.pdf') == legacy.chunk_text(text, 'doc.pdf')
+
+
+def test_iter_chunks_matches_chunk_text_on_pieces(chunkers):
+    chunker, _ = chunkers
+    for seed in range(40):
+        rng = random.Random(seed)
+        text = synthetic_text(1, seed=seed) if seed % 4 == 0 else random_text(rng)
+        expected = chunker.chunk_text(text, 'doc.pdf')
+        assert list(chunker.iter_chunks(split_at(text, rng, rng.randint(1, 8)), 'doc.pdf')) == expected
+        assert list(chunker.iter_chunks([text], 'doc.pdf')) == expected
+
+
+def test_iter_chunks_records_pages(chunkers):
+    chunker, _ = chunkers
+    pages = ['First page. It ends here.', '', 'Second page starts. ' * 20, 'Last page.']
+    chunks = list(chunker.iter_chunks(['\n\n'.join(pages[:1])] + ['\n\n' + p for p in pages[1:]],
+                                      'doc.pdf', first_page=1))
+    assert [{k: v for k, v in c.items() if k not in ('page_start', 'page_end')} for c in chunks] \
+        == chunker.chunk_text('\n\n'.join(pages), 'doc.pdf')
+    assert chunks[0]['page_start'] == 1 and chunks[-1]['page_end'] == 4
+    assert all(c['page_start'] <= c['page_end'] for c in chunks)
+
+
+def test_count_tokens_batch_matches_count_tokens(chunkers):
+    chunker, _ = chunkers
+    texts = ['', 'data model', 'The quarterly revenue growth!', synthetic_text(1)[:2000]]
+    assert chunker.count_tokens_batch(texts) == [chunker.count_tokens(t) for t in texts]
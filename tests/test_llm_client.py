@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+import pytest
+
+from benchmarks.stub_llm import DEFAULT_ANSWER
+from rag.llm_client import AsyncLLMClient, LLMClient
+
+groq = pytest.importorskip('groq')
+
+MESSAGES = [{'role': 'user', 'content': 'What does the report say?'}]
+
+
+def make_client(url: str, **kwargs) -> LLMClient:
+    return LLMClient('test-key', url, backoff_base=0.01, **kwargs)
+
+
+def streamed_text(stream) -> str:
+    return ''.join(chunk.choices[0].delta.content or '' for chunk in stream if chunk.choices)
+
+
+@pytest.mark.parametrize('status', [429, 500, 503])
+def test_complete_retries_transient_failures(llm_stub, status):
+    server, url = llm_stub(failures=2, failure_status=status)
+    client = make_client(url, max_retries=3)
+    response = client.complete('stub', MESSAGES)
+    assert response.choices[0].message.content == DEFAULT_ANSWER
+    assert server.requests == 3
+    stats = client.get_stats()
+    assert stats['retries'] == 2 and stats['upstream_calls'] == 3 and stats['errors'] == 0
+    client.close()
+
+
+def test_complete_gives_up_after_max_retries(llm_stub):
+    server, url = llm_stub(failures=5)
+    client = make_client(url, max_retries=1)
+    with pytest.raises(groq.RateLimitError):
+        client.complete('stub', MESSAGES)
+    assert server.requests == 2
+    assert client.get_stats()['errors'] == 1
+    client.close()
+
+
+def test_client_errors_are_not_retried(llm_stub):
+    server, url = llm_stub(failures=1, failure_status=400)
+    client = make_client(url, max_retries=3)
+    with pytest.raises(groq.BadRequestError):
+        client.complete('stub', MESSAGES)
+    assert server.requests == 1
+    client.close()
+
+
+def test_stream_retries_until_the_response_starts(llm_stub):
+    server, url = llm_stub(failures=1)
+    client = make_client(url, max_retries=2)
+    assert streamed_text(client.stream('stub', MESSAGES)) == DEFAULT_ANSWER
+    assert server.requests == 2
+    assert client.get_stats()['in_flight'] == 0
+    client.close()
+
+
+def run_concurrently(fn, count: int):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn(i)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_identical_completions_coalesce(llm_stub):
+    server, url = llm_stub(latency=0.3)
+    client = make_client(url)
+    results = run_concurrently(lambda i: client.complete('stub', MESSAGES).choices[0].message.content, 8)
+    assert results == [DEFAULT_ANSWER] * 8
+    assert server.requests == 1
+    assert client.get_stats()['coalesced'] == 7
+    # Nothing is cached once the call completes.
+    client.complete('stub', MESSAGES)
+    assert server.requests == 2
+    client.close()
+
+
+def test_coalescing_can_be_turned_off(llm_stub):
+    server, url = llm_stub(latency=0.1)
+    client = make_client(url, coalesce=False)
+    run_concurrently(lambda i: client.complete('stub', MESSAGES), 4)
+    assert server.requests == 4
+    client.close()
+
+
+def test_concurrency_cap(llm_stub):
+    server, url = llm_stub(latency=0.1)
+    client = make_client(url, max_concurrency=2)
+    run_concurrently(lambda i: client.complete('stub', [{'role': 'user', 'content': f'question {i}'}]), 6)
+    assert server.requests == 6
+    assert server.max_active <= 2
+    assert client.get_stats()['max_in_flight'] <= 2
+    client.close()
+
+
+def test_async_client_retries_and_coalesces(llm_stub):
+    server, url = llm_stub(latency=0.3, failures=1)
+
+    async def run():
+        client = AsyncLLMClient('test-key', url, backoff_base=0.01, max_retries=2)
+        responses = await asyncio.gather(*[client.complete('stub', MESSAGES) for _ in range(5)])
+        await client.close()
+        return client, responses
+    client, responses = asyncio.run(run())
+    assert [r.choices[0].message.content for r in responses] == [DEFAULT_ANSWER] * 5
+    assert server.requests == 2
+    assert client.get_stats()['coalesced'] == 4
@@ -0,0 +1,121 @@
+import json
+import time
+
+import pytest
+
+from benchmarks.stub_llm import DEFAULT_ANSWER
+from benchmarks.synthetic_pdf import synthetic_pages, write_pdf
+
+pytest.importorskip('groq')
+pytest.importorskip('flask')
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path, llm_stub, fake_models):
+    import app as app_module
+    from config import Config
+    from rag import LLMClient
+    server, url = llm_stub(token_delay=0.001)
+    monkeypatch.setattr(Config, 'GROQ_API_KEY', 'test-key')
+    monkeypatch.setattr(Config, 'GROQ_BASE_URL', url)
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(Config, 'SESSION_FOLDER', str(tmp_path / 'sessions'))
+    monkeypatch.setattr(app_module, 'embedding_cache', None)
+    monkeypatch.setattr(app_module, 'llm_client', LLMClient('test-key', url, backoff_base=0.01))
+    test_client = app_module.app.test_client()
+    test_client.stub = server
+    return test_client
+
+
+def upload(client, path, name='report.pdf'):
+    with open(path, 'rb') as f:
+        response = client.post('/upload', data={'files': [(f, name)]}, content_type='multipart/form-data')
+    assert response.status_code == 202, response.json
+    for _ in range(300):
+        job = client.get(response.json['status_url']).json
+        if job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("ingestion job did not finish")
+
+
+def sse_events(response):
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        if block.strip():
+            fields = dict(line.split(': ', 1) for line in block.split('\n'))
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@pytest.fixture
+def indexed(client, tmp_path):
+    path = tmp_path / 'report.pdf'
+    write_pdf(str(path), synthetic_pages(4, 200))
+    job = upload(client, path)
+    assert job['status'] == 'completed', job
+    return client
+
+
+def test_query_stream_sends_sources_tokens_and_done(indexed):
+    response = indexed.post('/query/stream', json={'question': 'What does the report say about revenue?'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = sse_events(response)
+    names = [name for name, _ in events]
+    assert names[0] == 'sources' and names[-1] == 'done'
+    assert set(names[1:-1]) == {'token'}
+    assert len(names) - 2 == len(DEFAULT_ANSWER.split())
+    assert events[0][1]['sources'] == ['report.pdf'] and events[0][1]['context']
+    answer = ''.join(data['text'] for name, data in events if name == 'token')
+    assert answer == DEFAULT_ANSWER == events[-1][1]['answer']
+    assert indexed.stub.requests == 1
+
+
+def test_query_stream_matches_query(indexed):
+    question = {'question': 'Summarize the findings'}
+    streamed = sse_events(indexed.post('/query/stream', json=question))
+    answer = indexed.post('/query', json=question).json
+    assert streamed[-1][1]['answer'] == answer['answer']
+    assert streamed[0][1]['sources'] == answer['sources']
+
+
+def test_query_stream_retries_before_the_first_token(indexed):
+    indexed.stub.failures = 1
+    events = sse_events(indexed.post('/query/stream', json={'question': 'Revenue growth?'}))
+    assert events[-1] == ('done', {'answer': DEFAULT_ANSWER, 'model': events[-1][1]['model']})
+    assert indexed.stub.requests == 2
+
+
+def test_query_stream_reports_upstream_errors_in_the_answer(indexed):
+    indexed.stub.failures = 1
+    indexed.stub.RequestHandlerClass.failure_status = 400
+    events = sse_events(indexed.post('/query/stream', json={'question': 'Revenue growth?'}))
+    assert [name for name, _ in events] == ['sources', 'token', 'done']
+    assert events[-1][1]['answer'].startswith('Error: ')
+    assert indexed.stub.requests == 1
+    # Failed answers are not cached.
+    events = sse_events(indexed.post('/query/stream', json={'question': 'Revenue growth?'}))
+    assert events[-1][1]['answer'] == DEFAULT_ANSWER
+
+
+def test_query_stream_without_documents(client):
+    response = client.post('/query/stream', json={'question': 'Anything?'})
+    assert response.status_code == 400
+    assert client.stub.requests == 0
+
+
+@pytest.mark.parametrize('scope', [{'pages': [[100, 200]]}, {'documents': []}])
+def test_scope_matching_no_chunks(indexed, scope):
+    from rag.generator import AnswerGenerator
+    expected = AnswerGenerator.NO_SCOPED_CONTEXT_ANSWER
+    events = sse_events(indexed.post('/query/stream', json={'question': 'Revenue growth?', **scope}))
+    assert events[0][1]['sources'] == [] and events[-1][1]['answer'] == expected
+    answer = indexed.post('/query', json={'question': 'Revenue growth?', **scope})
+    assert answer.status_code == 200 and answer.json['answer'] == expected
+    batch = indexed.post('/query/batch', json={'questions': ['Revenue growth?', 'Risks?'], **scope}).json
+    assert [r['answer'] for r in batch['results']] == [expected, expected]
+    assert indexed.stub.requests == 0
+    # The same scope with matching pages still reaches the LLM.
+    answer = indexed.post('/query', json={'question': 'Revenue growth?', 'pages': [[1, 2]]}).json
+    assert answer['answer'] == DEFAULT_ANSWER and indexed.stub.requests == 1
@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+import pytest
+
+from rag.session_manager import SessionManager
+from rag.vector_store import FAISSVectorStore
+
+DIM = 8
+
+
+def new_session():
+    return {'vector_store': FAISSVectorStore(DIM, background_rebuild=False), 'documents': [], 'chat_history': []}
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return SessionManager(new_session, str(tmp_path / 'sessions'), max_sessions=10)
+
+
+def add_document(user_session, filename: str, chunks: int = 3) -> None:
+    vectors = np.random.default_rng(0).normal(size=(chunks, DIM)).astype(np.float32)
+    user_session['vector_store'].add_embeddings(vectors, [{'source': filename, 'chunk_id': i, 'text': f"{filename} {i}"}
+                                                          for i in range(chunks)])
+    user_session['documents'].append({'filename': filename})
+
+
+def test_spill_and_rehydrate(manager):
+    user_session = manager.get('u')
+    add_document(user_session, 'a.pdf')
+    user_session['chat_history'].append({'question': 'q', 'answer': 'a'})
+    assert manager.evict('u')
+    restored = manager.get('u')
+    assert restored is not user_session
+    assert restored['documents'] == [{'filename': 'a.pdf'}]
+    assert restored['chat_history'] == [{'question': 'q', 'answer': 'a'}]
+    assert restored['vector_store'].count == 3
+    assert manager.stats['rehydrations'] == 1
+
+
+def test_deleting_the_last_document_survives_eviction(manager):
+    add_document(manager.get('u'), 'a.pdf')
+    assert manager.evict('u')
+    user_session = manager.get('u')
+    user_session['vector_store'].remove_document('a.pdf')
+    user_session['documents'].clear()
+    assert manager.evict('u')
+    restored = manager.get('u')
+    assert restored['documents'] == []
+    assert restored['vector_store'].count == 0
+
+
+def test_leased_sessions_are_not_evicted(manager):
+    manager.acquire('u')
+    assert not manager.evict('u', if_evictable=True)
+    manager.release('u')
+    assert manager.evict('u', if_evictable=True)
+
+
+def test_least_recently_used_session_is_evicted(tmp_path):
+    manager = SessionManager(new_session, str(tmp_path / 'sessions'), max_sessions=2)
+    for user_id in ('a', 'b'):
+        add_document(manager.get(user_id), f"{user_id}.pdf")
+    manager.get('a')
+    manager.get('c')
+    assert sorted(manager._sessions) == ['a', 'c']
+    assert manager.get('b')['documents'] == [{'filename': 'b.pdf'}]
+
+
+
+@pytest.mark.parametrize('max_memory_bytes', [0, 1 << 30])
+def test_a_busy_store_does_not_block_other_sessions(tmp_path, max_memory_bytes):
+    manager = SessionManager(new_session, str(tmp_path / 'sessions'), max_memory_bytes=max_memory_bytes)
+    add_document(manager.get('busy'), 'a.pdf')
+    manager.get('other')
+    done = threading.Event()
+
+    def requests():
+        manager.get_stats()
+        manager.acquire('other')
+        manager.release('other')
+        done.set()
+    # Held the way a compaction or rebuild holds it.
+    with manager.get('busy')['vector_store']._lock:
+        threading.Thread(target=requests, daemon=True).start()
+        assert done.wait(2)
+    assert manager.get_stats()['memory_bytes'] > 0
@@ -0,0 +1,71 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.bench_cleaner import LegacyTextCleaner, synthetic_document
+from rag.pdf_loader import PDFLoader
+from rag.text_cleaner import TextCleaner
+
+EDGE_PAGES = ['', '  ', '\n', 'ﬁnance — 2019–2020 “quoted” it’s', ', "\'").replace(', 'a\n \t\nb', 'x\t\ty  \n\n\n z']
+
+
+def documents():
+    docs = [synthetic_document(30, 0.3, seed=seed) for seed in range(4)]
+    rng = random.Random(0)
+    for _ in range(20):
+        texts = [rng.choice(EDGE_PAGES) + ' '.join(rng.choice(EDGE_PAGES + ['word', '.']) for _ in range(8))
+                 for _ in range(rng.randint(1, 6))]
+        docs.append({'filename': 'edge.pdf', 'pages': [{'page_number': i + 1, 'text': t} for i, t in enumerate(texts)],
+                     'full_text': '\n\n'.join(texts)})
+    return docs
+
+
+def test_clean_documents_matches_legacy():
+    docs = documents()
+    assert TextCleaner().clean_documents(docs) == LegacyTextCleaner().clean_documents(docs)
+
+
+def test_clean_text_matches_legacy():
+    legacy = LegacyTextCleaner()
+    for doc in documents():
+        for page in doc['pages']:
+            assert TextCleaner().clean_text(page['text']) == legacy.clean_text(page['text'])
+
+
+def test_documents_without_pages_or_with_edited_full_text():
+    legacy = LegacyTextCleaner()
+    doc = synthetic_document(5, 0.3)
+    docs = [{'filename': 'a.pdf', 'full_text': doc['full_text']}, {**doc, 'full_text': doc['full_text'] + ' tail'}]
+    assert TextCleaner().clean_documents(docs) == legacy.clean_documents(docs)
+
+
+def test_clean_pages_in_executor_matches_serial():
+    texts = [p['text'] for p in synthetic_document(40, 0.3)['pages']]
+    cleaner = TextCleaner(parallel_min_chars=0, pages_per_task=3)
+    with ThreadPoolExecutor(2) as pool:
+        assert cleaner.clean_pages(texts, pool) == TextCleaner().clean_pages(texts)
+
+
+@pytest.mark.parametrize('window', [1, 2, 7, 64])
+def test_iter_clean_text_pieces_join_to_full_text(window):
+    cleaner = TextCleaner(max_workers=2)
+    with ThreadPoolExecutor(2) as pool:
+        for doc in documents():
+            texts = [p['text'] for p in doc['pages']]
+            full_text = cleaner.clean_documents([doc])[0]['full_text']
+            pieces = list(cleaner.iter_clean_text(texts, window_pages=window))
+            assert len(pieces) == len(texts)
+            assert ''.join(pieces) == full_text
+            assert list(cleaner.iter_clean_text(texts, pool, window_pages=window)) == pieces
+
+
+def test_iter_clean_text_in_process_pool():
+    texts = [p['text'] for p in synthetic_document(50, 0.3)['pages']]
+    cleaner = TextCleaner(max_workers=2)
+    pool = PDFLoader.process_pool(2)
+    try:
+        assert list(cleaner.iter_clean_text(texts, pool, window_pages=8)) \
+            == list(cleaner.iter_clean_text(texts, window_pages=8))
+    finally:
+        pool.shutdown()
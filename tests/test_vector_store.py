@@ -0,0 +1,124 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from rag.vector_store import FAISSVectorStore
+
+DIM = 32
+CHUNKS = 300
+TIERS = {'flat': (0, 0), 'hnsw': (1, 0), 'ivf': (0, 1)}
+
+
+def make_store(tier: str, compression: str = 'none') -> FAISSVectorStore:
+    hnsw_threshold, ivf_threshold = TIERS[tier]
+    return FAISSVectorStore(DIM, hnsw_threshold=hnsw_threshold, ivf_threshold=ivf_threshold, nprobe=1024,
+                            background_rebuild=False, compression=compression, compress_threshold=100)
+
+
+def document(source: str, seed: int, version: int = 0):
+    # Chunks scatter around a per-document centre with a spread that overlaps other documents,
+    # as real embeddings do, so codecs trained on early documents still fit later ones.
+    rng = np.random.default_rng(seed)
+    vectors = 0.5 * rng.normal(size=DIM) + rng.normal(size=(CHUNKS, DIM))
+    chunks = [{'chunk_id': i, 'source': source, 'text': f"{source} v{version} chunk {i}"} for i in range(CHUNKS)]
+    return vectors.astype(np.float32), chunks
+
+
+def add(store: FAISSVectorStore, source: str, seed: int, version: int = 0) -> None:
+    store.add_embeddings(*document(source, seed, version))
+
+
+def results(store: FAISSVectorStore, queries: np.ndarray):
+    return [[(meta['text'], round(score, 4)) for meta, score in hits] for hits in store.search_batch(queries, 5)]
+
+
+def self_recall(store: FAISSVectorStore, source: str, seed: int, version: int = 0) -> float:
+    vectors, chunks = document(source, seed, version)
+    hits = store.search_batch(vectors[:50], 1)
+    return np.mean([bool(h) and h[0][0]['text'] == c['text'] for h, c in zip(hits, chunks)])
+
+
+@pytest.mark.parametrize('compression', ['none', 'fp16', 'int8'])
+@pytest.mark.parametrize('tier', list(TIERS))
+def test_remove_save_load_round_trip(tmp_path, tier, compression):
+    path = str(tmp_path / 'index')
+    store = make_store(tier, compression)
+    for seed, source in enumerate(['a.pdf', 'b.pdf', 'c.pdf']):
+        add(store, source, seed)
+    stats = store.get_stats()
+    assert (stats['index_tier'], stats['compression']) == (tier, compression)
+
+    assert store.remove_document('b.pdf') == CHUNKS
+    queries = np.concatenate([document(s, seed)[0][:20] for seed, s in enumerate(['a.pdf', 'b.pdf', 'c.pdf'])])
+    assert all(meta['source'] != 'b.pdf' for hits in store.search_batch(queries, 5) for meta, _ in hits)
+    store.save(path)
+
+    # Incremental save: new rows and a partial removal on top of the checkpoint.
+    add(store, 'd.pdf', 3)
+    first_a = store.documents['a.pdf'][0][0]
+    assert store.remove_document('a.pdf', start=first_a, end=first_a + 100) == 100
+    store.save(path)
+
+    loaded = make_store(tier, compression)
+    assert loaded.load(path)
+    assert loaded.count == store.count == 3 * CHUNKS - 100
+    assert loaded.documents == store.documents
+    assert loaded.get_stats()['compression'] == compression
+    assert results(loaded, queries) == results(store, queries)
+    assert self_recall(loaded, 'd.pdf', 3) >= 0.9
+
+    # Keep going on the loaded store: remove, re-add, save over the same directory, reload.
+    assert loaded.remove_document('c.pdf') == CHUNKS
+    add(loaded, 'b.pdf', 1, version=1)
+    loaded.save(path)
+    reloaded = make_store(tier, compression)
+    assert reloaded.load(path)
+    assert sorted(reloaded.documents) == ['a.pdf', 'b.pdf', 'd.pdf']
+    assert reloaded.count == len(reloaded.metadata) == 3 * CHUNKS - 100
+    assert results(reloaded, queries) == results(loaded, queries)
+    assert self_recall(reloaded, 'b.pdf', 1, version=1) >= 0.9
+    assert all(meta['source'] != 'c.pdf' for hits in reloaded.search_batch(queries, 5) for meta, _ in hits)
+
+
+@pytest.mark.parametrize('tier', list(TIERS))
+def test_replacing_a_document_reclaims_space(tmp_path, tier):
+    path = str(tmp_path / 'index')
+    store = make_store(tier)
+    add(store, 'other.pdf', 99)
+    for version in range(6):
+        first = store.next_id
+        add(store, 'a.pdf', version, version)
+        if version:
+            store.remove_document('a.pdf', end=first)
+        if version == 1:
+            usage = store.memory_usage()
+        store.save(path)
+    assert store.count == len(store.metadata) == 2 * CHUNKS
+    assert store.memory_usage() <= 1.1 * usage
+    assert self_recall(store, 'a.pdf', 5, 5) >= 0.9
+    assert {store.metadata[i]['text'].split()[1] for i in range(store.next_id)
+            if store.metadata[i]['source'] == 'a.pdf'} == {'v5'}
+
+    store.save(path, compact=True)
+    with open(os.path.join(path, FAISSVectorStore.MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    assert len(manifest['segments']) == 1 and manifest['deleted'] == []
+    loaded = make_store(tier)
+    assert loaded.load(path)
+    assert loaded.count == len(loaded.metadata) == 2 * CHUNKS
+    assert self_recall(loaded, 'a.pdf', 5, 5) >= 0.9
+    assert self_recall(loaded, 'other.pdf', 99) >= 0.9
+
+
+def test_filtered_search_after_compaction():
+    store = make_store('flat')
+    for seed, source in enumerate(['a.pdf', 'b.pdf', 'c.pdf']):
+        add(store, source, seed)
+    store.remove_document('a.pdf')
+    assert store.next_id == 2 * CHUNKS
+    queries = document('c.pdf', 2)[0][:10]
+    assert all(meta['source'] == 'b.pdf' for hits in store.search_batch(queries, 5, sources=['b.pdf'])
+               for meta, _ in hits)
+    assert store.search_batch(queries, 5, sources=['a.pdf']) == [[] for _ in queries]